@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+# Video decoding benchmarking tool
+#
+# This tool measures how fast `load_video` samples frames from long videos with each of the available backends, and
+# compares it with decoding every frame up to the last sampled one, which is what a sequential reader has to do.
+#
+# It encodes a synthetic video with PyAV (so `av` is required), then reports the number of sampled frames per second
+# for each backend and each number of sampled frames:
+#
+#     python scripts/benchmark/video-decoding-benchmark.py --duration 300 --gop_size 250 --num_frames 8 32
+#
+# Longer videos and sparser sampling make the difference between seeking and decoding sequentially larger. The keyframe
+# interval of the synthetic video can be changed with `--gop_size`, and the PyAV reader can decode independent groups
+# of pictures in parallel with `--num_decode_workers`.
+
+import argparse
+import os
+import tempfile
+import time
+
+import av
+import numpy as np
+
+from transformers.image_utils import VIDEO_DECODERS, load_video
+from transformers.utils import is_cv2_available, is_decord_available, is_torchvision_available
+
+
+def make_video(path, duration, fps, gop_size, width, height, codec):
+    container = av.open(path, "w")
+    stream = container.add_stream(codec, rate=fps)
+    stream.width, stream.height, stream.pix_fmt = width, height, "yuv420p"
+    stream.codec_context.gop_size = gop_size
+    pattern = np.random.RandomState(0).randint(0, 256, (height, width, 3), dtype=np.uint8)
+    for i in range(int(duration * fps)):
+        frame = np.roll(pattern, 4 * i, axis=1)
+        for packet in stream.encode(av.VideoFrame.from_ndarray(frame, format="rgb24")):
+            container.mux(packet)
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()
+
+
+def decode_sequentially(path, num_frames):
+    # Reference: decode every frame up to the last sampled one and keep the sampled ones
+    container = av.open(path)
+    total_num_frames = container.streams.video[0].frames
+    indices = set(np.linspace(0, total_num_frames - 1, num_frames, dtype=int).tolist())
+    frames = []
+    for i, frame in enumerate(container.decode(video=0)):
+        if i in indices:
+            frames.append(frame.to_ndarray(format="rgb24"))
+        if i >= max(indices):
+            break
+    container.close()
+    return np.stack(frames)
+
+
+def timeit(fn, num_runs):
+    timings = []
+    for _ in range(num_runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=300.0, help="Duration of the synthetic video, in seconds.")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--gop_size", type=int, default=250, help="Number of frames between two keyframes.")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--codec", type=str, default="libx264")
+    parser.add_argument("--num_frames", type=int, nargs="+", default=[8, 32], help="Numbers of frames to sample.")
+    parser.add_argument("--num_decode_workers", type=int, default=1, help="Threads used by the PyAV reader.")
+    parser.add_argument("--num_runs", type=int, default=3, help="Number of timed runs, the best one is reported.")
+    args = parser.parse_args()
+
+    backends = ["pyav"]
+    backends += ["opencv"] if is_cv2_available() else []
+    backends += ["decord"] if is_decord_available() else []
+    backends += ["torchvision"] if is_torchvision_available() else []
+    backends = [backend for backend in backends if backend in VIDEO_DECODERS]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "video.mp4")
+        print(
+            f"Encoding a {args.duration:.0f}s {args.width}x{args.height} video, keyframe every {args.gop_size} frames"
+        )
+        make_video(path, args.duration, args.fps, args.gop_size, args.width, args.height, args.codec)
+
+        for num_frames in args.num_frames:
+            best = timeit(lambda: decode_sequentially(path, num_frames), args.num_runs)
+            print(f"num_frames={num_frames:<4} sequential reference: {best:.3f}s, {num_frames / best:.1f} frames/s")
+            for backend in backends:
+                kwargs = {"num_decode_workers": args.num_decode_workers} if backend == "pyav" else {}
+                best = timeit(
+                    lambda: load_video(path, num_frames=num_frames, backend=backend, **kwargs), args.num_runs
+                )
+                print(f"num_frames={num_frames:<4} {backend:<22}{best:.3f}s, {num_frames / best:.1f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
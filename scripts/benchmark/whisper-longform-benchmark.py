@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+# Whisper long-form generation benchmarking tool
+#
+# This tool measures the time it takes to transcribe a batch of long audios with the sequential long-form algorithm of
+# `WhisperForConditionalGeneration.generate` (30s sliding window, segments split on timestamp tokens and temperature
+# fallback), and reports it as seconds of compute per hour of audio.
+#
+# It uses a randomly initialized tiny Whisper model and random input features, so it runs on CPU in a few seconds and
+# mostly measures the overhead of the long-form bookkeeping around the model calls rather than the model itself:
+#
+#     python scripts/benchmark/whisper-longform-benchmark.py --batch_size 8 --audio_minutes 10
+#
+# Temperature fallback can be disabled to only measure the sliding window and segment splitting:
+#
+#     python scripts/benchmark/whisper-longform-benchmark.py --no_fallback
+#
+# The audios of a batch have different lengths (from `audio_minutes / 2` to `audio_minutes`) so the batch shrinks as
+# the shortest audios are transcribed, like it does in practice.
+
+import argparse
+import time
+
+import torch
+
+from transformers import WhisperConfig, WhisperForConditionalGeneration
+
+
+def get_tiny_model(vocab_size=51865, num_timestamp_tokens=1501):
+    config = WhisperConfig(
+        vocab_size=vocab_size,
+        num_mel_bins=80,
+        d_model=64,
+        encoder_layers=2,
+        decoder_layers=2,
+        encoder_attention_heads=2,
+        decoder_attention_heads=2,
+        encoder_ffn_dim=128,
+        decoder_ffn_dim=128,
+        max_source_positions=1500,
+        max_target_positions=448,
+        decoder_start_token_id=vocab_size - num_timestamp_tokens - 6,
+        pad_token_id=vocab_size - num_timestamp_tokens - 7,
+        bos_token_id=vocab_size - num_timestamp_tokens - 7,
+        eos_token_id=vocab_size - num_timestamp_tokens - 7,
+    )
+    model = WhisperForConditionalGeneration(config).eval()
+
+    # Same special tokens layout as the English-only checkpoints
+    timestamp_begin = vocab_size - num_timestamp_tokens
+    generation_config = model.generation_config
+    generation_config.no_timestamps_token_id = timestamp_begin - 1
+    generation_config.prev_sot_token_id = timestamp_begin - 3
+    generation_config.is_multilingual = False
+    generation_config.max_initial_timestamp_index = 50
+    generation_config.begin_suppress_tokens = [220, config.eos_token_id]
+    generation_config.suppress_tokens = None
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=8, help="Number of audios transcribed together.")
+    parser.add_argument("--audio_minutes", type=float, default=10.0, help="Length of the longest audio, in minutes.")
+    parser.add_argument("--max_new_tokens", type=int, default=24, help="Number of tokens generated per window.")
+    parser.add_argument("--num_runs", type=int, default=3, help="Number of timed runs, after one warmup run.")
+    parser.add_argument("--no_fallback", action="store_true", help="Disable temperature fallback.")
+    parser.add_argument("--num_threads", type=int, default=None, help="Number of threads used by PyTorch.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+    torch.manual_seed(args.seed)
+    model = get_tiny_model()
+
+    # 100 feature frames per second of audio
+    max_frames = int(args.audio_minutes * 60 * 100)
+    num_frames = torch.linspace(max_frames // 2, max_frames, args.batch_size).long()
+    input_features = torch.randn(args.batch_size, model.config.num_mel_bins, max_frames)
+    attention_mask = (torch.arange(max_frames)[None] < num_frames[:, None]).long()
+    audio_hours = num_frames.sum().item() / 100 / 3600
+
+    generate_kwargs = {
+        "attention_mask": attention_mask,
+        "return_timestamps": True,
+        "max_new_tokens": args.max_new_tokens,
+        "condition_on_prev_tokens": True,
+    }
+    if not args.no_fallback:
+        # The threshold is set so that a part of the rows of the random model fall back to higher temperatures
+        generate_kwargs.update(
+            {
+                "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+                "logprob_threshold": -6.5,
+                "compression_ratio_threshold": 1.35,
+            }
+        )
+
+    timings = []
+    with torch.no_grad():
+        for run_idx in range(args.num_runs + 1):
+            torch.manual_seed(args.seed + run_idx)
+            start = time.perf_counter()
+            model.generate(input_features, **generate_kwargs)
+            timings.append(time.perf_counter() - start)
+
+    timings = timings[1:]
+    best = min(timings)
+    print(
+        f"batch_size={args.batch_size} audio={audio_hours * 60:.1f}min fallback={not args.no_fallback} "
+        f"runs={[round(t, 3) for t in timings]}"
+    )
+    print(f"best: {best:.3f}s, {best / audio_hours:.1f}s per hour of audio")
+
+
+if __name__ == "__main__":
+    main()
@@ -964,6 +964,7 @@ _import_structure = {
         "EarlyStoppingCallback",
         "PrinterCallback",
         "ProgressCallback",
+        "StepProfilerCallback",
         "TrainerCallback",
         "TrainerControl",
         "TrainerState",
@@ -1227,7 +1228,7 @@ except OptionalDependencyNotAvailable:
     ]
 else:
     _import_structure["image_processing_base"] = ["ImageProcessingMixin"]
-    _import_structure["image_processing_utils"] = ["BaseImageProcessor"]
+    _import_structure["image_processing_utils"] = ["BaseImageProcessor", "PreprocessingCache"]
     _import_structure["image_utils"] = ["ImageFeatureExtractionMixin"]
     _import_structure["models.aria"].extend(["AriaImageProcessor"])
     _import_structure["models.beit"].extend(["BeitFeatureExtractor", "BeitImageProcessor"])
@@ -6171,6 +6172,7 @@ if TYPE_CHECKING:
         EarlyStoppingCallback,
         PrinterCallback,
         ProgressCallback,
+        StepProfilerCallback,
         TrainerCallback,
         TrainerControl,
         TrainerState,
@@ -6405,7 +6407,7 @@ if TYPE_CHECKING:
         from .utils.dummy_vision_objects import *
     else:
         from .image_processing_base import ImageProcessingMixin
-        from .image_processing_utils import BaseImageProcessor
+        from .image_processing_utils import BaseImageProcessor, PreprocessingCache
         from .image_utils import ImageFeatureExtractionMixin
         from .models.aria import AriaImageProcessor
         from .models.beit import BeitFeatureExtractor, BeitImageProcessor
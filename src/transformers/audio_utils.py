@@ -379,6 +379,119 @@ def window_function(
     return padded_window
 
 
+# Number of frames transformed at once by `_framed_stft`
+_STFT_BLOCK_FRAMES = 1024
+
+
+def _frame_waveforms(waveforms: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """
+    Returns a read-only strided view of shape `(..., num_frames, frame_length)` over the frames of `waveforms`, an
+    array of shape `(..., length)`, without copying the samples.
+    """
+    waveforms = np.ascontiguousarray(waveforms)
+    num_frames = 1 + (waveforms.shape[-1] - frame_length) // hop_length
+    item_stride = waveforms.strides[-1]
+    return np.lib.stride_tricks.as_strided(
+        waveforms,
+        shape=waveforms.shape[:-1] + (num_frames, frame_length),
+        strides=waveforms.strides[:-1] + (hop_length * item_stride, item_stride),
+        writeable=False,
+    )
+
+
+def _framed_stft(
+    waveforms: np.ndarray,
+    window: np.ndarray,
+    frame_length: int,
+    hop_length: int,
+    fft_length: int,
+    onesided: bool = True,
+    dither: float = 0.0,
+    preemphasis: Optional[float] = None,
+    remove_dc_offset: Optional[bool] = None,
+    compute_dtype: np.dtype = np.float64,
+) -> np.ndarray:
+    """
+    Computes the complex STFT of `waveforms`, an array of shape `(..., length)`, processing the frames in blocks of
+    `_STFT_BLOCK_FRAMES` to bound the memory used by the intermediate buffers. Returns an array of shape
+    `(..., num_frames, num_frequency_bins)`.
+    """
+    frames = _frame_waveforms(waveforms.astype(compute_dtype, copy=False), frame_length, hop_length)
+    batch_shape, num_frames = frames.shape[:-2], frames.shape[-2]
+    window = window.astype(compute_dtype, copy=False)
+
+    num_frequency_bins = (fft_length // 2) + 1 if onesided else fft_length
+    spectrogram = np.empty(batch_shape + (num_frames, num_frequency_bins), dtype=np.complex64)
+
+    # rfft is faster than fft
+    fft_func = np.fft.rfft if onesided else np.fft.fft
+
+    for start in range(0, num_frames, _STFT_BLOCK_FRAMES):
+        block = frames[..., start : start + _STFT_BLOCK_FRAMES, :]
+
+        if dither != 0.0:
+            # Draw the noise frame by frame, in the same order as a loop over the frames would
+            noise = np.random.randn(block.shape[-2], *batch_shape, frame_length)
+            block = block + dither * np.moveaxis(noise, 0, -2).astype(compute_dtype, copy=False)
+
+        if remove_dc_offset:
+            block = block - block.mean(axis=-1, keepdims=True)
+
+        if preemphasis is not None:
+            block = np.concatenate(
+                [block[..., :1] * (1 - preemphasis), block[..., 1:] - preemphasis * block[..., :-1]], axis=-1
+            )
+
+        spectrogram[..., start : start + _STFT_BLOCK_FRAMES, :] = fft_func(block * window, n=fft_length, axis=-1)
+
+    return spectrogram
+
+
+def _postprocess_spectrogram(
+    spectrogram: np.ndarray,
+    power: Optional[float] = 1.0,
+    mel_filters: Optional[np.ndarray] = None,
+    mel_floor: float = 1e-10,
+    log_mel: Optional[str] = None,
+    reference: float = 1.0,
+    min_value: float = 1e-10,
+    db_range: Optional[float] = None,
+    dtype: np.dtype = np.float32,
+) -> np.ndarray:
+    """
+    Turns the complex STFT of shape `(num_frames, num_frequency_bins)` returned by `_framed_stft` into the spectrogram
+    of shape `(num_frequency_bins, num_frames)` (or `(num_mel_filters, num_frames)`) described by the arguments of
+    `spectrogram`.
+    """
+    # note: ** is much faster than np.power
+    if power is not None:
+        spectrogram = np.abs(spectrogram, dtype=np.float64) ** power
+
+    spectrogram = spectrogram.T
+
+    if mel_filters is not None:
+        spectrogram = np.maximum(mel_floor, np.dot(mel_filters.T, spectrogram))
+
+    if power is not None and log_mel is not None:
+        if log_mel == "log":
+            spectrogram = np.log(spectrogram)
+        elif log_mel == "log10":
+            spectrogram = np.log10(spectrogram)
+        elif log_mel == "dB":
+            if power == 1.0:
+                spectrogram = amplitude_to_db(spectrogram, reference, min_value, db_range)
+            elif power == 2.0:
+                spectrogram = power_to_db(spectrogram, reference, min_value, db_range)
+            else:
+                raise ValueError(f"Cannot use log_mel option '{log_mel}' with power {power}")
+        else:
+            raise ValueError(f"Unknown log_mel option: {log_mel}")
+
+        spectrogram = np.asarray(spectrogram, dtype)
+
+    return spectrogram
+
+
 # TODO This method does not support batching yet as we are mainly focused on inference.
 def spectrogram(
     waveform: np.ndarray,
@@ -400,6 +513,7 @@ def spectrogram(
     db_range: Optional[float] = None,
     remove_dc_offset: Optional[bool] = None,
     dtype: np.dtype = np.float32,
+    compute_dtype: np.dtype = np.float64,
 ) -> np.ndarray:
     """
     Calculates a spectrogram over one waveform using the Short-Time Fourier Transform.
@@ -431,9 +545,9 @@ def spectrogram(
     padded window can be obtained from `window_function()`. The FFT input buffer may be larger than the analysis frame,
     typically the next power of two.
 
-    Note: This function is not optimized for speed yet. It should be mostly compatible with `librosa.stft` and
-    `torchaudio.functional.transforms.Spectrogram`, although it is more flexible due to the different ways spectrograms
-    can be constructed.
+    All the frames are taken as strided views of the waveform and transformed with a single batched DFT. This function
+    should be mostly compatible with `librosa.stft` and `torchaudio.functional.transforms.Spectrogram`, although it is
+    more flexible due to the different ways spectrograms can be constructed.
 
     Args:
         waveform (`np.ndarray` of shape `(length,)`):
@@ -493,6 +607,9 @@ def spectrogram(
         dtype (`np.dtype`, *optional*, defaults to `np.float32`):
             Data type of the spectrogram tensor. If `power` is None, this argument is ignored and the dtype will be
             `np.complex64`.
+        compute_dtype (`np.dtype`, *optional*, defaults to `np.float64`):
+            Data type of the frames the DFT is computed on. `np.float32` is faster and uses less memory, at the cost of
+            some precision.
 
     Returns:
         `nd.array` containing a spectrogram of shape `(num_frequency_bins, length)` for a regular spectrogram or shape
@@ -529,66 +646,30 @@ def spectrogram(
         padding = [(int(frame_length // 2), int(frame_length // 2))]
         waveform = np.pad(waveform, padding, mode=pad_mode)
 
-    # promote to float64, since np.fft uses float64 internally
-    waveform = waveform.astype(np.float64)
-    window = window.astype(np.float64)
-
-    # split waveform into frames of frame_length size
-    num_frames = int(1 + np.floor((waveform.size - frame_length) / hop_length))
-
-    num_frequency_bins = (fft_length // 2) + 1 if onesided else fft_length
-    spectrogram = np.empty((num_frames, num_frequency_bins), dtype=np.complex64)
-
-    # rfft is faster than fft
-    fft_func = np.fft.rfft if onesided else np.fft.fft
-    buffer = np.zeros(fft_length)
-
-    timestep = 0
-    for frame_idx in range(num_frames):
-        buffer[:frame_length] = waveform[timestep : timestep + frame_length]
-
-        if dither != 0.0:
-            buffer[:frame_length] += dither * np.random.randn(frame_length)
-
-        if remove_dc_offset:
-            buffer[:frame_length] = buffer[:frame_length] - buffer[:frame_length].mean()
-
-        if preemphasis is not None:
-            buffer[1:frame_length] -= preemphasis * buffer[: frame_length - 1]
-            buffer[0] *= 1 - preemphasis
-
-        buffer[:frame_length] *= window
-
-        spectrogram[frame_idx] = fft_func(buffer)
-        timestep += hop_length
-
-    # note: ** is much faster than np.power
-    if power is not None:
-        spectrogram = np.abs(spectrogram, dtype=np.float64) ** power
-
-    spectrogram = spectrogram.T
-
-    if mel_filters is not None:
-        spectrogram = np.maximum(mel_floor, np.dot(mel_filters.T, spectrogram))
-
-    if power is not None and log_mel is not None:
-        if log_mel == "log":
-            spectrogram = np.log(spectrogram)
-        elif log_mel == "log10":
-            spectrogram = np.log10(spectrogram)
-        elif log_mel == "dB":
-            if power == 1.0:
-                spectrogram = amplitude_to_db(spectrogram, reference, min_value, db_range)
-            elif power == 2.0:
-                spectrogram = power_to_db(spectrogram, reference, min_value, db_range)
-            else:
-                raise ValueError(f"Cannot use log_mel option '{log_mel}' with power {power}")
-        else:
-            raise ValueError(f"Unknown log_mel option: {log_mel}")
-
-        spectrogram = np.asarray(spectrogram, dtype)
+    spectrogram = _framed_stft(
+        waveform,
+        window,
+        frame_length,
+        hop_length,
+        fft_length,
+        onesided=onesided,
+        dither=dither,
+        preemphasis=preemphasis,
+        remove_dc_offset=remove_dc_offset,
+        compute_dtype=compute_dtype,
+    )
 
-    return spectrogram
+    return _postprocess_spectrogram(
+        spectrogram,
+        power=power,
+        mel_filters=mel_filters,
+        mel_floor=mel_floor,
+        log_mel=log_mel,
+        reference=reference,
+        min_value=min_value,
+        db_range=db_range,
+        dtype=dtype,
+    )
 
 
 def spectrogram_batch(
@@ -611,6 +692,7 @@ def spectrogram_batch(
     db_range: Optional[float] = None,
     remove_dc_offset: Optional[bool] = None,
     dtype: np.dtype = np.float32,
+    compute_dtype: np.dtype = np.float64,
 ) -> List[np.ndarray]:
     """
     Calculates spectrograms for a list of waveforms using the Short-Time Fourier Transform, optimized for batch processing.
@@ -686,6 +768,9 @@ def spectrogram_batch(
             Whether to remove the DC offset from each frame.
         dtype (`np.dtype`, *optional*, defaults to `np.float32`):
             Data type of the output spectrogram.
+        compute_dtype (`np.dtype`, *optional*, defaults to `np.float64`):
+            Data type of the frames the DFT is computed on. `np.float32` is faster and uses less memory, at the cost of
+            some precision.
 
     Returns:
         List[`np.ndarray`]: A list of spectrogram arrays, one for each input waveform.
@@ -735,40 +820,21 @@ def spectrogram_batch(
         dtype=dtype,
     )
 
-    # Promote to float64, since np.fft uses float64 internally
-    padded_waveform_batch = padded_waveform_batch.astype(np.float64)
-    window = window.astype(np.float64)
-
-    # Split waveform into frames of frame_length size
-    num_frames = int(1 + np.floor((padded_waveform_batch.shape[1] - frame_length) / hop_length))
     # these lengths will be used to remove padding later
     true_num_frames = [int(1 + np.floor((length - frame_length) / hop_length)) for length in original_waveform_lengths]
-    num_batches = padded_waveform_batch.shape[0]
-
-    num_frequency_bins = (fft_length // 2) + 1 if onesided else fft_length
-    spectrogram = np.empty((num_batches, num_frames, num_frequency_bins), dtype=np.complex64)
-
-    # rfft is faster than fft
-    fft_func = np.fft.rfft if onesided else np.fft.fft
-    buffer = np.zeros((num_batches, fft_length))
-
-    for frame_idx in range(num_frames):
-        timestep = frame_idx * hop_length
-        buffer[:, :frame_length] = padded_waveform_batch[:, timestep : timestep + frame_length]
 
-        if dither != 0.0:
-            buffer[:, :frame_length] += dither * np.random.randn(*buffer[:, :frame_length].shape)
-
-        if remove_dc_offset:
-            buffer[:, :frame_length] -= buffer[:, :frame_length].mean(axis=1, keepdims=True)
-
-        if preemphasis is not None:
-            buffer[:, 1:frame_length] -= preemphasis * buffer[:, : frame_length - 1]
-            buffer[:, 0] *= 1 - preemphasis
-
-        buffer[:, :frame_length] *= window
-
-        spectrogram[:, frame_idx] = fft_func(buffer)
+    spectrogram = _framed_stft(
+        padded_waveform_batch,
+        window,
+        frame_length,
+        hop_length,
+        fft_length,
+        onesided=onesided,
+        dither=dither,
+        preemphasis=preemphasis,
+        remove_dc_offset=remove_dc_offset,
+        compute_dtype=compute_dtype,
+    )
 
     # Note: ** is much faster than np.power
     if power is not None:
@@ -802,6 +868,183 @@ def spectrogram_batch(
     return spectrogram_list
 
 
+class StreamingSpectrogram:
+    """
+    Computes the same spectrogram as [`~audio_utils.spectrogram`] over a waveform received in chunks of arbitrary
+    size. Each call with a new chunk returns the frames that could be completed with it, and
+    [`~audio_utils.StreamingSpectrogram.flush`] returns the remaining frames once the waveform is over. The samples of
+    the incomplete frames are kept between calls, so the cost of each call is proportional to the size of the chunk.
+
+    The arguments are the same as the ones of [`~audio_utils.spectrogram`], except `db_range` which depends on the
+    whole spectrogram and isn't supported.
+
+    Example:
+
+    ```python
+    >>> import numpy as np
+    >>> from transformers.audio_utils import StreamingSpectrogram, spectrogram, window_function
+
+    >>> waveform = np.random.randn(16000)
+    >>> window = window_function(400, "hann")
+    >>> streamer = StreamingSpectrogram(window, frame_length=400, hop_length=160)
+    >>> frames = [streamer(chunk) for chunk in np.array_split(waveform, 7)] + [streamer.flush()]
+    >>> np.allclose(np.concatenate(frames, axis=1), spectrogram(waveform, window, frame_length=400, hop_length=160))
+    True
+    ```
+    """
+
+    def __init__(
+        self,
+        window: np.ndarray,
+        frame_length: int,
+        hop_length: int,
+        fft_length: Optional[int] = None,
+        power: Optional[float] = 1.0,
+        center: bool = True,
+        pad_mode: str = "reflect",
+        onesided: bool = True,
+        dither: float = 0.0,
+        preemphasis: Optional[float] = None,
+        mel_filters: Optional[np.ndarray] = None,
+        mel_floor: float = 1e-10,
+        log_mel: Optional[str] = None,
+        reference: float = 1.0,
+        min_value: float = 1e-10,
+        remove_dc_offset: Optional[bool] = None,
+        dtype: np.dtype = np.float32,
+        compute_dtype: np.dtype = np.float64,
+    ):
+        if fft_length is None:
+            fft_length = frame_length
+
+        if frame_length > fft_length:
+            raise ValueError(f"frame_length ({frame_length}) may not be larger than fft_length ({fft_length})")
+
+        if len(window) != frame_length:
+            raise ValueError(f"Length of the window ({len(window)}) must equal frame_length ({frame_length})")
+
+        if hop_length <= 0:
+            raise ValueError("hop_length must be greater than zero")
+
+        if power is None and mel_filters is not None:
+            raise ValueError(
+                "You have provided `mel_filters` but `power` is `None`. Mel spectrogram computation is not yet "
+                "supported for complex-valued spectrogram. Specify `power` to fix this issue."
+            )
+
+        self.window = window
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.fft_length = fft_length
+        self.center = center
+        self.pad_mode = pad_mode
+        self.stft_kwargs = {
+            "onesided": onesided,
+            "dither": dither,
+            "preemphasis": preemphasis,
+            "remove_dc_offset": remove_dc_offset,
+            "compute_dtype": compute_dtype,
+        }
+        self.postprocess_kwargs = {
+            "power": power,
+            "mel_filters": mel_filters,
+            "mel_floor": mel_floor,
+            "log_mel": log_mel,
+            "reference": reference,
+            "min_value": min_value,
+            "dtype": dtype,
+        }
+        self.num_frequency_bins = (fft_length // 2) + 1 if onesided else fft_length
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the samples received so far, to start over with a new waveform.
+        """
+        # Samples (including the padding at the start of the waveform) from which the next frames are taken
+        self._buffer = np.zeros(0)
+        # Index in `_buffer` where the next frame starts
+        self._next_frame_start = 0
+        self._is_start_padded = not self.center
+
+    def _compute_frames(self, num_frames: int) -> np.ndarray:
+        if num_frames <= 0:
+            spectrogram = np.zeros((0, self.num_frequency_bins), dtype=np.complex64)
+        else:
+            end = self._next_frame_start + (num_frames - 1) * self.hop_length + self.frame_length
+            spectrogram = _framed_stft(
+                self._buffer[self._next_frame_start : end],
+                self.window,
+                self.frame_length,
+                self.hop_length,
+                self.fft_length,
+                **self.stft_kwargs,
+            )
+            self._next_frame_start += num_frames * self.hop_length
+        return _postprocess_spectrogram(spectrogram, **self.postprocess_kwargs)
+
+    def _num_complete_frames(self) -> int:
+        available = len(self._buffer) - self._next_frame_start
+        if available < self.frame_length:
+            return 0
+        return 1 + (available - self.frame_length) // self.hop_length
+
+    def __call__(self, waveform: np.ndarray) -> np.ndarray:
+        """
+        Adds the samples of `waveform` to the stream.
+
+        Args:
+            waveform (`np.ndarray` of shape `(length,)`):
+                The next chunk of the waveform. This must be a single real-valued, mono waveform.
+
+        Returns:
+            `np.ndarray` of shape `(num_frequency_bins, num_new_frames)` (or `(num_mel_filters, num_new_frames)`)
+            containing the frames of the spectrogram completed by this chunk.
+        """
+        waveform = np.asarray(waveform)
+        if waveform.ndim != 1:
+            raise ValueError(f"Input waveform must have only one dimension, shape is {waveform.shape}")
+
+        if np.iscomplexobj(waveform):
+            raise ValueError("Complex-valued input waveforms are not currently supported")
+
+        self._buffer = np.concatenate([self._buffer, waveform])
+
+        padding = self.frame_length // 2
+        if not self._is_start_padded:
+            # Reflect padding at the start needs `padding + 1` samples
+            if len(self._buffer) <= padding:
+                return self._compute_frames(0)
+            self._buffer = np.pad(self._buffer, [(padding, 0)], mode=self.pad_mode)
+            self._is_start_padded = True
+
+        spectrogram = self._compute_frames(self._num_complete_frames())
+
+        # Only keep the samples of the next frames, and the ones needed to pad the end of the waveform
+        keep_from = min(self._next_frame_start, max(len(self._buffer) - padding - 1, 0))
+        self._buffer = self._buffer[keep_from:]
+        self._next_frame_start -= keep_from
+        return spectrogram
+
+    def flush(self) -> np.ndarray:
+        """
+        Ends the waveform, and resets the stream so it can be used for a new waveform.
+
+        Returns:
+            `np.ndarray` of shape `(num_frequency_bins, num_new_frames)` (or `(num_mel_filters, num_new_frames)`)
+            containing the remaining frames of the spectrogram.
+        """
+        padding = self.frame_length // 2
+        if self.center and len(self._buffer) > 0:
+            start_padding = 0 if self._is_start_padded else padding
+            self._buffer = np.pad(self._buffer, [(start_padding, padding)], mode=self.pad_mode)
+            self._is_start_padded = True
+
+        spectrogram = self._compute_frames(self._num_complete_frames())
+        self.reset()
+        return spectrogram
+
+
 def power_to_db(
     spectrogram: np.ndarray,
     reference: float = 1.0,
@@ -996,6 +1239,153 @@ def amplitude_to_db_batch(
     return spectrogram
 
 
+def voice_activity_segments(
+    waveform: np.ndarray,
+    sampling_rate: int,
+    frame_duration: float = 0.03,
+    hop_duration: float = 0.01,
+    speech_band: Tuple[float, float] = (80.0, 4000.0),
+    threshold_db: float = 12.0,
+    dynamic_range_db: float = 20.0,
+    min_energy_db: float = -70.0,
+    max_spectral_flatness: Optional[float] = None,
+    min_silence_duration: float = 0.3,
+    min_speech_duration: float = 0.1,
+    speech_pad_duration: float = 0.1,
+    max_segment_length: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Finds the regions of a waveform that contain speech with a lightweight energy-based voice activity detector.
+
+    The waveform is split into overlapping frames whose energy in the `speech_band` frequency range is compared to an
+    adaptive threshold: a frame contains speech when its energy is more than `threshold_db` above the noise floor,
+    estimated as the 10th percentile of the frame energies, and above `min_energy_db`. When that estimate is less than
+    `dynamic_range_db` below the loudest frame, the audio is considered to contain no silence and all the frames less
+    than `dynamic_range_db` below the loudest one contain speech instead. Pauses shorter than `min_silence_duration` are then filled, speech regions
+    shorter than `min_speech_duration` are dropped and the remaining ones are extended by `speech_pad_duration` on
+    each side.
+
+    Args:
+        waveform (`np.ndarray` of shape `(length,)`):
+            The input waveform, with samples in the `[-1, 1]` range.
+        sampling_rate (`int`):
+            The sampling rate of the waveform, in Hz.
+        frame_duration (`float`, *optional*, defaults to 0.03):
+            The duration of the analysis frames, in seconds.
+        hop_duration (`float`, *optional*, defaults to 0.01):
+            The duration between the starts of two consecutive frames, in seconds.
+        speech_band (`Tuple[float, float]`, *optional*, defaults to `(80.0, 4000.0)`):
+            The frequency range, in Hz, in which the energy of the frames is measured. Restricting it to the
+            frequencies of speech makes the detector robust to low-frequency hum and high-frequency hiss.
+        threshold_db (`float`, *optional*, defaults to 12.0):
+            How far above the noise floor, in decibels, the energy of a frame must be for it to contain speech.
+        dynamic_range_db (`float`, *optional*, defaults to 20.0):
+            When the estimated noise floor is less than `dynamic_range_db` below the loudest frame, the audio doesn't
+            contain any silence to estimate it from, and the frames whose energy is less than `dynamic_range_db` below
+            the loudest frame contain speech, so quiet speech is kept. Audio with a real noise floor is unaffected.
+        min_energy_db (`float`, *optional*, defaults to -70.0):
+            The minimum energy of a frame containing speech, in decibels relative to a full-scale signal.
+        max_spectral_flatness (`float`, *optional*):
+            If set, frames whose spectral flatness (between 0 for a pure tone and 1 for white noise) in the
+            `speech_band` is above this value never contain speech, which helps discarding loud stationary noise.
+        min_silence_duration (`float`, *optional*, defaults to 0.3):
+            The minimum duration of a pause between two speech regions, in seconds. Shorter pauses are considered to
+            be part of the speech.
+        min_speech_duration (`float`, *optional*, defaults to 0.1):
+            The minimum duration of a speech region, in seconds. Shorter regions are discarded.
+        speech_pad_duration (`float`, *optional*, defaults to 0.1):
+            The duration of audio added before and after each speech region, in seconds, so the beginning and the end
+            of the utterances are not cut.
+        max_segment_length (`int`, *optional*):
+            If set, the maximum length of the returned segments, in samples. Longer speech regions are cut at their
+            quietest frame between half of and `max_segment_length`.
+
+    Returns:
+        `np.ndarray` of shape `(num_segments, 2)`: the `[start, end)` sample indices of the segments containing speech,
+        in increasing order.
+    """
+    if waveform.ndim != 1:
+        raise ValueError(f"Input waveform must have only one dimension, shape is {waveform.shape}")
+
+    frame_length = max(1, int(round(frame_duration * sampling_rate)))
+    hop_length = max(1, int(round(hop_duration * sampling_rate)))
+    if max_segment_length is not None and max_segment_length < frame_length:
+        raise ValueError(
+            f"max_segment_length ({max_segment_length}) must be at least the frame length ({frame_length})"
+        )
+
+    segments = np.zeros((0, 2), dtype=np.int64)
+    if waveform.shape[0] == 0:
+        return segments
+
+    length = waveform.shape[0]
+    padded_length = max(length, frame_length)
+    padded_length += -(padded_length - frame_length) % hop_length
+    waveform = np.pad(waveform, (0, padded_length - length))
+
+    fft_length = optimal_fft_length(frame_length)
+    window = window_function(frame_length, "hann")
+    power = np.abs(_framed_stft(waveform, window, frame_length, hop_length, fft_length)) ** 2
+    frequencies = np.fft.rfftfreq(fft_length, d=1.0 / sampling_rate)
+    power = power[:, (frequencies >= speech_band[0]) & (frequencies <= speech_band[1])]
+    if power.shape[1] == 0:
+        raise ValueError(f"speech_band {speech_band} doesn't contain any frequency bin")
+
+    # Mean square of the band-passed frames, so a full-scale sine wave is at about -3 dB
+    band_energy = 2 * power.sum(axis=1) / (fft_length * np.sum(window**2))
+    energy_db = 10.0 * np.log10(np.maximum(band_energy, 1e-10))
+    noise_floor_db, loudest_db = np.percentile(energy_db, 10), energy_db.max()
+    threshold = noise_floor_db + threshold_db
+    if loudest_db - noise_floor_db < dynamic_range_db:
+        # The 10th percentile is quiet speech rather than noise, only drop the frames much quieter than the loudest one
+        threshold = loudest_db - dynamic_range_db
+    is_speech = energy_db > max(threshold, min_energy_db)
+    if max_spectral_flatness is not None:
+        power = np.maximum(power, 1e-20)
+        flatness = np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+        is_speech &= flatness <= max_spectral_flatness
+
+    # Runs of speech frames, as [start, end) frame indices
+    edges = np.diff(np.concatenate([[0], is_speech.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if starts.shape[0] == 0:
+        return segments
+
+    min_silence_frames = int(round(min_silence_duration * sampling_rate / hop_length))
+    is_pause = np.concatenate([[True], starts[1:] - ends[:-1] >= min_silence_frames])
+    starts, ends = starts[is_pause], ends[np.roll(is_pause, -1)]
+
+    min_speech_frames = int(round(min_speech_duration * sampling_rate / hop_length))
+    is_long_enough = ends - starts >= min_speech_frames
+    starts, ends = starts[is_long_enough], ends[is_long_enough]
+    if starts.shape[0] == 0:
+        return segments
+
+    speech_pad = int(round(speech_pad_duration * sampling_rate))
+    start_samples = np.maximum(starts * hop_length - speech_pad, 0)
+    end_samples = np.minimum((ends - 1) * hop_length + frame_length + speech_pad, length)
+    is_separate = np.concatenate([[True], start_samples[1:] > end_samples[:-1]])
+    segments = np.stack([start_samples[is_separate], end_samples[np.roll(is_separate, -1)]], axis=1)
+    if max_segment_length is None:
+        return segments.astype(np.int64)
+
+    split_segments = []
+    for start, end in segments:
+        while end - start > max_segment_length:
+            # Cut at the quietest frame fully inside the second half of the longest allowed segment
+            first_frame = -(-(start + max_segment_length // 2) // hop_length)
+            last_frame = min((start + max_segment_length - frame_length) // hop_length, energy_db.shape[0] - 1)
+            if first_frame <= last_frame:
+                quietest_frame = first_frame + np.argmin(energy_db[first_frame : last_frame + 1])
+                cut = quietest_frame * hop_length + frame_length // 2
+            else:
+                cut = start + max_segment_length
+            split_segments.append((start, cut))
+            start = cut
+        split_segments.append((start, end))
+    return np.array(split_segments, dtype=np.int64)
+
+
 ### deprecated functions below this line ###
 
 
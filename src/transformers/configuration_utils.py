@@ -191,7 +191,9 @@ class PretrainedConfig(PushToHubMixin):
             v5.
         loss_type (`str`, *optional*):
             The type of loss that the model should use. It should be in `LOSS_MAPPING`'s keys, otherwise the loss will
-            be automatically infered from the model architecture.
+            be automatically infered from the model architecture. For instance, `"ForCausalLMChunked"` makes the causal
+            language models supporting it compute their training loss from the hidden states by chunks, without
+            materializing the full logits.
     """
 
     model_type: str = ""
@@ -1103,23 +1103,10 @@ class DataCollatorForWholeWordMask(DataCollatorForLanguageModeling):
             examples = [{"input_ids": e} for e in examples]
 
         batch_input = _torch_collate_batch(input_ids, self.tokenizer, pad_to_multiple_of=self.pad_to_multiple_of)
+        lengths = [len(ids) for ids in input_ids]
+        chinese_refs = [tolist(e["chinese_ref"]) if "chinese_ref" in e else None for e in examples]
 
-        mask_labels = []
-        for e in examples:
-            ref_tokens = []
-            for id in tolist(e["input_ids"]):
-                token = self.tokenizer._convert_id_to_token(id)
-                ref_tokens.append(token)
-
-            # For Chinese tokens, we need extra inf to mark sub-word, e.g [喜,欢]-> [喜，##欢]
-            if "chinese_ref" in e:
-                ref_pos = tolist(e["chinese_ref"])
-                len_seq = len(e["input_ids"])
-                for i in range(len_seq):
-                    if i in ref_pos:
-                        ref_tokens[i] = "##" + ref_tokens[i]
-            mask_labels.append(self._whole_word_mask(ref_tokens))
-        batch_mask = _torch_collate_batch(mask_labels, self.tokenizer, pad_to_multiple_of=self.pad_to_multiple_of)
+        batch_mask = self._torch_whole_word_mask(batch_input, lengths, chinese_refs)
         inputs, labels = self.torch_mask_tokens(batch_input, batch_mask)
         return {"input_ids": inputs, "labels": labels}
 
@@ -1228,6 +1215,108 @@ class DataCollatorForWholeWordMask(DataCollatorForLanguageModeling):
         mask_labels = [1 if i in covered_indexes else 0 for i in range(len(input_tokens))]
         return mask_labels
 
+    def _get_vocab_word_flags(self):
+        """
+        Returns two boolean tensors indexed by token id: whether the token continues the previous word (it is prefixed
+        with *##*) and whether it is excluded from the word candidates (`[CLS]`/`[SEP]`). They are computed once per
+        vocabulary size and cached on the collator.
+        """
+        import torch
+
+        vocab_size = len(self.tokenizer)
+        cached = getattr(self, "_vocab_word_flags", None)
+        if cached is not None and cached[0] == vocab_size:
+            return cached[1], cached[2]
+
+        if not isinstance(self.tokenizer, (BertTokenizer, BertTokenizerFast)):
+            warnings.warn(
+                "DataCollatorForWholeWordMask is only suitable for BertTokenizer-like tokenizers. "
+                "Please refer to the documentation for more information."
+            )
+
+        tokens = self.tokenizer.convert_ids_to_tokens(list(range(vocab_size)))
+        is_subword = torch.tensor([token is not None and token.startswith("##") for token in tokens], dtype=torch.bool)
+        is_skipped = torch.tensor([token in ("[CLS]", "[SEP]") for token in tokens], dtype=torch.bool)
+        self._vocab_word_flags = (vocab_size, is_subword, is_skipped)
+        return is_subword, is_skipped
+
+    def _torch_whole_word_mask(
+        self,
+        input_ids: Any,
+        lengths: List[int],
+        chinese_refs: Optional[List[Optional[List[int]]]] = None,
+        max_predictions=512,
+    ):
+        """
+        Batched equivalent of `_whole_word_mask`: get 0/1 labels for masked tokens with whole word mask proxy for a
+        padded batch of `input_ids`, using tensor ops instead of per-token string checks. The examples of `lengths`
+        tokens are expected to be padded on the `padding_side` of the tokenizer, like `_torch_collate_batch` does.
+
+        Words are shuffled per example and greedily selected in that order as long as they fit in the budget of
+        `round(length * mlm_probability)` tokens, skipping words that would exceed it, exactly like `_whole_word_mask`.
+        """
+        import torch
+
+        batch_size, seq_len = input_ids.shape
+        is_subword, is_skipped = self._get_vocab_word_flags()
+        lengths = torch.tensor(lengths, dtype=torch.long)
+        # Index of the first token of each example in the padded batch
+        if self.tokenizer.padding_side == "left":
+            offsets = seq_len - lengths
+        else:
+            offsets = torch.zeros_like(lengths)
+
+        # Ids outside of the vocabulary are converted to the unknown token, which starts a new word.
+        in_vocab = (input_ids >= 0) & (input_ids < is_subword.shape[0])
+        vocab_ids = input_ids.clamp(0, is_subword.shape[0] - 1)
+        subword = is_subword[vocab_ids] & in_vocab
+        skipped = is_skipped[vocab_ids] & in_vocab
+
+        # For Chinese tokens, we need extra inf to mark sub-word, e.g [喜,欢]-> [喜，##欢]
+        if chinese_refs is not None:
+            for i, ref_pos in enumerate(chinese_refs):
+                if ref_pos:
+                    ref_pos = torch.tensor(ref_pos, dtype=torch.long)
+                    subword[i, ref_pos[ref_pos < lengths[i]] + offsets[i]] = True
+
+        positions = torch.arange(seq_len)
+        in_example = (positions[None, :] >= offsets[:, None]) & (positions[None, :] < (offsets + lengths)[:, None])
+        candidates = in_example & ~skipped
+        # The first candidate of a sequence always starts a word, even if it is a sub-word token.
+        word_starts = candidates & (~subword | (candidates.cumsum(dim=1) == 1))
+        word_index = word_starts.long().cumsum(dim=1) - 1
+        in_word = candidates & (word_index >= 0)
+        word_index = word_index.clamp(min=0)
+
+        num_words = word_starts.sum(dim=1)
+        max_words = max(int(num_words.max()), 1) if batch_size > 0 else 1
+        word_lengths = torch.zeros(batch_size, max_words, dtype=torch.long)
+        word_lengths.scatter_add_(1, word_index, in_word.long())
+        word_valid = torch.arange(max_words)[None, :] < num_words[:, None]
+
+        # Shuffle the words of each sequence by sorting random keys, padded words go last.
+        keys = torch.rand(batch_size, max_words).masked_fill_(~word_valid, 2.0)
+        order = keys.argsort(dim=1)
+        sorted_lengths = word_lengths.gather(1, order)
+        pending = word_valid.gather(1, order)
+        selected = torch.zeros_like(pending)
+
+        num_to_predict = (lengths.double() * self.mlm_probability).round().long().clamp(min=1, max=max_predictions)
+        budget = num_to_predict.clone()
+        # Each pass selects the longest prefix of pending words that fits in the budget, then drops every pending word
+        # that can no longer fit. The length of the blocking word strictly decreases between passes, so this terminates
+        # after at most as many passes as there are distinct word lengths.
+        while pending.any():
+            cumulative = (sorted_lengths * pending).cumsum(dim=1)
+            fits = pending & (cumulative <= budget[:, None])
+            selected |= fits
+            budget -= (sorted_lengths * fits).sum(dim=1)
+            pending &= ~fits & (sorted_lengths <= budget[:, None])
+
+        word_selected = torch.zeros_like(selected).scatter_(1, order, selected)
+        mask_labels = in_word & word_selected.gather(1, word_index)
+        return mask_labels.long()
+
     def torch_mask_tokens(self, inputs: Any, mask_labels: Any) -> Tuple[Any, Any]:
         """
         Prepare masked tokens inputs/labels for masked language modeling: 80% MASK, 10% random, 10% original. Set
@@ -1245,10 +1334,8 @@ class DataCollatorForWholeWordMask(DataCollatorForLanguageModeling):
 
         probability_matrix = mask_labels
 
-        special_tokens_mask = [
-            self.tokenizer.get_special_tokens_mask(val, already_has_special_tokens=True) for val in labels.tolist()
-        ]
-        probability_matrix.masked_fill_(torch.tensor(special_tokens_mask, dtype=torch.bool), value=0.0)
+        special_tokens_mask = torch.isin(labels, torch.tensor(self.tokenizer.all_special_ids, dtype=labels.dtype))
+        probability_matrix.masked_fill_(special_tokens_mask, value=0.0)
         if self.tokenizer.pad_token is not None:
             padding_mask = labels.eq(self.tokenizer.pad_token_id)
             probability_matrix.masked_fill_(padding_mask, value=0.0)
@@ -1789,12 +1876,31 @@ class DataCollatorWithFlattening(DefaultDataCollator):
     - concatate the entire mini batch into single long sequence [1, total_tokens]
     - uses `separator_id` to separate sequences within the concatenated `labels`, default value is -100
     - no padding will be added, returns `input_ids`, `labels` and `position_ids`
+    - keeps the `position_ids` of the features if they are provided (e.g. by [`~trainer_pt_utils.PackedDataset`]),
+      in which case every position 0 starts a new sequence
+    - optionally returns the cumulative sequence lengths and maximum sequence length of the packed sequences as
+      `cu_seq_lens_q`/`cu_seq_lens_k` and `max_length_q`/`max_length_k`, so that flash attention does not need to
+      recover them from `position_ids` in every layer
+
+    The `input_ids` and `labels` of each feature can be lists, NumPy arrays or tensors. The packed batch is built in
+    preallocated buffers instead of by concatenating Python lists.
+
+    Args:
+        return_position_ids (`bool`, *optional*, defaults to `True`):
+            Whether to return the `position_ids` of each token within its own sequence.
+        separator_id (`int`, *optional*, defaults to -100):
+            The label id used in place of the first label of each sequence.
+        return_flash_attn_kwargs (`bool`, *optional*, defaults to `False`):
+            Whether to return the [`~modeling_flash_attention_utils.FlashAttentionKwargs`] (`cu_seq_lens_q`,
+            `cu_seq_lens_k`, `max_length_q` and `max_length_k`) of the packed batch. Only use it with models that
+            forward these keyword arguments to their attention layers.
     """
 
-    def __init__(self, *args, return_position_ids=True, separator_id=-100, **kwargs):
+    def __init__(self, *args, return_position_ids=True, separator_id=-100, return_flash_attn_kwargs=False, **kwargs):
         super().__init__(*args, **kwargs)
         self.return_position_ids = return_position_ids
         self.separator_id = separator_id
+        self.return_flash_attn_kwargs = return_flash_attn_kwargs
         warnings.warn(
             "Using `DataCollatorWithFlattening` will flatten the entire mini batch into single long sequence."
             "Make sure your attention computation is able to handle it!"
@@ -1806,15 +1912,59 @@ class DataCollatorWithFlattening(DefaultDataCollator):
         if separator_id is None:
             separator_id = self.separator_id
         is_labels_provided = "labels" in features[0]
-        ret = {"input_ids": [], "labels": []}
+        is_position_ids_provided = "position_ids" in features[0]
+
+        lengths = np.fromiter((len(feature["input_ids"]) for feature in features), dtype=np.int64, count=len(features))
+        offsets = np.zeros(len(features) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        total_length = int(offsets[-1])
+
+        input_ids = np.empty((1, total_length), dtype=np.int64)
+        labels = np.empty((1, total_length), dtype=np.int64)
+        position_ids = np.empty((1, total_length), dtype=np.int64) if is_position_ids_provided else None
+        for feature, start, end in zip(features, offsets[:-1], offsets[1:]):
+            input_ids[0, start:end] = _to_numpy(feature["input_ids"])
+            labels[0, start:end] = _to_numpy(feature["labels"]) if is_labels_provided else input_ids[0, start:end]
+            if is_position_ids_provided:
+                position_ids[0, start:end] = _to_numpy(feature["position_ids"])
+
+        if is_position_ids_provided:
+            is_sequence_start = position_ids[0] == 0
+            is_sequence_start[offsets[:-1][lengths > 0]] = True
+            starts = np.flatnonzero(is_sequence_start)
+            cu_seq_lens = np.append(starts, total_length)
+        else:
+            cu_seq_lens = offsets
+            starts = offsets[:-1][lengths > 0]
+            position_ids = (np.arange(total_length) - np.repeat(offsets[:-1], lengths))[None, :]
+        labels[0, starts] = separator_id
+
+        batch = {"input_ids": input_ids, "labels": labels}
         if self.return_position_ids:
-            ret.update({"position_ids": []})
-        for idx in range(0, len(features)):
-            ret["input_ids"] += features[idx]["input_ids"]
-            if is_labels_provided:
-                ret["labels"] += [separator_id] + features[idx]["labels"][1:]
-            else:
-                ret["labels"] += [separator_id] + features[idx]["input_ids"][1:]
-            if self.return_position_ids:
-                ret["position_ids"] += list(range(len(features[idx]["input_ids"])))
-        return default_data_collator([ret], return_tensors)
+            batch["position_ids"] = position_ids
+        if self.return_flash_attn_kwargs:
+            # Flash attention expects int32 cumulative lengths, which are not batched.
+            batch["cu_seq_lens_q"] = batch["cu_seq_lens_k"] = cu_seq_lens.astype(np.int32)
+            batch["max_length_q"] = batch["max_length_k"] = int(np.diff(cu_seq_lens).max(initial=0))
+
+        if return_tensors == "pt":
+            import torch
+
+            to_tensor = torch.from_numpy
+        elif return_tensors == "tf":
+            import tensorflow as tf
+
+            to_tensor = tf.convert_to_tensor
+        elif return_tensors == "np":
+            return batch
+        else:
+            raise ValueError(f"Framework '{return_tensors}' not recognized!")
+        return {k: to_tensor(v) if isinstance(v, np.ndarray) else v for k, v in batch.items()}
+
+
+def _to_numpy(x):
+    if isinstance(x, (list, tuple, np.ndarray)):
+        return x
+    elif hasattr(x, "numpy"):  # Torch and TF tensors, without needing the imports
+        return x.numpy()
+    return np.asarray(x)
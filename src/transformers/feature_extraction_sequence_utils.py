@@ -370,3 +370,86 @@ class SequenceFeatureExtractor(FeatureExtractionMixin):
             )
 
         return padding_strategy
+
+
+class SequenceFeatureExtractionStream:
+    """
+    Base class to extract the features of a single audio stream received in chunks of arbitrary size, as created by
+    the `create_stream` method of the feature extractors supporting it.
+
+    Calling the stream with a new chunk of audio returns the features completed by this chunk (along the time axis),
+    and [`~SequenceFeatureExtractionStream.flush`] returns the remaining ones once the audio is over. The state needed
+    to compute the next features is kept between calls, so the cost of each call is proportional to the size of the
+    chunk rather than to the length of the audio received so far.
+
+    Args:
+        feature_extractor ([`SequenceFeatureExtractor`]):
+            The feature extractor computing the features.
+    """
+
+    def __init__(self, feature_extractor: SequenceFeatureExtractor):
+        self.feature_extractor = feature_extractor
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the audio received so far, to start over with a new audio stream.
+        """
+        self.num_samples = 0
+
+    def __call__(
+        self,
+        raw_speech: Union[np.ndarray, List[float]],
+        sampling_rate: Optional[int] = None,
+        return_tensors: Optional[Union[str, TensorType]] = None,
+    ) -> BatchFeature:
+        """
+        Adds a chunk of audio to the stream.
+
+        Args:
+            raw_speech (`np.ndarray` or `List[float]`):
+                The next chunk of the audio. Must be mono channel audio, i.e. single float per timestep.
+            sampling_rate (`int`, *optional*):
+                The sampling rate at which the `raw_speech` input was sampled.
+            return_tensors (`str` or [`~utils.TensorType`], *optional*):
+                If set, will return tensors instead of numpy arrays.
+
+        Returns:
+            [`BatchFeature`]: The features completed by this chunk, with a batch size of 1.
+        """
+        if sampling_rate is not None and sampling_rate != self.feature_extractor.sampling_rate:
+            raise ValueError(
+                f"The model corresponding to this feature extractor: {self.feature_extractor.__class__.__name__} was"
+                f" trained using a sampling rate of {self.feature_extractor.sampling_rate}. Please make sure that the"
+                f" provided `raw_speech` input was sampled with {self.feature_extractor.sampling_rate} and not"
+                f" {sampling_rate}."
+            )
+
+        raw_speech = np.asarray(raw_speech, dtype=np.float32)
+        if raw_speech.ndim != 1:
+            raise ValueError(f"Only mono-channel audio is supported for input to {self.__class__.__name__}")
+
+        features = self._process_chunk(raw_speech)
+        self.num_samples += len(raw_speech)
+        return BatchFeature(features, tensor_type=return_tensors)
+
+    def flush(self, return_tensors: Optional[Union[str, TensorType]] = None) -> BatchFeature:
+        """
+        Ends the audio stream, and resets the stream so it can be used for a new one.
+
+        Args:
+            return_tensors (`str` or [`~utils.TensorType`], *optional*):
+                If set, will return tensors instead of numpy arrays.
+
+        Returns:
+            [`BatchFeature`]: The remaining features, with a batch size of 1.
+        """
+        features = self._flush()
+        self.reset()
+        return BatchFeature(features, tensor_type=return_tensors)
+
+    def _process_chunk(self, raw_speech: np.ndarray) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def _flush(self) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
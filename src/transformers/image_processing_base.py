@@ -444,7 +444,8 @@ class ImageProcessingMixin(PushToHubMixin):
         Returns:
             `Dict[str, Any]`: Dictionary of all the attributes that make up this image processor instance.
         """
-        output = copy.deepcopy(self.__dict__)
+        # The preprocessing cache is not part of the configuration
+        output = copy.deepcopy({key: value for key, value in self.__dict__.items() if key != "_preprocessing_cache"})
         output["image_processor_type"] = self.__class__.__name__
 
         return output
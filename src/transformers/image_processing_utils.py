@@ -13,15 +13,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
+import hashlib
+import json
 import math
-from typing import Dict, Iterable, Optional, Union
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
 
 import numpy as np
 
 from .image_processing_base import BatchFeature, ImageProcessingMixin
 from .image_transforms import center_crop, normalize, rescale
 from .image_utils import ChannelDimension, get_image_size
-from .utils import logging
+from .utils import is_torch_available, is_torch_tensor, is_vision_available, logging
+
+
+if is_torch_available():
+    import torch
+
+if is_vision_available():
+    import PIL.Image
 
 
 logger = logging.get_logger(__name__)
@@ -33,13 +49,350 @@ INIT_SERVICE_KWARGS = [
 ]
 
 
+def _update_hash(hasher, obj):
+    """Feeds the content of `obj` to `hasher`, raises a `TypeError` for objects whose content can't be hashed."""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        hasher.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, Enum):
+        hasher.update(f"{type(obj).__name__}:{obj.value!r};".encode())
+    elif isinstance(obj, bytes):
+        hasher.update(f"bytes:{len(obj)};".encode())
+        hasher.update(obj)
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        hasher.update(f"ndarray:{obj.dtype.str}:{obj.shape};".encode())
+        hasher.update(np.ascontiguousarray(obj).view(np.uint8).data)
+    elif is_torch_tensor(obj):
+        obj = obj.detach().cpu().contiguous()
+        hasher.update(f"tensor:{obj.dtype}:{tuple(obj.shape)};".encode())
+        hasher.update(obj.view(-1).view(torch.uint8).numpy().data)
+    elif is_vision_available() and isinstance(obj, PIL.Image.Image):
+        hasher.update(f"image:{obj.mode}:{obj.size};".encode())
+        hasher.update(obj.tobytes())
+        if obj.mode == "P":
+            hasher.update(bytes(obj.getpalette() or []))
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(f"{type(obj).__name__}:{len(obj)};".encode())
+        for item in obj:
+            _update_hash(hasher, item)
+    elif isinstance(obj, dict):
+        hasher.update(f"dict:{len(obj)};".encode())
+        for key in sorted(obj, key=str):
+            _update_hash(hasher, key)
+            _update_hash(hasher, obj[key])
+    else:
+        raise TypeError(f"Can't hash the content of an object of type {type(obj)}.")
+
+
+class PreprocessingCache:
+    """
+    Bounded cache of the outputs of image processors, keyed by a hash of the processor configuration, of the content of
+    the input images and of the preprocessing arguments. It is opt-in: attach it to an image processor with
+    [`BaseImageProcessor.set_preprocessing_cache`], and calling the processor on images it already preprocessed with
+    the same configuration and arguments returns the cached outputs instead of preprocessing the images again.
+
+    The most recently used outputs are kept in memory. With a `cache_dir`, the outputs are also written to disk as
+    `.npy` files, which are read back as copy-on-write memory-mapped arrays, so the cache is shared across processes
+    and sessions. The outputs already stored on disk are scanned once when the cache is created, and the ones written
+    or read afterwards are tracked in memory, so each process bounds the size of the outputs it knows about. The cache
+    unit is one call of the processor: to reuse the outputs of single assets across different batches, preprocess
+    them one by one.
+
+    Inputs or outputs whose content can't be hashed or stored (e.g. tensors on an accelerator) are simply not cached.
+
+    Args:
+        cache_dir (`str` or `os.PathLike`, *optional*):
+            The directory where the outputs are stored. If not set, the outputs are only kept in memory.
+        max_memory_size (`int`, *optional*, defaults to 1GB):
+            The maximum size in bytes of the outputs kept in memory. The least recently used ones are evicted first.
+        max_disk_size (`int`, *optional*, defaults to 10GB):
+            The maximum size in bytes of the outputs stored in `cache_dir`. The least recently used ones are deleted
+            first.
+
+    Example:
+
+    ```python
+    >>> from transformers import AutoImageProcessor, PreprocessingCache
+
+    >>> image_processor = AutoImageProcessor.from_pretrained("google/vit-base-patch16-224")
+    >>> image_processor.set_preprocessing_cache(PreprocessingCache(cache_dir="preprocessing_cache"))
+    >>> inputs = image_processor(images, return_tensors="pt")  # preprocessed and cached
+    >>> inputs = image_processor(images, return_tensors="pt")  # read from the cache
+    ```
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Union[str, os.PathLike]] = None,
+        max_memory_size: int = 2**30,
+        max_disk_size: int = 10 * 2**30,
+    ):
+        self.cache_dir = None if cache_dir is None else os.fspath(cache_dir)
+        self.max_memory_size = max_memory_size
+        self.max_disk_size = max_disk_size
+        self.hits = 0
+        self.misses = 0
+        # Key -> (entry, size) of the outputs in memory, and key -> size of the outputs on disk, least recently used
+        # first
+        self._entries = OrderedDict()
+        self._memory_size = 0
+        self._disk_entries = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._scan_disk()
+
+    def __getstate__(self):
+        # The in-memory entries and the lock stay in the process that created them
+        state = self.__dict__.copy()
+        state["_entries"] = OrderedDict()
+        state["_memory_size"] = 0
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def compute_key(self, config: str, images, kwargs: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the key of the outputs of a processor with the serialized configuration `config` called on `images`
+        with `kwargs`, or `None` if the content of the inputs can't be hashed.
+        """
+        hasher = hashlib.sha256()
+        try:
+            _update_hash(hasher, config)
+            _update_hash(hasher, images)
+            _update_hash(hasher, kwargs)
+        except TypeError:
+            return None
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _to_entry(outputs: Dict[str, Any]) -> Optional[Dict[str, Tuple[str, Any]]]:
+        # Each output is stored as numpy arrays along with its original type, or as a JSON value
+        entry = {}
+        for name, value in outputs.items():
+            if is_torch_tensor(value) and value.device.type == "cpu" and value.dtype != torch.bfloat16:
+                entry[name] = ("torch", value.detach().numpy())
+            elif isinstance(value, np.ndarray) and value.dtype != object:
+                entry[name] = ("numpy", value)
+            elif isinstance(value, (list, tuple)) and all(
+                isinstance(item, np.ndarray) and item.dtype != object for item in value
+            ):
+                entry[name] = ("numpy_list", list(value))
+            else:
+                try:
+                    json.dumps(value)
+                except (TypeError, ValueError):
+                    return None
+                entry[name] = ("json", value)
+        return entry
+
+    @staticmethod
+    def _from_entry(entry: Dict[str, Tuple[str, Any]], copy_arrays: bool) -> Dict[str, Any]:
+        outputs = {}
+        for name, (kind, value) in entry.items():
+            if kind == "json":
+                outputs[name] = copy.deepcopy(value)
+            elif kind == "numpy_list":
+                outputs[name] = [np.array(array) if copy_arrays else array for array in value]
+            else:
+                array = np.array(value) if copy_arrays else value
+                outputs[name] = torch.from_numpy(array) if kind == "torch" else array
+        return outputs
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the outputs stored under `key`, or `None` if there are none."""
+        with self._lock:
+            entry, _ = self._entries.get(key, (None, 0))
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            self.hits += 1
+            # Copy the arrays so that modifying the outputs does not modify the cache
+            return self._from_entry(entry, copy_arrays=True)
+
+        entry = self._read_entry(key) if self.cache_dir is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._put_in_memory(key, entry)
+        # Memory-mapped arrays are copy-on-write, the files are never modified
+        return self._from_entry(entry, copy_arrays=False)
+
+    def put(self, key: str, outputs: Dict[str, Any]) -> bool:
+        """Stores `outputs` under `key`. Returns `False` if they can't be stored."""
+        entry = self._to_entry(outputs)
+        if entry is None:
+            return False
+        # Keep a copy so that modifying the outputs returned by the processor does not modify the cache
+        entry = self._to_entry(self._from_entry(entry, copy_arrays=True))
+        self._put_in_memory(key, entry)
+        if self.cache_dir is not None:
+            self._write_entry(key, entry)
+        return True
+
+    def clear(self):
+        """Removes all the outputs from the cache, in memory and on disk."""
+        with self._lock:
+            self._entries.clear()
+            self._memory_size = 0
+            self._disk_entries.clear()
+            self._disk_size = 0
+        if self.cache_dir is not None:
+            for key in os.listdir(self.cache_dir):
+                shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+    def __len__(self) -> int:
+        if self.cache_dir is not None:
+            return len(self._disk_entries)
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_size(entry: Dict[str, Tuple[str, Any]]) -> int:
+        size = 0
+        for kind, value in entry.values():
+            if kind == "json":
+                size += len(json.dumps(value))
+            else:
+                size += sum(array.nbytes for array in (value if kind == "numpy_list" else [value]))
+        return size
+
+    def _put_in_memory(self, key: str, entry: Dict[str, Tuple[str, Any]]):
+        size = self._entry_size(entry)
+        with self._lock:
+            if key in self._entries:
+                self._memory_size -= self._entries[key][1]
+            self._entries[key] = (entry, size)
+            self._entries.move_to_end(key)
+            self._memory_size += size
+            while self._memory_size > self.max_memory_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._memory_size -= evicted_size
+
+    def _read_entry(self, key: str) -> Optional[Dict[str, Tuple[str, Any]]]:
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry_dir, "index.json")) as f:
+                index = json.load(f)
+            entry = {}
+            for name, (kind, value) in index.items():
+                if kind == "json":
+                    entry[name] = (kind, value)
+                else:
+                    arrays = [np.load(os.path.join(entry_dir, file), mmap_mode="c") for file in value]
+                    entry[name] = (kind, arrays if kind == "numpy_list" else arrays[0])
+            # Used to order the outputs from the least recently used one when scanning the cache directory
+            os.utime(entry_dir)
+        except (OSError, ValueError):
+            with self._lock:
+                self._disk_size -= self._disk_entries.pop(key, 0)
+            return None
+        self._touch_on_disk(key)
+        return entry
+
+    def _write_entry(self, key: str, entry: Dict[str, Tuple[str, Any]]):
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.isdir(entry_dir):
+            self._touch_on_disk(key)
+            return
+        # Write in a temporary directory first, so that readers never see partially written outputs
+        tmp_dir = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        index = {}
+        for name, (kind, value) in entry.items():
+            if kind == "json":
+                index[name] = (kind, value)
+                continue
+            files = []
+            for i, array in enumerate(value if kind == "numpy_list" else [value]):
+                files.append(f"{len(index)}_{i}.npy")
+                np.save(os.path.join(tmp_dir, files[-1]), array)
+            index[name] = (kind, files)
+        with open(os.path.join(tmp_dir, "index.json"), "w") as f:
+            json.dump(index, f)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same outputs in the meantime
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._touch_on_disk(key)
+
+    @staticmethod
+    def _entry_disk_size(entry_dir: str) -> int:
+        try:
+            return sum(file.stat().st_size for file in os.scandir(entry_dir))
+        except OSError:
+            return 0
+
+    def _scan_disk(self):
+        # Only done once, the outputs written or read afterwards are tracked in `_disk_entries`
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, key)
+            if key.startswith(".") or not os.path.isdir(entry_dir):
+                continue
+            try:
+                entries.append((os.stat(entry_dir).st_mtime, key, self._entry_disk_size(entry_dir)))
+            except OSError:
+                continue
+        with self._lock:
+            for _, key, size in sorted(entries):
+                self._disk_entries[key] = size
+                self._disk_size += size
+
+    def _touch_on_disk(self, key: str):
+        # Marks the outputs stored under `key` as the most recently used ones, and evicts the least recently used
+        # outputs if the cache directory is full
+        with self._lock:
+            size = self._disk_entries.get(key)
+        if size is None:
+            size = self._entry_disk_size(os.path.join(self.cache_dir, key))
+        evicted_keys = []
+        with self._lock:
+            if key not in self._disk_entries:
+                self._disk_entries[key] = size
+                self._disk_size += size
+            self._disk_entries.move_to_end(key)
+            while self._disk_size > self.max_disk_size and len(self._disk_entries) > 1:
+                evicted_key, evicted_size = self._disk_entries.popitem(last=False)
+                self._disk_size -= evicted_size
+                evicted_keys.append(evicted_key)
+        for evicted_key in evicted_keys:
+            shutil.rmtree(os.path.join(self.cache_dir, evicted_key), ignore_errors=True)
+
+
 class BaseImageProcessor(ImageProcessingMixin):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    _preprocessing_cache = None
+
     def __call__(self, images, **kwargs) -> BatchFeature:
         """Preprocess an image or a batch of images."""
-        return self.preprocess(images, **kwargs)
+        if self._preprocessing_cache is None:
+            return self.preprocess(images, **kwargs)
+
+        key = self._preprocessing_cache.compute_key(self.to_json_string(), images, kwargs)
+        outputs = self._preprocessing_cache.get(key) if key is not None else None
+        if outputs is not None:
+            return BatchFeature(data=outputs)
+        outputs = self.preprocess(images, **kwargs)
+        if key is not None:
+            self._preprocessing_cache.put(key, outputs)
+        return outputs
+
+    def set_preprocessing_cache(self, cache: Optional[PreprocessingCache]):
+        """
+        Sets the [`PreprocessingCache`] storing the outputs of this image processor, or removes it if `cache` is
+        `None`. The cache is not part of the configuration of the image processor, and is not saved with it.
+        """
+        if cache is None:
+            self.__dict__.pop("_preprocessing_cache", None)
+        else:
+            self._preprocessing_cache = cache
 
     def preprocess(self, images, **kwargs) -> BatchFeature:
         raise NotImplementedError("Each image processor must implement its own preprocess method")
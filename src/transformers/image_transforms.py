@@ -887,6 +887,40 @@ def reorder_images(
     ]
 
 
+def pack_images(
+    processed_images: Dict[Tuple[int, int], "torch.Tensor"], grouped_images_index: Dict[int, Tuple[int, int]]
+) -> Tuple["torch.Tensor", "torch.Tensor"]:
+    """
+    Concatenates the images grouped by shape in the original order, without padding them to a common size.
+
+    Each tensor of `processed_images` is of shape `(batch_size, num_patches, ...)`, the number of patches (or of any
+    other unit) of an image depending on its shape. Returns the patches of all the images concatenated in a tensor of
+    shape `(total_num_patches, ...)`, and the offsets of the patches of each image in it, of shape `(num_images + 1,)`:
+    the patches of the i-th image are `packed[offsets[i] : offsets[i + 1]]`.
+    """
+    num_images = len(grouped_images_index)
+    num_patches = {shape: images.shape[1] for shape, images in processed_images.items()}
+    images_per_group = {shape: [None] * images.shape[0] for shape, images in processed_images.items()}
+    for i in range(num_images):
+        shape, position = grouped_images_index[i]
+        images_per_group[shape][position] = i
+
+    first_group = next(iter(processed_images.values()))
+    lengths = torch.tensor([num_patches[grouped_images_index[i][0]] for i in range(num_images)])
+    offsets = torch.nn.functional.pad(lengths.cumsum(0), (1, 0)).to(first_group.device)
+    if len(processed_images) == 1:
+        # The images of a single group are already in the original order
+        return first_group.flatten(0, 1), offsets
+
+    # Copy the patches of each group to their position in the output with a single operation
+    packed = first_group.new_empty((offsets[-1].item(), *first_group.shape[2:]))
+    for shape, images in processed_images.items():
+        starts = offsets[images_per_group[shape]]
+        indices = (starts[:, None] + torch.arange(num_patches[shape], device=starts.device)).flatten()
+        packed.index_copy_(0, indices, images.flatten(0, 1))
+    return packed, offsets
+
+
 class NumpyToTensor:
     """
     Convert a numpy array to a PyTorch tensor.
@@ -14,9 +14,15 @@
 # limitations under the License.
 
 import base64
+import bisect
+import hashlib
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import redirect_stdout
 from dataclasses import dataclass
+from functools import partial
 from io import BytesIO
 from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
@@ -505,7 +511,83 @@ def valid_coco_panoptic_annotations(annotations: Iterable[Dict[str, Union[List,
     return all(is_valid_annotation_coco_panoptic(ann) for ann in annotations)
 
 
-def load_image(image: Union[str, "PIL.Image.Image"], timeout: Optional[float] = None) -> "PIL.Image.Image":
+class ImageCache:
+    """
+    Thread-safe LRU cache of decoded images, keyed by a hash of the encoded image content.
+
+    Passing the same cache to [`load_image`] or [`load_images`] across calls skips decoding the images whose content
+    was already seen, whatever the source they are loaded from (URL, local path or base64 string). The cached images are
+    copied on the way out, so modifying a returned image does not modify the cache.
+
+    Args:
+        max_size (`int`, *optional*, defaults to 128):
+            The maximum number of images kept in the cache. The least recently used images are evicted first.
+    """
+
+    def __init__(self, max_size: int = 128):
+        if max_size < 1:
+            raise ValueError(f"`max_size` should be a positive integer, got {max_size}.")
+        self.max_size = max_size
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_content(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, key: str) -> Optional["PIL.Image.Image"]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                return None
+            self._images.move_to_end(key)
+        return image.copy()
+
+    def put(self, key: str, image: "PIL.Image.Image"):
+        with self._lock:
+            self._images[key] = image.copy()
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_size:
+                self._images.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._images
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._images)
+
+
+def _fetch_image_content(image: str, timeout: Optional[float] = None) -> bytes:
+    """Returns the encoded content of an image given as a URL, a local path or a base64 string."""
+    if image.startswith("http://") or image.startswith("https://"):
+        # We need to actually check for a real protocol, otherwise it's impossible to use a local file
+        # like http_huggingface_co.png
+        return requests.get(image, timeout=timeout).content
+    elif os.path.isfile(image):
+        with open(image, "rb") as f:
+            return f.read()
+    else:
+        if image.startswith("data:image/"):
+            image = image.split(",")[1]
+
+        # Try to load as base64
+        try:
+            return base64.decodebytes(image.encode())
+        except Exception as e:
+            raise ValueError(
+                f"Incorrect image source. Must be a valid URL starting with `http://` or `https://`, a valid path to an image file, or a base64 encoded string. Got {image}. Failed with {e}"
+            )
+
+
+def load_image(
+    image: Union[str, "PIL.Image.Image"], timeout: Optional[float] = None, cache: Optional[ImageCache] = None
+) -> "PIL.Image.Image":
     """
     Loads `image` to a PIL Image.
 
@@ -514,26 +596,29 @@ def load_image(image: Union[str, "PIL.Image.Image"], timeout: Optional[float] =
             The image to convert to the PIL Image format.
         timeout (`float`, *optional*):
             The timeout value in seconds for the URL request.
+        cache (`ImageCache`, *optional*):
+            A cache of decoded images. If the content of `image` is in the cache, the cached image is returned instead
+            of decoding it again, otherwise the decoded image is added to the cache. Only used when `image` is a
+            string.
 
     Returns:
         `PIL.Image.Image`: A PIL Image.
     """
     requires_backends(load_image, ["vision"])
+    cache_key = None
     if isinstance(image, str):
-        if image.startswith("http://") or image.startswith("https://"):
-            # We need to actually check for a real protocol, otherwise it's impossible to use a local file
-            # like http_huggingface_co.png
-            image = PIL.Image.open(BytesIO(requests.get(image, timeout=timeout).content))
-        elif os.path.isfile(image):
-            image = PIL.Image.open(image)
+        content = _fetch_image_content(image, timeout=timeout)
+        if cache is not None:
+            cache_key = ImageCache.hash_content(content)
+            cached_image = cache.get(cache_key)
+            if cached_image is not None:
+                return cached_image
+        if image.startswith("http://") or image.startswith("https://") or os.path.isfile(image):
+            image = PIL.Image.open(BytesIO(content))
         else:
-            if image.startswith("data:image/"):
-                image = image.split(",")[1]
-
-            # Try to load as base64
+            # Not a valid image if it was not a valid base64 string
             try:
-                b64 = base64.decodebytes(image.encode())
-                image = PIL.Image.open(BytesIO(b64))
+                image = PIL.Image.open(BytesIO(content))
             except Exception as e:
                 raise ValueError(
                     f"Incorrect image source. Must be a valid URL starting with `http://` or `https://`, a valid path to an image file, or a base64 encoded string. Got {image}. Failed with {e}"
@@ -546,6 +631,8 @@ def load_image(image: Union[str, "PIL.Image.Image"], timeout: Optional[float] =
         )
     image = PIL.ImageOps.exif_transpose(image)
     image = image.convert("RGB")
+    if cache_key is not None:
+        cache.put(cache_key, image)
     return image
 
 
@@ -587,11 +674,16 @@ def default_sample_indices_fn(metadata: VideoMetadata, num_frames=None, fps=None
 def read_video_opencv(
     video_path: str,
     sample_indices_fn: Callable,
+    seek_gap: Optional[int] = None,
     **kwargs,
 ):
     """
     Decode a video using the OpenCV backend.
 
+    Only the frames up to the last sampled one are decoded, and the frames in between sampled frames are grabbed
+    without being converted. When two consecutive sampled frames are more than `seek_gap` frames apart, the reader
+    seeks to the next one instead, which only decodes from the keyframe preceding it.
+
     Args:
         video_path (`str`):
             Path to the video file.
@@ -602,6 +694,9 @@ def read_video_opencv(
             Example:
             def sample_indices_fn(metadata, **kwargs):
                 return np.linspace(0, metadata.total_num_frames - 1, num_frames, dtype=int)
+        seek_gap (`int`, *optional*):
+            The number of frames between two sampled frames above which the reader seeks instead of decoding the frames
+            in between. Defaults to 10 seconds of video, above the keyframe interval of most encoders.
 
     Returns:
         Tuple[`np.array`, `VideoMetadata`]: A tuple containing:
@@ -616,25 +711,37 @@ def read_video_opencv(
         total_num_frames=int(total_num_frames), fps=float(video_fps), duration=float(duration), video_backend="opencv"
     )
     indices = sample_indices_fn(metadata=metadata, **kwargs)
-
-    index = 0
-    frames = []
-    while video.isOpened():
+    if seek_gap is None:
+        seek_gap = int(10 * video_fps) if video_fps else total_num_frames
+
+    # The sampled frames are returned once each, in the order of the video
+    sampled_indices = sorted({int(index) for index in np.asarray(indices).flatten() if 0 <= index < total_num_frames})
+
+    frames = None
+    num_frames = 0
+    position = 0
+    for index in sampled_indices:
+        if index - position > seek_gap:
+            video.set(cv2.CAP_PROP_POS_FRAMES, index)
+            position = index
+        # Frames before the sampled one are decoded but not converted
+        while position < index and video.grab():
+            position += 1
         success, frame = video.read()
-        if not success:
-            break
-        if index in indices:
-            height, width, channel = frame.shape
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frames.append(frame[0:height, 0:width, 0:channel])
-        if success:
-            index += 1
-        if index >= total_num_frames:
+        if position < index or not success:
             break
+        position += 1
+        # Frames are converted straight into the output array
+        if frames is None:
+            frames = np.empty((len(sampled_indices), *frame.shape), dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frames[num_frames])
+        num_frames += 1
 
     video.release()
+    if num_frames == 0:
+        raise ValueError(f"None of the sampled frames could be decoded from {video_path}.")
     metadata.frames_indices = indices
-    return np.stack(frames), metadata
+    return frames[:num_frames], metadata
 
 
 def read_video_decord(
@@ -676,14 +783,89 @@ def read_video_decord(
     return frames, metadata
 
 
+def _plan_pyav_segments(video_path, sampled_indices: List[int]) -> Optional[List[Tuple[int, List[int]]]]:
+    """
+    Splits the sampled frame indices of a video into segments that can be decoded independently, each one starting at
+    the keyframe preceding its first frame. Consecutive sampled frames stay in the same segment unless there is a
+    keyframe between them. Returns `None` if the frame indices can't be recovered from the timestamps of the video.
+    """
+    container = av.open(video_path)
+    try:
+        stream = container.streams.video[0]
+        if not stream.average_rate or stream.time_base is None:
+            return None
+        start_time = stream.start_time or 0
+        frames_per_tick = stream.time_base * stream.average_rate
+        # Demuxing only reads the packets, it doesn't decode them
+        keyframe_indices = sorted(
+            round((packet.pts - start_time) * frames_per_tick)
+            for packet in container.demux(stream)
+            if packet.is_keyframe and packet.pts is not None
+        )
+    finally:
+        container.close()
+    if len(keyframe_indices) == 0 or keyframe_indices[0] != 0:
+        return None
+
+    segments = []
+    for index in sampled_indices:
+        keyframe_index = keyframe_indices[bisect.bisect_right(keyframe_indices, index) - 1]
+        if segments and keyframe_index <= segments[-1][1][-1]:
+            segments[-1][1].append(index)
+        else:
+            segments.append((keyframe_index, [index]))
+    return segments
+
+
+def _decode_pyav_segments(video_path, segments: List[Tuple[int, List[int]]], frames: np.ndarray, rows: Dict[int, int]):
+    """
+    Decodes the frames of `segments` into their row of `frames`, seeking to the keyframe starting each segment.
+    Returns the indices of the sampled frames that were decoded.
+    """
+    container = av.open(video_path)
+    try:
+        stream = container.streams.video[0]
+        start_time = stream.start_time or 0
+        ticks_per_frame = 1 / (stream.time_base * stream.average_rate)
+        frames_per_tick = stream.time_base * stream.average_rate
+        decoded_indices = []
+        for keyframe_index, indices in segments:
+            container.seek(int(start_time + keyframe_index * ticks_per_frame), stream=stream, backward=True)
+            remaining_indices = iter(indices)
+            next_index = next(remaining_indices)
+            for frame in container.decode(stream):
+                if frame.pts is None:
+                    raise ValueError("Frame without timestamp.")
+                index = round((frame.pts - start_time) * frames_per_tick)
+                if index < next_index:
+                    continue
+                if index > next_index:
+                    raise ValueError(f"Frame {next_index} is missing from the decoded frames.")
+                frames[rows[index]] = frame.to_ndarray(format="rgb24")
+                decoded_indices.append(index)
+                next_index = next(remaining_indices, None)
+                if next_index is None:
+                    break
+    finally:
+        container.close()
+    return decoded_indices
+
+
 def read_video_pyav(
     video_path: str,
     sample_indices_fn: Callable,
+    num_decode_workers: int = 1,
     **kwargs,
 ):
     """
     Decode the video with PyAV decoder.
 
+    Only the group of pictures of each sampled frame is decoded: the reader seeks to the keyframe preceding a sampled
+    frame, and decodes forward until it reaches it, unless it can keep decoding from the previous sampled frame
+    without passing a keyframe. The groups of pictures can be decoded by several threads, and the frames are written
+    directly into the output array. If the frame indices can't be recovered from the timestamps of the video (e.g.
+    with a variable frame rate), the video is decoded sequentially up to the last sampled frame instead.
+
     Args:
         video_path (`str`):
             Path to the video file.
@@ -694,6 +876,9 @@ def read_video_pyav(
             Example:
             def sample_indices_fn(metadata, **kwargs):
                 return np.linspace(0, metadata.total_num_frames - 1, num_frames, dtype=int)
+        num_decode_workers (`int`, *optional*, defaults to 1):
+            The number of threads decoding independent groups of pictures of the video. Only used when `video_path` is
+            a path.
 
     Returns:
         Tuple[`np.array`, `VideoMetadata`]: A tuple containing:
@@ -703,15 +888,47 @@ def read_video_pyav(
     container = av.open(video_path)
     total_num_frames = container.streams.video[0].frames
     video_fps = container.streams.video[0].average_rate  # should we better use `av_guess_frame_rate`?
+    height = container.streams.video[0].codec_context.height
+    width = container.streams.video[0].codec_context.width
     duration = total_num_frames / video_fps if video_fps else 0
     metadata = VideoMetadata(
         total_num_frames=int(total_num_frames), fps=float(video_fps), duration=float(duration), video_backend="pyav"
     )
     indices = sample_indices_fn(metadata=metadata, **kwargs)
 
+    # The sampled frames are returned once each, in the order of the video
+    end_index = indices[-1]
+    sampled_indices = sorted({int(index) for index in np.asarray(indices).flatten() if 0 <= index <= end_index})
+    if len(sampled_indices) > 0 and isinstance(video_path, (str, os.PathLike)):
+        container.close()
+        segments = _plan_pyav_segments(video_path, sampled_indices)
+        if segments is not None:
+            frames = np.empty((len(sampled_indices), height, width, 3), dtype=np.uint8)
+            rows = {index: row for row, index in enumerate(sampled_indices)}
+            # Split the segments in contiguous chunks, one per worker, so each worker seeks forward only
+            num_workers = min(num_decode_workers, len(segments))
+            chunk_bounds = np.linspace(0, len(segments), num_workers + 1).astype(int)
+            segment_chunks = [segments[start:end] for start, end in zip(chunk_bounds[:-1], chunk_bounds[1:])]
+            try:
+                decoded_indices = _map_with_threads(
+                    lambda chunk: _decode_pyav_segments(video_path, chunk, frames, rows),
+                    segment_chunks,
+                    num_workers,
+                    "video-decoder",
+                )
+            except ValueError as e:
+                logger.info(f"Could not seek to the sampled frames of {video_path} ({e}), decoding it sequentially.")
+            else:
+                decoded_indices = [index for indices in decoded_indices for index in indices]
+                # Sampled frames past the end of the video are missing, like when decoding sequentially
+                if decoded_indices == sampled_indices[: len(decoded_indices)]:
+                    metadata.frames_indices = indices
+                    return frames[: len(decoded_indices)], metadata
+        # The container was closed to plan the segments, reopen it to decode the video sequentially
+        container = av.open(video_path)
+
     frames = []
     container.seek(0)
-    end_index = indices[-1]
     for i, frame in enumerate(container.decode(video=0)):
         if i > end_index:
             break
@@ -875,25 +1092,72 @@ def load_video(
     return video, metadata
 
 
+def _map_with_threads(fn: Callable, inputs: List, max_workers: int = 1, thread_name_prefix: str = "") -> List:
+    """Applies `fn` to each element of `inputs` using up to `max_workers` threads, keeping the order of the inputs."""
+    if max_workers <= 1 or len(inputs) <= 1:
+        return [fn(x) for x in inputs]
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(inputs)), thread_name_prefix=thread_name_prefix
+    ) as executor:
+        return list(executor.map(fn, inputs))
+
+
+def load_videos(videos: List[Union[str, "VideoInput"]], max_workers: int = 1, **kwargs) -> List:
+    """
+    Loads several videos with [`load_video`], decoding up to `max_workers` of them concurrently.
+
+    The video backends release the GIL while decoding, so loading the videos of a batch in a thread pool reduces the
+    time spent waiting on I/O and decoding.
+
+    Args:
+        videos (`List[str]` or `List[VideoInput]`):
+            The videos to load, each one can be any input accepted by [`load_video`].
+        max_workers (`int`, *optional*, defaults to 1):
+            The maximum number of videos decoded at the same time. With the default value, the videos are loaded one
+            after the other.
+        kwargs:
+            Keyword arguments passed along to [`load_video`].
+
+    Returns:
+        `List`: The outputs of [`load_video`] for each video, in the same order as `videos`.
+    """
+    return _map_with_threads(partial(load_video, **kwargs), list(videos), max_workers, "video-loader")
+
+
 def load_images(
-    images: Union[List, Tuple, str, "PIL.Image.Image"], timeout: Optional[float] = None
+    images: Union[List, Tuple, str, "PIL.Image.Image"],
+    timeout: Optional[float] = None,
+    max_workers: int = 1,
+    cache: Optional[ImageCache] = None,
 ) -> Union["PIL.Image.Image", List["PIL.Image.Image"], List[List["PIL.Image.Image"]]]:
     """Loads images, handling different levels of nesting.
 
     Args:
       images: A single image, a list of images, or a list of lists of images to load.
       timeout: Timeout for loading images.
+      max_workers: Maximum number of images fetched and decoded at the same time, in a thread pool. With the default
+        value, the images are loaded one after the other.
+      cache: An `ImageCache` of decoded images, shared across calls to skip decoding the images already seen.
 
     Returns:
       A single image, a list of images, a list of lists of images.
     """
+    load_fn = partial(load_image, timeout=timeout, cache=cache)
     if isinstance(images, (list, tuple)):
         if len(images) and isinstance(images[0], (list, tuple)):
-            return [[load_image(image, timeout=timeout) for image in image_group] for image_group in images]
+            # Load all the images of all the groups in the same pool, then regroup them
+            flat_images = _map_with_threads(
+                load_fn, [image for image_group in images for image in image_group], max_workers, "image-loader"
+            )
+            grouped_images, start = [], 0
+            for image_group in images:
+                grouped_images.append(flat_images[start : start + len(image_group)])
+                start += len(image_group)
+            return grouped_images
         else:
-            return [load_image(image, timeout=timeout) for image in images]
+            return _map_with_threads(load_fn, list(images), max_workers, "image-loader")
     else:
-        return load_image(images, timeout=timeout)
+        return load_fn(images)
 
 
 def validate_preprocess_arguments(
@@ -48,6 +48,102 @@ def ForCausalLMLoss(
     return loss
 
 
+class _ChunkedLinearCrossEntropy(torch.autograd.Function):
+    """
+    Cross-entropy of `hidden_states @ weight.T + bias` computed `chunk_size` rows at a time. The gradients are computed
+    alongside the loss in the forward pass, so that only one chunk of logits is materialized at a time.
+    """
+
+    @staticmethod
+    def forward(ctx, hidden_states, weight, bias, labels, num_items_in_batch, ignore_index, chunk_size):
+        compute_grad_hidden, compute_grad_weight, compute_grad_bias = ctx.needs_input_grad[:3]
+        # Upcast to (at least) float to avoid potential precision issues, one chunk at a time
+        dtype = torch.promote_types(hidden_states.dtype, torch.float32)
+        grad_hidden_states = torch.zeros_like(hidden_states) if compute_grad_hidden else None
+        grad_weight = torch.zeros_like(weight, dtype=dtype) if compute_grad_weight else None
+        grad_bias = torch.zeros_like(bias, dtype=dtype) if compute_grad_bias else None
+
+        loss = torch.zeros((), dtype=dtype, device=hidden_states.device)
+        for start in range(0, hidden_states.shape[0], chunk_size):
+            chunk_hidden_states = hidden_states[start : start + chunk_size]
+            chunk_labels = labels[start : start + chunk_size]
+            mask = chunk_labels != ignore_index
+            targets = chunk_labels.masked_fill(~mask, 0).unsqueeze(-1)
+
+            logits = chunk_hidden_states @ weight.T
+            if bias is not None:
+                logits = logits + bias
+            logits = logits.to(dtype)
+            logsumexp = logits.logsumexp(dim=-1, keepdim=True)
+            loss += ((logsumexp - logits.gather(-1, targets)).squeeze(-1) * mask).sum()
+
+            if compute_grad_hidden or compute_grad_weight or compute_grad_bias:
+                # d(loss)/d(logits) = softmax(logits) - one_hot(targets), on the tokens that are not ignored
+                grad_logits = logits.sub_(logsumexp).exp_()
+                grad_logits.scatter_add_(-1, targets, torch.full_like(targets, -1, dtype=grad_logits.dtype))
+                grad_logits.mul_(mask.unsqueeze(-1))
+                if compute_grad_weight:
+                    grad_weight.addmm_(grad_logits.T, chunk_hidden_states.to(dtype))
+                if compute_grad_bias:
+                    grad_bias += grad_logits.sum(dim=0)
+                grad_logits = grad_logits.to(hidden_states.dtype)
+                if compute_grad_hidden:
+                    grad_hidden_states[start : start + chunk_size] = grad_logits @ weight
+
+        if num_items_in_batch is None:
+            num_items_in_batch = (labels != ignore_index).sum()
+        loss = loss / num_items_in_batch
+        if grad_hidden_states is not None:
+            grad_hidden_states = grad_hidden_states / num_items_in_batch
+        if grad_weight is not None:
+            grad_weight = (grad_weight / num_items_in_batch).to(weight.dtype)
+        if grad_bias is not None:
+            grad_bias = (grad_bias / num_items_in_batch).to(bias.dtype)
+        ctx.save_for_backward(grad_hidden_states, grad_weight, grad_bias)
+        return loss
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        grads = tuple(grad * grad_output.to(grad.dtype) if grad is not None else None for grad in ctx.saved_tensors)
+        return grads + (None, None, None, None)
+
+
+def ForCausalLMChunkedLoss(
+    logits=None,
+    labels=None,
+    vocab_size: int = None,
+    num_items_in_batch: int = None,
+    ignore_index: int = -100,
+    hidden_states=None,
+    lm_head_weight=None,
+    lm_head_bias=None,
+    chunk_size: int = 1024,
+    **kwargs,
+):
+    """
+    Causal language modeling loss computed from the final `hidden_states` and the `lm_head_weight` (and
+    `lm_head_bias`) instead of the logits, `chunk_size` tokens at a time, so that the full `[batch, seq, vocab]`
+    logits (and their float32 copy) are never materialized. Equal to [`ForCausalLMLoss`] on the logits of the
+    corresponding linear layer.
+
+    Models supporting it skip the computation of the logits when it is selected with `config.loss_type =
+    "ForCausalLMChunked"` and labels are passed in training mode with gradients enabled. Otherwise, e.g. during
+    evaluation, only `logits` are given and it falls back to [`ForCausalLMLoss`].
+    """
+    if hidden_states is None or lm_head_weight is None:
+        return ForCausalLMLoss(logits, labels, vocab_size, num_items_in_batch, ignore_index, **kwargs)
+
+    labels = labels.to(hidden_states.device)
+    # Shift so that tokens < n predict n
+    labels = nn.functional.pad(labels, (0, 1), value=ignore_index)
+    shift_labels = labels[..., 1:].reshape(-1)
+
+    hidden_states = hidden_states.reshape(-1, hidden_states.shape[-1])
+    return _ChunkedLinearCrossEntropy.apply(
+        hidden_states, lm_head_weight, lm_head_bias, shift_labels, num_items_in_batch, ignore_index, chunk_size
+    )
+
+
 def ForMaskedLMLoss(
     logits, labels, vocab_size: int, num_items_in_batch: int = None, ignore_index: int = -100, **kwargs
 ):
@@ -120,6 +216,7 @@ def ForTokenClassification(logits, labels, config, **kwargs):
 
 LOSS_MAPPING = {
     "ForCausalLM": ForCausalLMLoss,
+    "ForCausalLMChunked": ForCausalLMChunkedLoss,
     "ForMaskedLM": ForMaskedLMLoss,
     "ForQuestionAnswering": ForQuestionAnsweringLoss,
     "ForSequenceClassification": ForSequenceClassificationLoss,
@@ -26,8 +26,10 @@ import os
 import re
 import shutil
 import tempfile
+import time
 import warnings
 from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from dataclasses import dataclass
 from enum import Enum
@@ -56,6 +58,7 @@ from .integrations.flex_attention import flex_attention_forward
 from .integrations.sdpa_attention import sdpa_attention_forward
 from .loss.loss_utils import LOSS_MAPPING
 from .pytorch_utils import (  # noqa: F401
+    ActivationOffloader,
     Conv1D,
     apply_chunking_to_forward,
     distribute_module,
@@ -429,14 +432,15 @@ def check_support_param_buffer_assignment(model_to_load, state_dict, start_prefi
     return False
 
 
-def load_sharded_checkpoint(model, folder, strict=True, prefer_safe=True):
+def load_sharded_checkpoint(model, folder, strict=True, prefer_safe=True, max_workers=1):
     """
     This is the same as
     [`torch.nn.Module.load_state_dict`](https://pytorch.org/docs/stable/generated/torch.nn.Module.html?highlight=load_state_dict#torch.nn.Module.load_state_dict)
     but for a sharded checkpoint.
 
     This load is performed efficiently: each checkpoint shard is loaded one by one in RAM and deleted after being
-    loaded in the model.
+    loaded in the model. With `max_workers > 1`, up to `max_workers` shards are read from disk in parallel while the
+    previous one is loaded in the model, at the cost of holding as many shards in RAM.
 
     Args:
         model (`torch.nn.Module`): The model in which to load the checkpoint.
@@ -446,6 +450,8 @@ def load_sharded_checkpoint(model, folder, strict=True, prefer_safe=True):
         prefer_safe (`bool`, *optional*, defaults to `False`)
             If both safetensors and PyTorch save files are present in checkpoint and `prefer_safe` is True, the
             safetensors files will be loaded. Otherwise, PyTorch files are always loaded when possible.
+        max_workers (`int`, *optional*, defaults to 1):
+            The maximum number of threads used to read the checkpoint shards.
 
     Returns:
         `NamedTuple`: A named tuple with `missing_keys` and `unexpected_keys` fields
@@ -502,13 +508,34 @@ def load_sharded_checkpoint(model, folder, strict=True, prefer_safe=True):
     weights_only_kwarg = {"weights_only": True}
     loader = safe_load_file if load_safe else partial(torch.load, map_location="cpu", **weights_only_kwarg)
 
-    for shard_file in shard_files:
+    def _read_shard(shard_file):
+        start_time = time.perf_counter()
         state_dict = loader(os.path.join(folder, shard_file))
-        model.load_state_dict(state_dict, strict=False)
+        logger.info(f"Read checkpoint shard {shard_file} in {time.perf_counter() - start_time:.2f}s")
+        return state_dict
 
-        # Make sure memory is freed before we load the next state dict.
-        del state_dict
-        gc.collect()
+    if max_workers <= 1:
+        for shard_file in shard_files:
+            state_dict = _read_shard(shard_file)
+            model.load_state_dict(state_dict, strict=False)
+
+            # Make sure memory is freed before we load the next state dict.
+            del state_dict
+            gc.collect()
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="checkpoint-reader") as executor:
+            # Keep `max_workers` shards being read ahead of the one being loaded in the model
+            futures = collections.deque(executor.submit(_read_shard, f) for f in shard_files[:max_workers])
+            next_shard_files = iter(shard_files[max_workers:])
+            while futures:
+                state_dict = futures.popleft().result()
+                shard_file = next(next_shard_files, None)
+                if shard_file is not None:
+                    futures.append(executor.submit(_read_shard, shard_file))
+                model.load_state_dict(state_dict, strict=False)
+
+                del state_dict
+                gc.collect()
 
     # Return the same thing as PyTorch load_state_dict function.
     return torch.nn.modules.module._IncompatibleKeys(missing_keys, unexpected_keys)
@@ -1422,6 +1449,11 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
                 loss_type = loss_type[0]
             else:
                 loss_type = None
+        # The config can select a variant of the loss of the class (e.g. `ForCausalLMChunked` for `*ForCausalLM`), but
+        # not the loss of another head loaded from the same checkpoint
+        config_loss_type = getattr(config, "loss_type", None)
+        if loss_type is not None and config_loss_type in LOSS_MAPPING and config_loss_type.startswith(loss_type):
+            loss_type = config_loss_type
         self.loss_type = loss_type
 
         self.name_or_path = config.name_or_path
@@ -2666,6 +2698,51 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
             # the gradients to make sure the gradient flows.
             self.enable_input_require_grads()
 
+    def activation_offloading_enable(
+        self,
+        policy: Union[str, List[str]] = "offload",
+        gradient_checkpointing_kwargs: Optional[dict] = None,
+        min_offload_size: int = 2**20,
+    ):
+        """
+        Activates activation offloading for the current model: instead of being recomputed as with gradient
+        checkpointing, the activations of the layers are copied asynchronously to pinned CPU memory during the forward
+        pass and prefetched back during the backward pass. This works for all models supporting gradient
+        checkpointing, and is deactivated with [`~PreTrainedModel.gradient_checkpointing_disable`].
+
+        Args:
+            policy (`str` or `List[str]`, *optional*, defaults to `"offload"`):
+                What to do with the activations of each layer: `"offload"` them to the CPU, `"recompute"` them as with
+                gradient checkpointing or `"keep"` them on the device. A single policy applies to all layers. A list
+                gives the policy of each layer in the order they are run, its last policy applying to the remaining
+                layers.
+            gradient_checkpointing_kwargs (dict, *optional*):
+                Additional keyword arguments passed along to the `torch.utils.checkpoint.checkpoint` function for the
+                layers using the `"recompute"` policy.
+            min_offload_size (`int`, *optional*, defaults to 1048576):
+                The minimum size, in bytes, of an activation for it to be offloaded.
+        """
+        if not self.supports_gradient_checkpointing:
+            raise ValueError(f"{self.__class__.__name__} does not support activation offloading.")
+
+        if "value" in inspect.signature(self._set_gradient_checkpointing).parameters:
+            raise ValueError(
+                f"{self.__class__.__name__} uses an old version of the checkpointing format that does not support "
+                "activation offloading. To use the new format, you need to completely remove the definition of the "
+                "method `_set_gradient_checkpointing` in your model."
+            )
+
+        offloader = ActivationOffloader(
+            policy=policy,
+            gradient_checkpointing_kwargs=gradient_checkpointing_kwargs,
+            min_offload_size=min_offload_size,
+        )
+        self._set_gradient_checkpointing(enable=True, gradient_checkpointing_func=offloader)
+
+        if getattr(self, "_hf_peft_config_loaded", False):
+            # Same as for gradient checkpointing, the layers using the `"recompute"` policy need inputs requiring grads
+            self.enable_input_require_grads()
+
     def _set_gradient_checkpointing(self, enable: bool = True, gradient_checkpointing_func: Callable = checkpoint):
         is_gradient_checkpointing_set = False
 
@@ -2733,6 +2810,9 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
         variant: Optional[str] = None,
         token: Optional[Union[str, bool]] = None,
         save_peft_format: bool = True,
+        max_shard_workers: int = 1,
+        process_index: int = 0,
+        world_size: int = 1,
         **kwargs,
     ):
         """
@@ -2781,6 +2861,17 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
                 For backward compatibility with PEFT library, in case adapter weights are attached to the model, all
                 keys of the state dict of adapters needs to be pre-pended with `base_model.model`. Advanced users can
                 disable this behaviours by setting `save_peft_format` to `False`.
+            max_shard_workers (`int`, *optional*, defaults to 1):
+                The maximum number of threads used to write the checkpoint shards. Each thread holds the shard it is
+                writing in memory, so this trades memory for saving time on large checkpoints.
+            process_index (`int`, *optional*, defaults to 0):
+                The index of the current process when the checkpoint shards are written by several processes, see
+                `world_size`.
+            world_size (`int`, *optional*, defaults to 1):
+                The number of processes writing the checkpoint shards. When bigger than 1, each process holding the
+                full weights only writes the shards whose index modulo `world_size` is `process_index`, so that
+                all processes of a distributed run share the serialization work. They all need to write to the same
+                filesystem, and only the main process saves the configuration and the index.
             kwargs (`Dict[str, Any]`, *optional*):
                 Additional key word arguments passed along to the [`~utils.PushToHubMixin.push_to_hub`] method.
         """
@@ -3050,10 +3141,29 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
                 and reg.fullmatch(filename_no_suffix) is not None
             ):
                 os.remove(full_filename)
+
+        def _save_shard(shard, shard_file):
+            start_time = time.perf_counter()
+            if safe_serialization:
+                # At some point we will need to deal better with save_function (used for TPU and other distributed
+                # joyfulness), but for now this enough.
+                safe_save_file(shard, os.path.join(save_directory, shard_file), metadata={"format": "pt"})
+            else:
+                save_function(shard, os.path.join(save_directory, shard_file))
+            logger.info(f"Saved checkpoint shard {shard_file} in {time.perf_counter() - start_time:.2f}s")
+
         # Save the model
-        filename_to_tensors = state_dict_split.filename_to_tensors.items()
+        filename_to_tensors = list(state_dict_split.filename_to_tensors.items())
+        if world_size > 1:
+            # Each process only writes its share of the shards
+            filename_to_tensors = filename_to_tensors[process_index::world_size]
         if module_map:
             filename_to_tensors = logging.tqdm(filename_to_tensors, desc="Saving checkpoint shards")
+        # Offloaded parameters are onloaded one shard at a time to bound the memory used
+        executor = None
+        if max_shard_workers > 1 and not module_map:
+            executor = ThreadPoolExecutor(max_workers=max_shard_workers, thread_name_prefix="checkpoint-writer")
+        futures = set()
         for shard_file, tensors in filename_to_tensors:
             shard = {}
             for tensor in tensors:
@@ -3080,12 +3190,21 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
                 del shard_state_dict
                 gc.collect()
 
-            if safe_serialization:
-                # At some point we will need to deal better with save_function (used for TPU and other distributed
-                # joyfulness), but for now this enough.
-                safe_save_file(shard, os.path.join(save_directory, shard_file), metadata={"format": "pt"})
-            else:
-                save_function(shard, os.path.join(save_directory, shard_file))
+            if executor is None:
+                _save_shard(shard, shard_file)
+                continue
+            # Don't build more shards than can be written at the same time
+            if len(futures) >= max_shard_workers:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            futures.add(executor.submit(_save_shard, shard, shard_file))
+            del shard
+
+        if executor is not None:
+            executor.shutdown(wait=True)
+            for future in futures:
+                future.result()
 
         del state_dict
 
@@ -3095,10 +3214,11 @@ class PreTrainedModel(nn.Module, ModuleUtilsMixin, GenerationMixin, PushToHubMix
         else:
             save_index_file = SAFE_WEIGHTS_INDEX_NAME if safe_serialization else WEIGHTS_INDEX_NAME
             save_index_file = os.path.join(save_directory, _add_variant(save_index_file, variant))
-            # Save the index as well
-            with open(save_index_file, "w", encoding="utf-8") as f:
-                content = json.dumps(index, indent=2, sort_keys=True) + "\n"
-                f.write(content)
+            # Save the index as well (only once when the shards are split between processes)
+            if world_size == 1 or is_main_process:
+                with open(save_index_file, "w", encoding="utf-8") as f:
+                    content = json.dumps(index, indent=2, sort_keys=True) + "\n"
+                    f.write(content)
             logger.info(
                 f"The model is bigger than the maximum size per checkpoint ({max_shard_size}) and is going to be "
                 f"split in {len(state_dict_split.filename_to_tensors)} checkpoint shards. You can find where each parameters has been saved in the "
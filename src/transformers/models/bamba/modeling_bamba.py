@@ -1549,11 +1549,24 @@ class BambaForCausalLM(BambaPreTrainedModel, GenerationMixin):
         hidden_states = outputs[0]
         # Only compute necessary logits, and do not upcast them to float if we are not computing the loss
         slice_indices = slice(-logits_to_keep, None) if isinstance(logits_to_keep, int) else logits_to_keep
-        logits = self.lm_head(hidden_states[:, slice_indices, :])
 
         loss = None
-        if labels is not None:
-            loss = self.loss_function(logits=logits, labels=labels, vocab_size=self.config.vocab_size, **kwargs)
+        logits = None
+        if labels is not None and self.loss_type == "ForCausalLMChunked" and self.training and torch.is_grad_enabled():
+            # The training loss is computed from the hidden states by chunks, without materializing the logits. They
+            # are still computed for evaluation, where they may be used as predictions.
+            loss = self.loss_function(
+                hidden_states=hidden_states[:, slice_indices, :],
+                lm_head_weight=self.lm_head.weight,
+                lm_head_bias=self.lm_head.bias,
+                labels=labels,
+                vocab_size=self.config.vocab_size,
+                **kwargs,
+            )
+        else:
+            logits = self.lm_head(hidden_states[:, slice_indices, :])
+            if labels is not None:
+                loss = self.loss_function(logits=logits, labels=labels, vocab_size=self.config.vocab_size, **kwargs)
 
         if not return_dict:
             output = (logits,) + outputs[1:]
@@ -689,15 +689,23 @@ def convert_segmentation_to_rle(segmentation):
     Returns:
         `List[List]`: A list of lists, where each list is the run-length encoding of a segment / class id.
     """
-    segment_ids = torch.unique(segmentation)
+    pixels = segmentation.flatten()
+    if pixels.numel() == 0:
+        return []
 
-    run_length_encodings = []
-    for idx in segment_ids:
-        mask = torch.where(segmentation == idx, 1, 0)
-        rle = binary_mask_to_rle(mask)
-        run_length_encodings.append(rle)
+    # Runs of constant value of the flattened map, each run belongs to the RLE of its value
+    run_starts = torch.nonzero(pixels[1:] != pixels[:-1]).flatten() + 1
+    run_starts = torch.cat([run_starts.new_zeros(1), run_starts])
+    run_lengths = torch.diff(run_starts, append=run_starts.new_tensor([pixels.numel()]))
+    run_values = pixels[run_starts]
 
-    return run_length_encodings
+    # Group the runs by segment id (sorted like `torch.unique`), keeping their order within each segment
+    _, runs_per_segment = torch.unique(run_values, return_counts=True)
+    order = torch.sort(run_values, stable=True).indices
+    runs = torch.stack([run_starts[order] + 1, run_lengths[order]], dim=-1).flatten().cpu().numpy()
+    run_length_encodings = np.split(runs, np.cumsum(2 * runs_per_segment.cpu().numpy())[:-1])
+
+    return [list(rle) for rle in run_length_encodings]
 
 
 # Copied from transformers.models.detr.image_processing_detr.remove_low_and_no_objects
@@ -761,7 +769,6 @@ def compute_segments(
     height = mask_probs.shape[1] if target_size is None else target_size[0]
     width = mask_probs.shape[2] if target_size is None else target_size[1]
 
-    segmentation = torch.zeros((height, width), dtype=torch.int32, device=mask_probs.device)
     segments: List[Dict] = []
 
     if target_size is not None:
@@ -775,36 +782,45 @@ def compute_segments(
     mask_probs *= pred_scores.view(-1, 1, 1)
     mask_labels = mask_probs.argmax(0)  # [height, width]
 
+    # Check which masks exist and are large enough to be a segment, for all the queries at once: the area of the
+    # pixels assigned to query k should be a large enough part of the area of all the stuff in query k
+    num_queries = pred_labels.shape[0]
+    mask_k_areas = torch.bincount(mask_labels.flatten(), minlength=num_queries)
+    original_areas = (mask_probs >= mask_threshold).flatten(1).sum(1, dtype=torch.int32)
+    # Eliminate disconnected tiny segments, comparing the ratios in double precision like python floats
+    area_ratios = (mask_k_areas / original_areas).double()
+    mask_exists = (mask_k_areas > 0) & (original_areas > 0) & (area_ratios > overlap_mask_area_threshold)
+
     # Keep track of instances of each class
     stuff_memory_list: Dict[str, int] = {}
-    for k in range(pred_labels.shape[0]):
-        pred_class = pred_labels[k].item()
+    query_segment_ids = [0] * num_queries
+    pred_classes = pred_labels.tolist()
+    segment_scores = pred_scores.tolist()
+    for k in torch.nonzero(mask_exists).flatten().tolist():
+        pred_class = pred_classes[k]
         should_fuse = pred_class in label_ids_to_fuse
 
-        # Check if mask exists and large enough to be a segment
-        mask_exists, mask_k = check_segment_validity(
-            mask_labels, mask_probs, k, mask_threshold, overlap_mask_area_threshold
+        if pred_class in stuff_memory_list:
+            current_segment_id = stuff_memory_list[pred_class]
+        else:
+            current_segment_id += 1
+
+        # Add current object segment to final segmentation map
+        query_segment_ids[k] = current_segment_id
+        segments.append(
+            {
+                "id": current_segment_id,
+                "label_id": pred_class,
+                "was_fused": should_fuse,
+                "score": round(segment_scores[k], 6),
+            }
         )
+        if should_fuse:
+            stuff_memory_list[pred_class] = current_segment_id
 
-        if mask_exists:
-            if pred_class in stuff_memory_list:
-                current_segment_id = stuff_memory_list[pred_class]
-            else:
-                current_segment_id += 1
-
-            # Add current object segment to final segmentation map
-            segmentation[mask_k] = current_segment_id
-            segment_score = round(pred_scores[k].item(), 6)
-            segments.append(
-                {
-                    "id": current_segment_id,
-                    "label_id": pred_class,
-                    "was_fused": should_fuse,
-                    "score": segment_score,
-                }
-            )
-            if should_fuse:
-                stuff_memory_list[pred_class] = current_segment_id
+    # Each pixel takes the segment id of the query it is assigned to, 0 if that query is not a segment
+    query_segment_ids = torch.tensor(query_segment_ids, dtype=torch.int32, device=mask_probs.device)
+    segmentation = query_segment_ids[mask_labels].view(height, width)
 
     return segmentation, segments
 
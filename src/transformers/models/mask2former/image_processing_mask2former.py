@@ -140,15 +140,23 @@ def convert_segmentation_to_rle(segmentation):
     Returns:
         `List[List]`: A list of lists, where each list is the run-length encoding of a segment / class id.
     """
-    segment_ids = torch.unique(segmentation)
+    pixels = segmentation.flatten()
+    if pixels.numel() == 0:
+        return []
 
-    run_length_encodings = []
-    for idx in segment_ids:
-        mask = torch.where(segmentation == idx, 1, 0)
-        rle = binary_mask_to_rle(mask)
-        run_length_encodings.append(rle)
+    # Runs of constant value of the flattened map, each run belongs to the RLE of its value
+    run_starts = torch.nonzero(pixels[1:] != pixels[:-1]).flatten() + 1
+    run_starts = torch.cat([run_starts.new_zeros(1), run_starts])
+    run_lengths = torch.diff(run_starts, append=run_starts.new_tensor([pixels.numel()]))
+    run_values = pixels[run_starts]
 
-    return run_length_encodings
+    # Group the runs by segment id (sorted like `torch.unique`), keeping their order within each segment
+    _, runs_per_segment = torch.unique(run_values, return_counts=True)
+    order = torch.sort(run_values, stable=True).indices
+    runs = torch.stack([run_starts[order] + 1, run_lengths[order]], dim=-1).flatten().cpu().numpy()
+    run_length_encodings = np.split(runs, np.cumsum(2 * runs_per_segment.cpu().numpy())[:-1])
+
+    return [list(rle) for rle in run_length_encodings]
 
 
 # Copied from transformers.models.detr.image_processing_detr.remove_low_and_no_objects
@@ -212,7 +220,6 @@ def compute_segments(
     height = mask_probs.shape[1] if target_size is None else target_size[0]
     width = mask_probs.shape[2] if target_size is None else target_size[1]
 
-    segmentation = torch.zeros((height, width), dtype=torch.int32, device=mask_probs.device)
     segments: List[Dict] = []
 
     if target_size is not None:
@@ -226,36 +233,45 @@ def compute_segments(
     mask_probs *= pred_scores.view(-1, 1, 1)
     mask_labels = mask_probs.argmax(0)  # [height, width]
 
+    # Check which masks exist and are large enough to be a segment, for all the queries at once: the area of the
+    # pixels assigned to query k should be a large enough part of the area of all the stuff in query k
+    num_queries = pred_labels.shape[0]
+    mask_k_areas = torch.bincount(mask_labels.flatten(), minlength=num_queries)
+    original_areas = (mask_probs >= mask_threshold).flatten(1).sum(1, dtype=torch.int32)
+    # Eliminate disconnected tiny segments, comparing the ratios in double precision like python floats
+    area_ratios = (mask_k_areas / original_areas).double()
+    mask_exists = (mask_k_areas > 0) & (original_areas > 0) & (area_ratios > overlap_mask_area_threshold)
+
     # Keep track of instances of each class
     stuff_memory_list: Dict[str, int] = {}
-    for k in range(pred_labels.shape[0]):
-        pred_class = pred_labels[k].item()
+    query_segment_ids = [0] * num_queries
+    pred_classes = pred_labels.tolist()
+    segment_scores = pred_scores.tolist()
+    for k in torch.nonzero(mask_exists).flatten().tolist():
+        pred_class = pred_classes[k]
         should_fuse = pred_class in label_ids_to_fuse
 
-        # Check if mask exists and large enough to be a segment
-        mask_exists, mask_k = check_segment_validity(
-            mask_labels, mask_probs, k, mask_threshold, overlap_mask_area_threshold
+        if pred_class in stuff_memory_list:
+            current_segment_id = stuff_memory_list[pred_class]
+        else:
+            current_segment_id += 1
+
+        # Add current object segment to final segmentation map
+        query_segment_ids[k] = current_segment_id
+        segments.append(
+            {
+                "id": current_segment_id,
+                "label_id": pred_class,
+                "was_fused": should_fuse,
+                "score": round(segment_scores[k], 6),
+            }
         )
+        if should_fuse:
+            stuff_memory_list[pred_class] = current_segment_id
 
-        if mask_exists:
-            if pred_class in stuff_memory_list:
-                current_segment_id = stuff_memory_list[pred_class]
-            else:
-                current_segment_id += 1
-
-            # Add current object segment to final segmentation map
-            segmentation[mask_k] = current_segment_id
-            segment_score = round(pred_scores[k].item(), 6)
-            segments.append(
-                {
-                    "id": current_segment_id,
-                    "label_id": pred_class,
-                    "was_fused": should_fuse,
-                    "score": segment_score,
-                }
-            )
-            if should_fuse:
-                stuff_memory_list[pred_class] = current_segment_id
+    # Each pixel takes the segment id of the query it is assigned to, 0 if that query is not a segment
+    query_segment_ids = torch.tensor(query_segment_ids, dtype=torch.int32, device=mask_probs.device)
+    segmentation = query_segment_ids[mask_labels].view(height, width)
 
     return segmentation, segments
 
@@ -1114,23 +1130,24 @@ class Mask2FormerImageProcessor(BaseImageProcessor):
                     pred_masks.unsqueeze(0), size=target_sizes[i], mode="nearest"
                 )[0]
 
-            instance_maps, segments = [], []
-            current_segment_id = 0
-            for j in range(num_queries):
-                score = pred_scores[j].item()
-
-                if not torch.all(pred_masks[j] == 0) and score >= threshold:
-                    segmentation[pred_masks[j] == 1] = current_segment_id
-                    segments.append(
-                        {
-                            "id": current_segment_id,
-                            "label_id": pred_classes[j].item(),
-                            "was_fused": False,
-                            "score": round(score, 6),
-                        }
-                    )
-                    current_segment_id += 1
-                    instance_maps.append(pred_masks[j])
+            # Keep the non-empty masks scored above the threshold, in the order of the queries. The scores are
+            # compared in double precision like python floats
+            keep = (pred_masks.flatten(1).amax(1) > 0) & (pred_scores.double() >= threshold)
+            kept_queries = torch.nonzero(keep).flatten()
+            instance_maps = pred_masks[kept_queries]
+            segments = [
+                {"id": segment_id, "label_id": label_id, "was_fused": False, "score": round(score, 6)}
+                for segment_id, (label_id, score) in enumerate(
+                    zip(pred_classes[kept_queries].tolist(), pred_scores[kept_queries].tolist())
+                )
+            ]
+
+            if len(segments) > 0:
+                # Each pixel takes the id of the last instance covering it, like when painting them in order, and
+                # stays at -1 if no instance covers it
+                instance_ids = torch.arange(1, len(segments) + 1, dtype=instance_maps.dtype, device=device)
+                last_instance_ids = (instance_maps * instance_ids.view(-1, 1, 1)).amax(0) - 1
+                segmentation = last_instance_ids.to(segmentation.device, segmentation.dtype)
 
             # Return segmentation map in run-length encoding (RLE) format
             if return_coco_annotation:
@@ -1138,7 +1155,7 @@ class Mask2FormerImageProcessor(BaseImageProcessor):
 
             # Return a concatenated tensor of binary instance maps
             if return_binary_maps and len(instance_maps) != 0:
-                segmentation = torch.stack(instance_maps, dim=0)
+                segmentation = instance_maps
 
             results.append({"segmentation": segmentation, "segments_info": segments})
         return results
@@ -19,7 +19,7 @@
 # limitations under the License.
 """Fast Image processor class for Qwen2-VL."""
 
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from ...image_processing_utils import BatchFeature
 from ...image_processing_utils_fast import (
@@ -29,6 +29,7 @@ from ...image_processing_utils_fast import (
     group_images_by_shape,
     reorder_images,
 )
+from ...image_transforms import pack_images
 from ...image_utils import (
     OPENAI_CLIP_MEAN,
     OPENAI_CLIP_STD,
@@ -127,9 +128,10 @@ class Qwen2VLImageProcessorFast(BaseImageProcessorFast):
         do_convert_rgb: bool,
         input_data_format: Optional[Union[str, ChannelDimension]],
         device: Optional[Union[str, torch.device]],
-    ):
+    ) -> Tuple[Dict[Tuple[int, int], "torch.Tensor"], Dict[int, Tuple[Tuple[int, int], int]]]:
         """
-        Preprocess an image or batch of images. Copy of the `preprocess` method from `CLIPImageProcessor`.
+        Preprocess a batch of images, resized, rescaled and normalized in batches of images of the same size. Returns
+        the processed images grouped by shape, and the index of each image in the groups.
 
         Args:
             images (`ImageInput`):
@@ -167,14 +169,12 @@ class Qwen2VLImageProcessorFast(BaseImageProcessorFast):
             device=device,
         )
 
-        height, width = get_image_size(images[0], channel_dim=ChannelDimension.FIRST)
-        resized_height, resized_width = height, width
-
         # Group images by size for batched resizing
         grouped_images, grouped_images_index = group_images_by_shape(images)
         resized_images_grouped = {}
         for shape, stacked_images in grouped_images.items():
             if do_resize:
+                height, width = get_image_size(stacked_images[0], channel_dim=ChannelDimension.FIRST)
                 resized_height, resized_width = smart_resize(
                     height,
                     width,
@@ -199,17 +199,20 @@ class Qwen2VLImageProcessorFast(BaseImageProcessorFast):
             )
             processed_images_grouped[shape] = stacked_images
 
-        processed_images = reorder_images(processed_images_grouped, grouped_images_index)
-        patches = torch.stack(processed_images, dim=0)
-        if patches.shape[0] % self.temporal_patch_size != 0:
-            repeats = patches[-1].unsqueeze(0).repeat(self.temporal_patch_size - 1, 1, 1, 1)
-            patches = torch.cat([patches, repeats], dim=0)
+        return processed_images_grouped, grouped_images_index
 
-        channel = patches.shape[1]
-        grid_t = patches.shape[0] // self.temporal_patch_size
-        grid_h, grid_w = resized_height // self.patch_size, resized_width // self.patch_size
+    def _flatten_patches(self, clips: "torch.Tensor") -> Tuple["torch.Tensor", Tuple[int, int, int]]:
+        """
+        Splits a batch of clips of the same size, of shape `(batch_size, num_frames, num_channels, height, width)`,
+        into flattened patches of shape `(batch_size, grid_t * grid_h * grid_w, num_channels * temporal_patch_size *
+        patch_size * patch_size)`. Also returns the grid `(grid_t, grid_h, grid_w)` of the patches of each clip.
+        """
+        batch_size, num_frames, channel, height, width = clips.shape
+        grid_t = num_frames // self.temporal_patch_size
+        grid_h, grid_w = height // self.patch_size, width // self.patch_size
 
-        patches = patches.view(
+        patches = clips.reshape(
+            batch_size,
             grid_t,
             self.temporal_patch_size,
             channel,
@@ -220,9 +223,11 @@ class Qwen2VLImageProcessorFast(BaseImageProcessorFast):
             self.merge_size,
             self.patch_size,
         )
-        patches = patches.permute(0, 3, 6, 4, 7, 2, 1, 5, 8)
+        patches = patches.permute(0, 1, 4, 7, 5, 8, 3, 2, 6, 9)
         flatten_patches = patches.reshape(
-            grid_t * grid_h * grid_w, channel * self.temporal_patch_size * self.patch_size * self.patch_size
+            batch_size,
+            grid_t * grid_h * grid_w,
+            channel * self.temporal_patch_size * self.patch_size * self.patch_size,
         )
 
         return flatten_patches, (grid_t, grid_h, grid_w)
@@ -335,49 +340,53 @@ class Qwen2VLImageProcessorFast(BaseImageProcessorFast):
                 "torch.Tensor, tf.Tensor or jax.ndarray."
             )
 
+        process_kwargs = {
+            "do_resize": do_resize,
+            "size": size,
+            "interpolation": interpolation,
+            "do_rescale": do_rescale,
+            "rescale_factor": rescale_factor,
+            "do_normalize": do_normalize,
+            "image_mean": image_mean,
+            "image_std": image_std,
+            "do_convert_rgb": do_convert_rgb,
+            "input_data_format": input_data_format,
+            "device": device,
+        }
+
         if images is not None:
-            pixel_values, vision_grid_thws = [], []
-            for image in images:
-                patches, image_grid_thw = self._preprocess(
-                    image,
-                    do_resize=do_resize,
-                    size=size,
-                    interpolation=interpolation,
-                    do_rescale=do_rescale,
-                    rescale_factor=rescale_factor,
-                    do_normalize=do_normalize,
-                    image_mean=image_mean,
-                    image_std=image_std,
-                    do_convert_rgb=do_convert_rgb,
-                    input_data_format=input_data_format,
-                    device=device,
-                )
-                pixel_values.extend(patches)
-                vision_grid_thws.append(image_grid_thw)
-            pixel_values = torch.stack(pixel_values)
-            vision_grid_thws = torch.tensor(vision_grid_thws)
+            # All the images are processed together, and the patches of the images of the same size are flattened
+            # together before being packed in the original order, without padding
+            processed_images_grouped, grouped_images_index = self._preprocess(images, **process_kwargs)
+            patches_grouped, grid_thw_grouped = {}, {}
+            for shape, stacked_images in processed_images_grouped.items():
+                # An image is a clip of a single frame, repeated to fill the temporal patch
+                clips = stacked_images.unsqueeze(1).expand(-1, self.temporal_patch_size, -1, -1, -1)
+                patches_grouped[shape], grid_thw_grouped[shape] = self._flatten_patches(clips)
+            pixel_values, _ = pack_images(patches_grouped, grouped_images_index)
+            vision_grid_thws = torch.tensor(
+                [grid_thw_grouped[grouped_images_index[i][0]] for i in range(len(grouped_images_index))]
+            )
             data = {"pixel_values": pixel_values, "image_grid_thw": vision_grid_thws}
 
         if videos is not None:
+            # The frames of all the videos are processed together, then split back into videos
+            videos = [self._prepare_images_structure(video) for video in videos]
+            frames = [frame for video in videos for frame in video]
+            processed_frames_grouped, grouped_frames_index = self._preprocess(frames, **process_kwargs)
+            processed_frames = reorder_images(processed_frames_grouped, grouped_frames_index)
             pixel_values, vision_grid_thws = [], []
-            for images in videos:
-                patches, video_grid_thw = self._preprocess(
-                    images,
-                    do_resize=do_resize,
-                    size=size,
-                    interpolation=interpolation,
-                    do_rescale=do_rescale,
-                    rescale_factor=rescale_factor,
-                    do_normalize=do_normalize,
-                    image_mean=image_mean,
-                    image_std=image_std,
-                    do_convert_rgb=do_convert_rgb,
-                    input_data_format=input_data_format,
-                    device=device,
-                )
-                pixel_values.extend(patches)
+            for video in videos:
+                video_frames = processed_frames[: len(video)]
+                processed_frames = processed_frames[len(video) :]
+                clip = torch.stack(video_frames, dim=0)
+                if clip.shape[0] % self.temporal_patch_size != 0:
+                    repeats = clip[-1].unsqueeze(0).repeat(self.temporal_patch_size - 1, 1, 1, 1)
+                    clip = torch.cat([clip, repeats], dim=0)
+                patches, video_grid_thw = self._flatten_patches(clip.unsqueeze(0))
+                pixel_values.append(patches[0])
                 vision_grid_thws.append(video_grid_thw)
-            pixel_values = torch.stack(pixel_values)
+            pixel_values = torch.cat(pixel_values, dim=0)
             vision_grid_thws = torch.tensor(vision_grid_thws)
             data = {"pixel_values_videos": pixel_values, "video_grid_thw": vision_grid_thws}
 
@@ -16,11 +16,11 @@
 Feature extractor class for Wav2Vec2
 """
 
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 import numpy as np
 
-from ...feature_extraction_sequence_utils import SequenceFeatureExtractor
+from ...feature_extraction_sequence_utils import SequenceFeatureExtractionStream, SequenceFeatureExtractor
 from ...feature_extraction_utils import BatchFeature
 from ...utils import PaddingStrategy, TensorType, logging
 
@@ -99,6 +99,16 @@ class Wav2Vec2FeatureExtractor(SequenceFeatureExtractor):
 
         return normed_input_values
 
+    def create_stream(self) -> "Wav2Vec2FeatureExtractionStream":
+        """
+        Creates a stream to compute the input values of live audio received in chunks of arbitrary size. Calling the
+        stream with a chunk returns the input values of this chunk only.
+
+        When `do_normalize=True`, the values are normalized with the running mean and variance of the audio received
+        so far (including the chunk), instead of the mean and variance of the whole audio.
+        """
+        return Wav2Vec2FeatureExtractionStream(self)
+
     def __call__(
         self,
         raw_speech: Union[np.ndarray, List[float], List[np.ndarray], List[List[float]]],
@@ -240,4 +250,40 @@ class Wav2Vec2FeatureExtractor(SequenceFeatureExtractor):
         return padded_inputs
 
 
+class Wav2Vec2FeatureExtractionStream(SequenceFeatureExtractionStream):
+    """
+    Computes the input values of [`Wav2Vec2FeatureExtractor`] over live audio, see
+    [`~Wav2Vec2FeatureExtractor.create_stream`].
+    """
+
+    def reset(self):
+        super().reset()
+        self.mean = 0.0
+        # Sum of the squared differences to the mean
+        self.sum_squares = 0.0
+
+    def _process_chunk(self, raw_speech: np.ndarray) -> Dict[str, np.ndarray]:
+        input_values = raw_speech
+        if self.feature_extractor.do_normalize and len(raw_speech) > 0:
+            # Merge the statistics of the chunk with the ones of the previous chunks
+            num_samples = self.num_samples + len(raw_speech)
+            chunk_mean = raw_speech.mean(dtype=np.float64)
+            delta = chunk_mean - self.mean
+            self.sum_squares += ((raw_speech - chunk_mean) ** 2).sum(dtype=np.float64)
+            self.sum_squares += delta**2 * self.num_samples * len(raw_speech) / num_samples
+            self.mean += delta * len(raw_speech) / num_samples
+            input_values = (raw_speech - self.mean) / np.sqrt(self.sum_squares / num_samples + 1e-7)
+
+        features = {"input_values": input_values[None].astype(np.float32)}
+        if self.feature_extractor.return_attention_mask:
+            features["attention_mask"] = np.ones_like(features["input_values"], dtype=np.int32)
+        return features
+
+    def _flush(self) -> Dict[str, np.ndarray]:
+        features = {"input_values": np.zeros((1, 0), dtype=np.float32)}
+        if self.feature_extractor.return_attention_mask:
+            features["attention_mask"] = np.zeros((1, 0), dtype=np.int32)
+        return features
+
+
 __all__ = ["Wav2Vec2FeatureExtractor"]
@@ -16,13 +16,13 @@
 Feature extractor class for Whisper
 """
 
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 import numpy as np
 
 from ... import is_torch_available
-from ...audio_utils import mel_filter_bank, spectrogram, window_function
-from ...feature_extraction_sequence_utils import SequenceFeatureExtractor
+from ...audio_utils import StreamingSpectrogram, mel_filter_bank, spectrogram, window_function
+from ...feature_extraction_sequence_utils import SequenceFeatureExtractionStream, SequenceFeatureExtractor
 from ...feature_extraction_utils import BatchFeature
 from ...utils import TensorType, logging
 
@@ -166,6 +166,27 @@ class WhisperFeatureExtractor(SequenceFeatureExtractor):
             log_spec = log_spec.detach().cpu()
         return log_spec.numpy()
 
+    def create_stream(self) -> "WhisperFeatureExtractionStream":
+        """
+        Creates a stream to compute the log-mel features of live audio received in chunks of arbitrary size. Calling
+        the stream with a chunk returns the newly completed frames only, so that the features of a rolling buffer
+        don't have to be recomputed each time new audio arrives.
+
+        The features are the same as the ones of [`~WhisperFeatureExtractor.__call__`] with `padding="longest"`,
+        except that the log-mel values are clamped relatively to the maximum value received so far instead of the
+        maximum of the whole audio.
+
+        Example:
+
+        ```python
+        >>> stream = feature_extractor.create_stream()
+        >>> for chunk in audio_chunks:  # doctest: +SKIP
+        ...     new_frames = stream(chunk, sampling_rate=16000).input_features  # (1, feature_size, num_new_frames)
+        >>> last_frames = stream.flush().input_features  # doctest: +SKIP
+        ```
+        """
+        return WhisperFeatureExtractionStream(self)
+
     @staticmethod
     # Copied from transformers.models.wav2vec2.feature_extraction_wav2vec2.Wav2Vec2FeatureExtractor.zero_mean_unit_var_norm
     def zero_mean_unit_var_norm(
@@ -335,4 +356,42 @@ class WhisperFeatureExtractor(SequenceFeatureExtractor):
         return padded_inputs
 
 
+class WhisperFeatureExtractionStream(SequenceFeatureExtractionStream):
+    """
+    Computes the log-mel features of [`WhisperFeatureExtractor`] over live audio, see
+    [`~WhisperFeatureExtractor.create_stream`].
+    """
+
+    def __init__(self, feature_extractor: WhisperFeatureExtractor):
+        self.spectrogram = StreamingSpectrogram(
+            window_function(feature_extractor.n_fft, "hann"),
+            frame_length=feature_extractor.n_fft,
+            hop_length=feature_extractor.hop_length,
+            power=2.0,
+            dither=feature_extractor.dither,
+            mel_filters=feature_extractor.mel_filters,
+            log_mel="log10",
+        )
+        super().__init__(feature_extractor)
+
+    def reset(self):
+        super().reset()
+        self.spectrogram.reset()
+        self.max_log_spec = -np.inf
+
+    def _normalize(self, log_spec: np.ndarray) -> np.ndarray:
+        if log_spec.shape[1] > 0:
+            self.max_log_spec = max(self.max_log_spec, log_spec.max())
+        log_spec = np.maximum(log_spec, self.max_log_spec - 8.0)
+        log_spec = (log_spec + 4.0) / 4.0
+        return log_spec[None].astype(np.float32)
+
+    def _process_chunk(self, raw_speech: np.ndarray) -> Dict[str, np.ndarray]:
+        return {"input_features": self._normalize(self.spectrogram(raw_speech))}
+
+    def _flush(self) -> Dict[str, np.ndarray]:
+        # The last frame is dropped, as in `WhisperFeatureExtractor`
+        return {"input_features": self._normalize(self.spectrogram.flush()[:, :-1])}
+
+
 __all__ = ["WhisperFeatureExtractor"]
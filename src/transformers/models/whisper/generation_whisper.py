@@ -794,11 +794,11 @@ class WhisperGenerationMixin(GenerationMixin):
             )
 
             # 6.7 In every generated sequence, split by timestamp tokens and extract segments
+            segment_offsets = seek_num_frames[batch_idx_map].tolist()
             for i, seek_sequence in enumerate(seek_sequences):
                 prev_i = batch_idx_map[i]
 
                 if should_skip[i]:
-                    seek[prev_i] += seek_num_frames[prev_i]
                     continue
 
                 segments, segment_offset = self._retrieve_segment(
@@ -816,10 +816,12 @@ class WhisperGenerationMixin(GenerationMixin):
                     decoder_input_ids=decoder_input_ids,
                 )
 
-                seek[prev_i] += segment_offset
-
+                segment_offsets[i] = int(segment_offset)
                 current_segments[prev_i] += segments
 
+            # move the 30s windows of all the audios at once
+            seek[batch_idx_map] += torch.tensor(segment_offsets, dtype=seek.dtype)
+
             if force_unique_generate_call:
                 break
 
@@ -961,6 +963,11 @@ class WhisperGenerationMixin(GenerationMixin):
 
             model_output_type = type(seek_outputs)
 
+            # keep the scores of the whole batch to compute the average log probabilities before they are split
+            batch_scores = None
+            if not isinstance(seek_outputs, torch.Tensor) and seek_outputs.get("beam_indices") is None:
+                batch_scores = seek_outputs.get("scores")
+
             # post-process sequence tokens and outputs to be in list form
             seek_sequences, seek_outputs = self._postprocess_outputs(
                 seek_outputs=seek_outputs,
@@ -974,22 +981,26 @@ class WhisperGenerationMixin(GenerationMixin):
                 seek_sequences = seek_sequences[:cur_bsz]
                 seek_outputs = seek_outputs[:cur_bsz]
 
+            # remove all padding tokens, except for the eos token
+            num_tokens = self._retrieve_num_tokens(seek_sequences, generation_config)
+
+            avg_logprobs = None
+            if (
+                generation_config.logprob_threshold is not None
+                and batch_scores is not None
+                and len(batch_scores) == seek_sequences.shape[-1]
+            ):
+                avg_logprobs = self._retrieve_avg_logprobs_batch(
+                    [step_scores[:cur_bsz] for step_scores in batch_scores], seek_sequences, num_tokens, temperature
+                )
+
             # 6.7 Extract cut sequences from every sequence and check if fallback should be applied
             # Loop over each decoded audio individually as each decoding can be of a different length
-            new_fallback_index_map = []
-            new_segment_input = []
-            new_decoder_input_ids = []
-            new_decoder_attention_mask = []
+            num_tokens = num_tokens.tolist()
+            fallback_indices = []
 
             for i, seek_sequence in enumerate(seek_sequences):
-                # remove all padding tokens, except for the eos token
-                if seek_sequence[-1] == generation_config.pad_token_id:
-                    num_paddings = (seek_sequence == generation_config.pad_token_id).sum()
-                    if generation_config.pad_token_id == generation_config.eos_token_id:
-                        # we do not remove the eos token id since it is needed for avg logprob calculation in _need_fallback
-                        num_paddings -= 1
-                    if num_paddings != 0:
-                        seek_sequence = seek_sequence[:-num_paddings]
+                seek_sequence = seek_sequence[: num_tokens[i]]
 
                 # check which sequences in batch need fallback & which should be skipped
                 needs_fallback[i], should_skip[i] = self._need_fallback(
@@ -1000,6 +1011,7 @@ class WhisperGenerationMixin(GenerationMixin):
                     generation_config,
                     self.config.vocab_size,
                     temperature,
+                    avg_logprobs=avg_logprobs[i] if avg_logprobs is not None else None,
                 )
 
                 # remove eos token
@@ -1014,13 +1026,9 @@ class WhisperGenerationMixin(GenerationMixin):
                 )
 
                 if needs_fallback[i]:
-                    new_fallback_index_map.append(fallback_index_map[i])
-                    new_segment_input.append(segment_input[i])
-                    new_decoder_input_ids.append(decoder_input_ids[i])
-                    if "decoder_attention_mask" in kwargs:
-                        new_decoder_attention_mask.append(kwargs["decoder_attention_mask"][i])
+                    fallback_indices.append(i)
 
-            fallback_index_map = new_fallback_index_map
+            fallback_index_map = [fallback_index_map[i] for i in fallback_indices]
 
             # if no sequence needs to be run with temperature fallback, we're finished
             if len(fallback_index_map) == 0 or fallback_idx == len(temperatures) - 1:
@@ -1028,11 +1036,14 @@ class WhisperGenerationMixin(GenerationMixin):
                 seek_outputs = seek_outputs_list
                 break
 
-            # if we're still in the loop, make sure that decoder_input_ids and segment inputs are tensors
-            decoder_input_ids = torch.stack(new_decoder_input_ids)
-            segment_input = torch.stack(new_segment_input)
+            # if we're still in the loop, only keep the batch items that need fallback for the next generation call
+            decoder_input_ids = decoder_input_ids[torch.tensor(fallback_indices, device=decoder_input_ids.device)]
+            segment_input = segment_input[torch.tensor(fallback_indices, device=segment_input.device)]
             if "decoder_attention_mask" in kwargs:
-                kwargs["decoder_attention_mask"] = torch.stack(new_decoder_attention_mask)
+                decoder_attention_mask = kwargs["decoder_attention_mask"]
+                kwargs["decoder_attention_mask"] = decoder_attention_mask[
+                    torch.tensor(fallback_indices, device=decoder_attention_mask.device)
+                ]
 
         return seek_sequences, seek_outputs, should_skip, do_condition_on_prev_tokens, model_output_type
 
@@ -1071,13 +1082,22 @@ class WhisperGenerationMixin(GenerationMixin):
                 num_input_ids=decoder_input_ids.shape[-1],
             )
 
+        # Move the outputs of each generation step to the CPU once for the whole batch, rather than once per batch item
+        cpu_outputs = {}
+        for key, values in seek_outputs.items():
+            if key in ["scores", "encoder_attentions", "encoder_hidden_states", "logits"]:
+                cpu_outputs[key] = [v.cpu() for v in values]
+            elif key in ["decoder_attentions", "decoder_hidden_states", "cross_attentions"]:
+                cpu_outputs[key] = tuple(tuple(w.cpu() for w in v) for v in values)
+
         def split_by_batch_index(values, key, batch_idx, is_shortform, beam_indices=None):
             if beam_indices is not None and key == "scores":
-                return [v[beam_idx].cpu() for (v, beam_idx) in zip(values, beam_indices[batch_idx][: len(values)])]
+                beam_indices = beam_indices[batch_idx][: len(values)].tolist()
+                return [v[beam_idx] for (v, beam_idx) in zip(cpu_outputs[key], beam_indices)]
             if key in ["scores", "encoder_attentions", "encoder_hidden_states", "logits"]:
-                return [v[batch_idx].cpu() for v in values]
+                return [v[batch_idx] for v in cpu_outputs[key]]
             if key in ["decoder_attentions", "decoder_hidden_states", "cross_attentions"]:
-                return tuple(tuple(w[batch_idx][None].cpu() for w in v) for v in values)
+                return tuple(tuple(w[batch_idx][None] for w in v) for v in cpu_outputs[key])
             elif key == "past_key_values":
                 if not is_shortform:
                     # we don't save `past_key_values` as this is too costly for longform
@@ -1166,6 +1186,7 @@ class WhisperGenerationMixin(GenerationMixin):
         generation_config,
         vocab_size,
         temperature,
+        avg_logprobs=None,
     ):
         needs_fallback = False
         should_skip = False
@@ -1176,7 +1197,9 @@ class WhisperGenerationMixin(GenerationMixin):
                 needs_fallback = True
 
         if generation_config.logprob_threshold is not None:
-            if hasattr(seek_outputs[0], "sequences_scores"):
+            if avg_logprobs is not None:
+                logprobs = avg_logprobs
+            elif hasattr(seek_outputs[0], "sequences_scores"):
                 logprobs = [s["sequences_scores"] for s in seek_outputs][index]
             else:
                 scores = seek_outputs[index]["scores"]
@@ -1717,39 +1740,26 @@ class WhisperGenerationMixin(GenerationMixin):
 
     @staticmethod
     def _maybe_reduce_batch(input_features, seek, max_frames, cur_bsz, batch_idx_map):
-        prev_bsz = cur_bsz
-        new_batch_idx_map = []
-        for i in range(prev_bsz):
-            prev_i = batch_idx_map[i]
-            if seek[prev_i] >= max_frames[prev_i]:
-                cut_index = i + (cur_bsz - prev_bsz)
-                cur_bsz -= 1
-                input_features = torch.cat([input_features[:cut_index], input_features[cut_index + 1 :]], dim=0)
-            else:
-                # cut out index that goes away
-                new_batch_idx_map.append(prev_i)
+        # drop all the finished audios at once, rather than concatenating the features again for each of them
+        is_running = (seek[batch_idx_map] < max_frames[batch_idx_map]).tolist()
+        new_batch_idx_map = [prev_i for prev_i, running in zip(batch_idx_map, is_running) if running]
+        if len(new_batch_idx_map) < cur_bsz:
+            running_indices = [i for i, running in enumerate(is_running) if running]
+            input_features = input_features[torch.tensor(running_indices, device=input_features.device)]
 
-        return input_features, cur_bsz, new_batch_idx_map
+        return input_features, len(new_batch_idx_map), new_batch_idx_map
 
     @staticmethod
     def _get_input_segment(input_features, seek, seek_num_frames, num_segment_frames, cur_bsz, batch_idx_map):
         if input_features is None:
             return None
 
-        segment_input = []
-        for i in range(cur_bsz):
-            prev_i = batch_idx_map[i]
-            segment_input_slice = input_features[i : i + 1, :, seek[prev_i] : seek[prev_i] + seek_num_frames[prev_i]]
-
-            if segment_input_slice.shape[-1] < num_segment_frames:
-                # pad to 3000 if necessary
-                segment_input_slice = F.pad(
-                    segment_input_slice, pad=(0, num_segment_frames - segment_input_slice.shape[-1])
-                )
-
-            segment_input.append(segment_input_slice)
-
-        segment_input = torch.cat(segment_input, dim=0)
+        # the segments shorter than `num_segment_frames` are padded with zeros up to 3000 frames
+        segment_input = input_features.new_zeros(input_features.shape[:-1] + (num_segment_frames,))
+        seek_starts = seek[batch_idx_map].tolist()
+        seek_lengths = seek_num_frames[batch_idx_map].tolist()
+        for i, (seek_start, seek_length) in enumerate(zip(seek_starts, seek_lengths)):
+            segment_input[i, :, :seek_length] = input_features[i, :, seek_start : seek_start + seek_length]
 
         return segment_input
 
@@ -1882,6 +1892,42 @@ class WhisperGenerationMixin(GenerationMixin):
         avg_logprobs = sum_logprobs / len(tokens)
         return avg_logprobs
 
+    @staticmethod
+    def _retrieve_avg_logprobs_batch(scores, tokens, num_tokens, temperature):
+        """
+        Batched version of `_retrieve_avg_logprobs`, for `tokens` of shape `(batch_size, num_steps)` where only the first
+        `num_tokens` tokens of each row are taken into account, and `scores` the list of the `num_steps` scores of shape
+        `(batch_size, vocab_size)` that generated them.
+        """
+        rescale_temperature = temperature if temperature > 0.0 else 1
+        num_tokens = num_tokens.to(tokens.device)
+        sum_logprobs = torch.zeros(tokens.shape[0], device=tokens.device, dtype=scores[0].dtype)
+
+        for step, step_scores in enumerate(scores):
+            step_scores = step_scores.to(tokens.device)
+            logprobs = F.log_softmax((step_scores * rescale_temperature).float(), dim=-1).to(step_scores.dtype)
+            # don't remove the eos token logprob! it counts in avg_logprob calculation in the original implementation
+            step_logprobs = logprobs.gather(-1, tokens[:, step, None]).squeeze(-1)
+            sum_logprobs += torch.where(step < num_tokens, step_logprobs, 0)
+
+        return sum_logprobs / num_tokens
+
+    @staticmethod
+    def _retrieve_num_tokens(sequences, generation_config):
+        """
+        Number of tokens of each of the generated `sequences` once their padding is removed. When the padding token is
+        also the eos token, one padding token is kept as the eos token.
+        """
+        num_tokens = torch.full((sequences.shape[0],), sequences.shape[-1], device=sequences.device)
+        pad_token_id = generation_config.pad_token_id
+        if pad_token_id is None or sequences.shape[-1] == 0:
+            return num_tokens
+
+        num_paddings = (sequences == pad_token_id).sum(-1)
+        if pad_token_id == generation_config.eos_token_id:
+            num_paddings -= 1
+        return torch.where(sequences[:, -1] == pad_token_id, num_tokens - num_paddings, num_tokens)
+
     @staticmethod
     def _retrieve_segment(
         seek_sequence,
@@ -18,6 +18,7 @@ from typing import TYPE_CHECKING, Dict, Optional, Union
 import numpy as np
 import requests
 
+from ..audio_utils import voice_activity_segments
 from ..tokenization_utils import PreTrainedTokenizer
 from ..utils import is_torch_available, is_torchaudio_available, logging
 from .audio_utils import ffmpeg_read
@@ -58,41 +59,143 @@ def rescale_stride(stride, ratio):
     return new_strides
 
 
-def chunk_iter(inputs, feature_extractor, chunk_len, stride_left, stride_right, dtype=None):
-    inputs_len = inputs.shape[0]
+def _iter_chunk_bounds(inputs_len, chunk_len, stride_left, stride_right):
+    """
+    Yields the `(chunk_start_idx, chunk_end_idx, stride, is_last)` of the chunks of an input of length `inputs_len`.
+    """
     step = chunk_len - stride_left - stride_right
     for chunk_start_idx in range(0, inputs_len, step):
         chunk_end_idx = chunk_start_idx + chunk_len
-        chunk = inputs[chunk_start_idx:chunk_end_idx]
-        processed = feature_extractor(chunk, sampling_rate=feature_extractor.sampling_rate, return_tensors="pt")
-        if dtype is not None:
-            processed = processed.to(dtype=dtype)
         _stride_left = 0 if chunk_start_idx == 0 else stride_left
         is_last = chunk_end_idx >= inputs_len
         _stride_right = 0 if is_last else stride_right
 
-        chunk_len = chunk.shape[0]
-        stride = (chunk_len, _stride_left, _stride_right)
-        if chunk.shape[0] > _stride_left:
-            yield {"is_last": is_last, "stride": stride, **processed}
+        _chunk_len = min(chunk_end_idx, inputs_len) - chunk_start_idx
+        stride = (_chunk_len, _stride_left, _stride_right)
+        if _chunk_len > _stride_left:
+            yield chunk_start_idx, chunk_end_idx, stride, is_last
         if is_last:
             break
 
 
+def chunk_iter(inputs, feature_extractor, chunk_len, stride_left, stride_right, dtype=None):
+    inputs_len = inputs.shape[0]
+    for chunk_start_idx, chunk_end_idx, stride, is_last in _iter_chunk_bounds(
+        inputs_len, chunk_len, stride_left, stride_right
+    ):
+        chunk = inputs[chunk_start_idx:chunk_end_idx]
+        processed = feature_extractor(chunk, sampling_rate=feature_extractor.sampling_rate, return_tensors="pt")
+        if dtype is not None:
+            processed = processed.to(dtype=dtype)
+        yield {"is_last": is_last, "stride": stride, **processed}
+
+
+def chunk_batch_iter(inputs, feature_extractor, chunk_len, stride_left, stride_right, batch_size, dtype=None):
+    """
+    Same as `chunk_iter`, but yields the chunks by batches of up to `batch_size` chunks, whose features are extracted
+    with a single call to the feature extractor. The batches have a `"num_chunks"` key, and their `"stride"` is the list
+    of the strides of their chunks.
+
+    Chunks are never padded: when the last chunk is shorter than the others and the feature extractor doesn't pad it
+    to the same shape, it gets a batch of its own.
+    """
+    bounds = list(_iter_chunk_bounds(inputs.shape[0], chunk_len, stride_left, stride_right))
+
+    def extract(chunk_bounds):
+        chunks = [inputs[chunk_start_idx:chunk_end_idx] for chunk_start_idx, chunk_end_idx, _, _ in chunk_bounds]
+        processed = feature_extractor(chunks, sampling_rate=feature_extractor.sampling_rate, return_tensors="pt")
+        if dtype is not None:
+            processed = processed.to(dtype=dtype)
+        return {
+            "is_last": chunk_bounds[-1][3],
+            "stride": [stride for _, _, stride, _ in chunk_bounds],
+            "num_chunks": len(chunk_bounds),
+            **processed,
+        }
+
+    for batch_start_idx in range(0, len(bounds), batch_size):
+        batch_bounds = bounds[batch_start_idx : batch_start_idx + batch_size]
+        full_chunks = [bound for bound in batch_bounds if bound[2][0] == chunk_len]
+        short_chunks = [bound for bound in batch_bounds if bound[2][0] != chunk_len]
+        if not full_chunks or not short_chunks:
+            yield extract(batch_bounds)
+            continue
+
+        full_batch, short_batch = extract(full_chunks), extract(short_chunks)
+        tensor_keys = [key for key, value in full_batch.items() if isinstance(value, torch.Tensor)]
+        if all(full_batch[key].shape[1:] == short_batch[key].shape[1:] for key in tensor_keys):
+            # The feature extractor padded the short chunk, both can be batched together
+            yield {
+                "is_last": short_batch["is_last"],
+                "stride": full_batch["stride"] + short_batch["stride"],
+                "num_chunks": len(batch_bounds),
+                **{key: torch.cat([full_batch[key], short_batch[key]]) for key in tensor_keys},
+            }
+        else:
+            yield full_batch
+            yield short_batch
+
+
+def segment_iter(inputs, feature_extractor, segments, dtype=None):
+    """
+    Same as `chunk_iter`, but yields the `[start, end)` segments of `inputs` given by `segments` instead of fixed-size
+    chunks. The segments don't overlap, and their `"segment_offset"` is the index of their first sample in `inputs`.
+    """
+    for segment_idx, (segment_start_idx, segment_end_idx) in enumerate(segments):
+        segment = inputs[segment_start_idx:segment_end_idx]
+        processed = feature_extractor(segment, sampling_rate=feature_extractor.sampling_rate, return_tensors="pt")
+        if dtype is not None:
+            processed = processed.to(dtype=dtype)
+        yield {
+            "is_last": segment_idx == len(segments) - 1,
+            "stride": (segment.shape[0], 0, 0),
+            "segment_offset": torch.tensor([segment_start_idx]),
+            **processed,
+        }
+
+
+def _shift_timestamps(chunks, shift):
+    """
+    Shifts the timestamps of `chunks` by `shift` seconds, to map the timestamps of a segment of `segment_iter` back to
+    the original audio.
+    """
+    for chunk in chunks:
+        chunk["timestamp"] = tuple(None if time is None else round(time + shift, 2) for time in chunk["timestamp"])
+    return chunks
+
+
+def _unbatch_chunk_outputs(model_outputs):
+    """
+    Splits the model outputs of the batches of chunks of `chunk_batch_iter` into one output per chunk.
+    """
+    for output in model_outputs:
+        num_chunks = output.pop("num_chunks", None)
+        if num_chunks is None:
+            yield output
+            continue
+        strides = output.pop("stride", None)
+        for chunk_idx in range(num_chunks):
+            chunk_output = {
+                key: value[chunk_idx : chunk_idx + 1] if key in ("tokens", "logits", "token_timestamps") else value
+                for key, value in output.items()
+            }
+            if strides is not None:
+                chunk_output["stride"] = strides[chunk_idx]
+            yield chunk_output
+
+
 def _fast_find_longest_common_sequence(sequence_left, sequence_right):
+    sequence_left = np.asarray(sequence_left)
+    sequence_right = np.asarray(sequence_right)
     seq_len_left = len(sequence_left)
     seq_len_right = len(sequence_right)
-    counter = [[0] * (seq_len_right + 1) for _ in range(seq_len_left + 1)]
-    longest = 0
+    # counter[i + 1, j + 1] is the length of the common sequence ending at sequence_left[i] and sequence_right[j]
+    counter = np.zeros((seq_len_left + 1, seq_len_right + 1), dtype=np.int64)
+    matches = sequence_left[:, None] == sequence_right[None, :]
     for i in range(seq_len_left):
-        for j in range(seq_len_right):
-            if sequence_left[i] == sequence_right[j]:
-                previous_counter = counter[i][j] + 1
-                counter[i + 1][j + 1] = previous_counter
-                if previous_counter > longest:
-                    longest = previous_counter
-
-    counter = np.array(counter)
+        counter[i + 1, 1:] = np.where(matches[i], counter[i, :-1] + 1, 0)
+    longest = int(counter.max()) if counter.size > 0 else 0
+
     # we return the idx of the first element of the longest common sequence in the left sequence
     index_left = np.argwhere(counter == longest)[-1][0] - longest if longest != 0 else -1
     index_right = np.argwhere(counter == longest)[-1][1] - longest if longest != 0 else -1
@@ -100,27 +203,32 @@ def _fast_find_longest_common_sequence(sequence_left, sequence_right):
 
 
 def _find_longest_common_sequence(sequences, tokenizer):
-    # TODO  Use a faster algorithm this can probably be done in O(n)
-    # using suffix array.
-    # It might be tedious to do because of fault tolerance.
-    # We actually have a really good property which is that the total sequence
-    # MUST be those subsequences in order.
-    # Also the algorithm should be more tolerant to errors.
-    sequence = [tok_id for tok_id in sequences[0][0].tolist() if tok_id not in tokenizer.all_special_ids]
+    # The total sequence MUST be those subsequences in order, each new sequence is merged at the end of the previous
+    # ones where it overlaps them the best.
+    special_ids = np.array(tokenizer.all_special_ids)
+    sequence = sequences[0][0]
+    sequence = sequence[~np.isin(sequence, special_ids)].tolist()
     for new_seq in sequences[1:]:
-        new_sequence = [tok_id for tok_id in new_seq[0].tolist() if tok_id not in tokenizer.all_special_ids]
+        new_sequence = new_seq[0]
+        new_sequence = new_sequence[~np.isin(new_sequence, special_ids)]
 
+        # matches[i - 1] is the number of tokens of `sequence[-i:]` equal to the ones of `new_sequence[:i]`
+        max_overlap = min(len(sequence), len(new_sequence))
         index = 0
-        max_ = 0.0
-        for i in range(1, len(new_sequence) + 1):
+        if max_overlap > 0:
+            tail = np.array(sequence[-max_overlap:])
+            equal = tail[:, None] == new_sequence[None, :]
+            # Sum the diagonals of `equal`, `sequence[-i:]` against `new_sequence[:i]` is the diagonal `a - b = max_overlap - i`
+            diagonal = np.subtract.outer(np.arange(max_overlap), np.arange(len(new_sequence))) + len(new_sequence) - 1
+            diagonal_matches = np.bincount(diagonal.ravel(), weights=equal.ravel(), minlength=diagonal.max() + 1)
+            overlaps = np.arange(1, max_overlap + 1)
+            matches = diagonal_matches[max_overlap - overlaps + len(new_sequence) - 1]
             # epsilon to favor long perfect matches
-            eps = i / 10000.0
-            matches = np.sum(np.array(sequence[-i:]) == np.array(new_sequence[:i]))
-            matching = matches / i + eps
-            if matches > 1 and matching > max_:
-                index = i
-                max_ = matching
-        sequence.extend(new_sequence[index:])
+            matching = matches / overlaps + overlaps / 10000.0
+            matching[matches <= 1] = -np.inf
+            if np.isfinite(matching).any():
+                index = int(overlaps[np.argmax(matching)])
+        sequence.extend(new_sequence[index:].tolist())
     return np.array(sequence)
 
 
@@ -178,6 +286,18 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
 
             </Tip>
 
+        chunk_batch_size (`int`, *optional*, defaults to 1):
+            The maximum number of chunks of a single audio run through the model at once when `chunk_length_s > 0`.
+            Their features are also extracted with a single call to the feature extractor. Larger values speed up the
+            transcription of long audios at the cost of more memory. Ignored when the pipeline is called with
+            `batch_size > 1`, in which case the chunks of all the inputs are batched together.
+        voice_activity_detection (`bool` or `Dict`, *optional*, defaults to `False`):
+            Whether to run the energy-based voice activity detector [`~audio_utils.voice_activity_segments`] on the
+            audio before the model. The silent parts of the audio are dropped and the speech is cut into segments at
+            its pauses, which are transcribed without strides. The segments are at most `chunk_length_s` long (or 30
+            seconds for Whisper models when `chunk_length_s` is not set), and the returned timestamps are relative to
+            the original audio. A dictionary can be passed to set the arguments of
+            [`~audio_utils.voice_activity_segments`].
         framework (`str`, *optional*):
             The framework to use, either `"pt"` for PyTorch or `"tf"` for TensorFlow. The specified framework must be
             installed. If no framework is specified, will default to the one currently installed. If no framework is
@@ -280,12 +400,18 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
                     "there", "timestamp": (1.0, 1.5)}]`. The original full text can roughly be recovered by doing
                     `"".join(chunk["text"] for chunk in output["chunks"])`.
         """
+        batch_size = kwargs.get("batch_size", self._batch_size)
+        if batch_size is not None and batch_size > 1:
+            # The chunks are already batched by `get_iterator`
+            kwargs["chunk_batch_size"] = 1
         return super().__call__(inputs, **kwargs)
 
     def _sanitize_parameters(
         self,
         chunk_length_s=None,
         stride_length_s=None,
+        chunk_batch_size=None,
+        voice_activity_detection=None,
         ignore_warning=None,
         decoder_kwargs=None,
         return_timestamps=None,
@@ -306,6 +432,17 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
             preprocess_params["chunk_length_s"] = chunk_length_s
         if stride_length_s is not None:
             preprocess_params["stride_length_s"] = stride_length_s
+        if chunk_batch_size is not None:
+            if chunk_batch_size < 1:
+                raise ValueError(f"`chunk_batch_size` should be at least 1, got {chunk_batch_size}.")
+            preprocess_params["chunk_batch_size"] = chunk_batch_size
+        if voice_activity_detection is not None:
+            if not isinstance(voice_activity_detection, (bool, dict)):
+                raise ValueError(
+                    "`voice_activity_detection` should be a boolean or a dictionary of arguments for "
+                    f"`voice_activity_segments`, got {voice_activity_detection}."
+                )
+            preprocess_params["voice_activity_detection"] = voice_activity_detection
 
         forward_params = defaultdict(dict)
         if max_new_tokens is not None:
@@ -356,7 +493,9 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
 
         return preprocess_params, forward_params, postprocess_params
 
-    def preprocess(self, inputs, chunk_length_s=0, stride_length_s=None):
+    def preprocess(
+        self, inputs, chunk_length_s=0, stride_length_s=None, chunk_batch_size=1, voice_activity_detection=False
+    ):
         if isinstance(inputs, str):
             if inputs.startswith("http://") or inputs.startswith("https://"):
                 # We need to actually check for a real protocol, otherwise it's impossible to use a local file
@@ -419,6 +558,27 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
         if len(inputs.shape) != 1:
             raise ValueError("We expect a single channel audio input for AutomaticSpeechRecognitionPipeline")
 
+        if voice_activity_detection:
+            if stride is not None:
+                raise ValueError("Voice activity detection cannot be used on inputs with a `stride`")
+
+            sampling_rate = self.feature_extractor.sampling_rate
+            if chunk_length_s:
+                max_segment_length = int(round(chunk_length_s * sampling_rate))
+            elif self.type == "seq2seq_whisper":
+                max_segment_length = self.feature_extractor.n_samples
+            else:
+                max_segment_length = None
+            vad_kwargs = voice_activity_detection if isinstance(voice_activity_detection, dict) else {}
+            vad_kwargs = {"max_segment_length": max_segment_length, **vad_kwargs}
+            segments = voice_activity_segments(inputs, sampling_rate, **vad_kwargs)
+
+            if len(segments) > 0:
+                for item in segment_iter(inputs, self.feature_extractor, segments, self.torch_dtype):
+                    yield {**item, **extra}
+                return
+            logger.info("No voice activity was detected, the whole audio is transcribed.")
+
         if chunk_length_s:
             if stride_length_s is None:
                 stride_length_s = chunk_length_s / 6
@@ -437,9 +597,21 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
             if chunk_len < stride_left + stride_right:
                 raise ValueError("Chunk length must be superior to stride length")
 
-            for item in chunk_iter(
-                inputs, self.feature_extractor, chunk_len, stride_left, stride_right, self.torch_dtype
-            ):
+            if chunk_batch_size == 1:
+                chunks = chunk_iter(
+                    inputs, self.feature_extractor, chunk_len, stride_left, stride_right, self.torch_dtype
+                )
+            else:
+                chunks = chunk_batch_iter(
+                    inputs,
+                    self.feature_extractor,
+                    chunk_len,
+                    stride_left,
+                    stride_right,
+                    chunk_batch_size,
+                    self.torch_dtype,
+                )
+            for item in chunks:
                 yield {**item, **extra}
         else:
             if self.type == "seq2seq_whisper" and inputs.shape[0] > self.feature_extractor.n_samples:
@@ -564,11 +736,43 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
         extra = model_inputs
         return {"is_last": is_last, **out, **extra}
 
+    def _decode_ctc(self, items, decoder_kwargs=None, return_timestamps=None):
+        """
+        Decodes the tokens (or the logits, with a language model) of a CTC model. Returns the text, and the character or
+        word offsets in logits frames when `return_timestamps` is set.
+        """
+        offsets = None
+        if self.type == "ctc_with_lm":
+            if decoder_kwargs is None:
+                decoder_kwargs = {}
+            beams = self.decoder.decode_beams(items, **decoder_kwargs)
+            text = beams[0][0]
+            if return_timestamps:
+                # Simply cast from pyctcdecode format to wav2vec2 format to leverage
+                # pre-existing code later
+                chunk_offset = beams[0][2]
+                offsets = []
+                for word, (start_offset, end_offset) in chunk_offset:
+                    offsets.append({"word": word, "start_offset": start_offset, "end_offset": end_offset})
+        else:
+            text = self.tokenizer.decode(items, skip_special_tokens=False)
+            if return_timestamps:
+                offsets = self.tokenizer.decode(items, skip_special_tokens=False, output_char_offsets=True)[
+                    "char_offsets"
+                ]
+                if return_timestamps == "word":
+                    offsets = self.tokenizer._get_word_offsets(offsets, self.tokenizer.replace_word_delimiter_char)
+        return text, offsets
+
     def postprocess(
         self, model_outputs, decoder_kwargs: Optional[Dict] = None, return_timestamps=None, return_language=None
     ):
         # Optional return types
         optional = {}
+        model_outputs = list(_unbatch_chunk_outputs(model_outputs))
+        segment_offsets = None
+        if "segment_offset" in model_outputs[0]:
+            segment_offsets = [int(output.pop("segment_offset")) for output in model_outputs]
 
         final_items = []
         key = "logits" if self.type == "ctc_with_lm" else "tokens"
@@ -593,60 +797,72 @@ class AutomaticSpeechRecognitionPipeline(ChunkPipeline):
             items = _find_longest_common_sequence(final_items, self.tokenizer)
         elif self.type == "seq2seq_whisper":
             time_precision = self.feature_extractor.chunk_length / self.model.config.max_source_positions
-            # Send the chunking back to seconds, it's easier to handle in whisper
             sampling_rate = self.feature_extractor.sampling_rate
-            for output in model_outputs:
-                if "stride" in output:
-                    chunk_len, stride_left, stride_right = output["stride"]
-                    # Go back in seconds
-                    chunk_len /= sampling_rate
-                    stride_left /= sampling_rate
-                    stride_right /= sampling_rate
-                    output["stride"] = chunk_len, stride_left, stride_right
-
-            text, optional = self.tokenizer._decode_asr(
-                model_outputs,
-                return_timestamps=return_timestamps,
-                return_language=return_language,
-                time_precision=time_precision,
-            )
+            if segment_offsets is not None:
+                # The segments are separated by pauses, they are decoded separately so the longest common sequence
+                # merging of the chunks doesn't drop the tokens they share
+                texts, chunks = [], []
+                for segment_offset, output in zip(segment_offsets, model_outputs):
+                    segment_output = {key: value for key, value in output.items() if key != "stride"}
+                    segment_text, segment_optional = self.tokenizer._decode_asr(
+                        [segment_output],
+                        return_timestamps=return_timestamps,
+                        return_language=return_language,
+                        time_precision=time_precision,
+                    )
+                    texts.append(segment_text)
+                    chunks.extend(
+                        _shift_timestamps(segment_optional.get("chunks", []), segment_offset / sampling_rate)
+                    )
+                text = "".join(texts)
+                if return_timestamps or return_language:
+                    optional["chunks"] = chunks
+            else:
+                # Send the chunking back to seconds, it's easier to handle in whisper
+                for output in model_outputs:
+                    if "stride" in output:
+                        chunk_len, stride_left, stride_right = output["stride"]
+                        # Go back in seconds
+                        chunk_len /= sampling_rate
+                        stride_left /= sampling_rate
+                        stride_right /= sampling_rate
+                        output["stride"] = chunk_len, stride_left, stride_right
+
+                text, optional = self.tokenizer._decode_asr(
+                    model_outputs,
+                    return_timestamps=return_timestamps,
+                    return_language=return_language,
+                    time_precision=time_precision,
+                )
+        elif segment_offsets is not None and self.type in {"ctc", "ctc_with_lm"}:
+            # The segments are separated by pauses, they are decoded separately so the tokens at the end of a segment
+            # and at the start of the next one are not merged
+            segments = [(offset, items.squeeze(0)) for offset, items in zip(segment_offsets, final_items)]
         else:
             items = np.concatenate(final_items, axis=1)
             items = items.squeeze(0)
+            segments = [(0, items)]
 
-        if self.type == "ctc_with_lm":
-            if decoder_kwargs is None:
-                decoder_kwargs = {}
-            beams = self.decoder.decode_beams(items, **decoder_kwargs)
-            text = beams[0][0]
-            if return_timestamps:
-                # Simply cast from pyctcdecode format to wav2vec2 format to leverage
-                # pre-existing code later
-                chunk_offset = beams[0][2]
-                offsets = []
-                for word, (start_offset, end_offset) in chunk_offset:
-                    offsets.append({"word": word, "start_offset": start_offset, "end_offset": end_offset})
-        elif self.type != "seq2seq_whisper":
-            skip_special_tokens = self.type != "ctc"
-            text = self.tokenizer.decode(items, skip_special_tokens=skip_special_tokens)
-            if return_timestamps:
-                offsets = self.tokenizer.decode(
-                    items, skip_special_tokens=skip_special_tokens, output_char_offsets=True
-                )["char_offsets"]
-                if return_timestamps == "word":
-                    offsets = self.tokenizer._get_word_offsets(offsets, self.tokenizer.replace_word_delimiter_char)
-
-        if return_timestamps and self.type not in {"seq2seq", "seq2seq_whisper"}:
+        if self.type in {"ctc", "ctc_with_lm"}:
+            texts = []
             chunks = []
-            for item in offsets:
-                start = item["start_offset"] * self.model.config.inputs_to_logits_ratio
-                start /= self.feature_extractor.sampling_rate
-
-                stop = item["end_offset"] * self.model.config.inputs_to_logits_ratio
-                stop /= self.feature_extractor.sampling_rate
-
-                chunks.append({"text": item[return_timestamps], "timestamp": (start, stop)})
-            optional["chunks"] = chunks
+            for segment_offset, items in segments:
+                segment_text, offsets = self._decode_ctc(items, decoder_kwargs, return_timestamps)
+                texts.append(segment_text)
+                if return_timestamps:
+                    for item in offsets:
+                        start = segment_offset + item["start_offset"] * self.model.config.inputs_to_logits_ratio
+                        start /= self.feature_extractor.sampling_rate
+
+                        stop = segment_offset + item["end_offset"] * self.model.config.inputs_to_logits_ratio
+                        stop /= self.feature_extractor.sampling_rate
+
+                        chunks.append({"text": item[return_timestamps], "timestamp": (start, stop)})
+            text = " ".join(segment_text for segment_text in texts if segment_text)
+            if return_timestamps:
+                optional["chunks"] = chunks
+        elif self.type == "seq2seq":
+            text = self.tokenizer.decode(items, skip_special_tokens=True)
 
         extra = defaultdict(list)
         for output in model_outputs:
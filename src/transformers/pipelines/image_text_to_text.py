@@ -194,6 +194,8 @@ class ImageTextToTextPipeline(Pipeline):
         clean_up_tokenization_spaces=None,
         stop_sequence=None,
         continue_final_message=None,
+        max_load_workers=None,
+        image_cache=None,
         **kwargs: Unpack[ProcessingKwargs],
     ):
         forward_kwargs = {}
@@ -204,6 +206,12 @@ class ImageTextToTextPipeline(Pipeline):
         if timeout is not None:
             preprocess_params["timeout"] = timeout
 
+        if max_load_workers is not None:
+            preprocess_params["max_load_workers"] = max_load_workers
+
+        if image_cache is not None:
+            preprocess_params["image_cache"] = image_cache
+
         if continue_final_message is not None:
             preprocess_params["continue_final_message"] = continue_final_message
 
@@ -283,6 +291,11 @@ class ImageTextToTextPipeline(Pipeline):
                 last message in the input chat rather than starting a new one, allowing you to "prefill" its response.
                 By default this is `True` when the final message in the input chat has the `assistant` role and
                 `False` otherwise, but you can manually override that behaviour by setting this flag.
+            max_load_workers (`int`, *optional*, defaults to 1):
+                The maximum number of images of an input fetched and decoded at the same time, in a thread pool.
+            image_cache ([`~image_utils.ImageCache`], *optional*):
+                A cache of decoded images, keyed by their content. Passing the same cache across calls skips decoding
+                the images that were already seen.
 
         Return:
             A list or a list of list of `dict`: Each result comes as a dictionary with the following key (cannot return a combination
@@ -330,7 +343,15 @@ class ImageTextToTextPipeline(Pipeline):
 
         return super().__call__({"images": images, "text": text}, **kwargs)
 
-    def preprocess(self, inputs=None, timeout=None, continue_final_message=None, **processing_kwargs):
+    def preprocess(
+        self,
+        inputs=None,
+        timeout=None,
+        continue_final_message=None,
+        max_load_workers=1,
+        image_cache=None,
+        **processing_kwargs,
+    ):
         # In case we only have text inputs
         if isinstance(inputs, (list, tuple, str)):
             images = None
@@ -356,7 +377,7 @@ class ImageTextToTextPipeline(Pipeline):
                 inputs_text = inputs["text"]
                 images = inputs["images"]
 
-            images = load_images(images, timeout=timeout)
+            images = load_images(images, timeout=timeout, max_workers=max_load_workers, cache=image_cache)
 
         # if batched text inputs, we set padding to True unless specified otherwise
         if isinstance(text, (list, tuple)) and len(text) > 1:
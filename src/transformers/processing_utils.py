@@ -32,12 +32,13 @@ import typing_extensions
 from .dynamic_module_utils import custom_object_save
 from .image_utils import (
     ChannelDimension,
+    ImageCache,
     ImageInput,
     VideoInput,
     is_valid_image,
     is_vision_available,
-    load_image,
-    load_video,
+    load_images,
+    load_videos,
 )
 
 
@@ -413,6 +414,11 @@ class ProcessorChatTemplateKwargs(TokenizerChatTemplateKwargs, total=False):
             def sample_indices_fn(num_frames, fps, metadata, **kwargs):
                 # add you sampling logic here ...
                 return np.linspace(start_idx, end_idx, num_frames, dtype=int)
+    max_load_workers (`int`, *optional*, defaults to 1):
+        The maximum number of images and videos of the conversations fetched and decoded at the same time, in a thread
+        pool. With the default value, they are loaded one after the other.
+    image_cache (`ImageCache`, *optional*):
+        A cache of decoded images shared across calls, so that the images already seen are not decoded again.
     """
 
     tokenize: Optional[bool] = False
@@ -421,6 +427,8 @@ class ProcessorChatTemplateKwargs(TokenizerChatTemplateKwargs, total=False):
     video_load_backend: Optional[str] = "pyav"
     video_fps: Optional[int] = None
     sample_indices_fn: Optional[Callable] = None
+    max_load_workers: Optional[int] = 1
+    image_cache: Optional[ImageCache] = None
 
 
 class AllKwargsForChatTemplate(
@@ -1297,54 +1305,76 @@ class ProcessorMixin(PushToHubMixin):
         tokenize = chat_template_kwargs.get("tokenize")
         return_dict = chat_template_kwargs.get("return_dict")
         sample_indices_fn = chat_template_kwargs.get("sample_indices_fn")
+        max_load_workers = chat_template_kwargs.get("max_load_workers")
+        image_cache = chat_template_kwargs.get("image_cache")
 
         if tokenize:
-            batch_images, batch_videos = [], []
-            batch_video_metadata = []
+            batch_image_fnames, batch_video_fnames = [], []
             for conversation in conversations:
-                images, videos = [], []
-                video_metadata = []
+                image_fnames, video_fnames = [], []
                 for message in conversation:
                     visuals = [content for content in message["content"] if content["type"] in ["image", "video"]]
-                    image_fnames = [
+                    image_fnames.extend(
                         vision_info[key]
                         for vision_info in visuals
                         for key in ["image", "url", "path", "base64"]
                         if key in vision_info and vision_info["type"] == "image"
-                    ]
-                    video_fnames = [
+                    )
+                    video_fnames.extend(
                         vision_info[key]
                         for vision_info in visuals
                         for key in ["video", "url", "path"]
                         if key in vision_info and vision_info["type"] == "video"
-                    ]
-                    for fname in image_fnames:
-                        images.append(load_image(fname))
-                    for fname in video_fnames:
-                        if isinstance(fname, (list, tuple)) and isinstance(fname[0], str):
-                            video = [np.array(load_image(image_fname)).T for image_fname in fname]
-                            # create a 4D video because `load_video` always returns a 4D array
-                            video = np.stack(video)
-                            metadata = None
-                            logger.warning(
-                                "When loading the video from list of images, we cannot infer metadata such as `fps` or `duration`. "
-                                "If you model applies special processing based on metadata, please load the whole video and let the model sample frames."
-                            )
-                        else:
-                            video, metadata = load_video(
-                                fname,
-                                num_frames=num_frames,
-                                fps=video_fps,
-                                backend=video_load_backend,
-                                sample_indices_fn=sample_indices_fn,
-                            )
-                        videos.append(video)
-                        video_metadata.append(metadata)
+                    )
+                batch_image_fnames.append(image_fnames)
+                batch_video_fnames.append(video_fnames)
+
+            # Fetch and decode the visuals of the whole batch together, up to `max_load_workers` at the same time
+            batch_images = [
+                images
+                for images in load_images(batch_image_fnames, max_workers=max_load_workers, cache=image_cache)
+                if images
+            ]
+
+            flat_video_fnames = [fname for video_fnames in batch_video_fnames for fname in video_fnames]
+            is_frames = [isinstance(fname, (list, tuple)) and isinstance(fname[0], str) for fname in flat_video_fnames]
+            loaded_frames = iter(
+                load_images(
+                    [fname for fname, frames in zip(flat_video_fnames, is_frames) if frames],
+                    max_workers=max_load_workers,
+                    cache=image_cache,
+                )
+            )
+            loaded_videos = iter(
+                load_videos(
+                    [fname for fname, frames in zip(flat_video_fnames, is_frames) if not frames],
+                    max_workers=max_load_workers,
+                    num_frames=num_frames,
+                    fps=video_fps,
+                    backend=video_load_backend,
+                    sample_indices_fn=sample_indices_fn,
+                )
+            )
+            batch_videos, batch_video_metadata = [], []
+            for video_fnames in batch_video_fnames:
+                videos, video_metadata = [], []
+                for fname in video_fnames:
+                    if isinstance(fname, (list, tuple)) and isinstance(fname[0], str):
+                        video = [np.array(image).T for image in next(loaded_frames)]
+                        # create a 4D video because `load_video` always returns a 4D array
+                        video = np.stack(video)
+                        metadata = None
+                        logger.warning(
+                            "When loading the video from list of images, we cannot infer metadata such as `fps` or `duration`. "
+                            "If you model applies special processing based on metadata, please load the whole video and let the model sample frames."
+                        )
+                    else:
+                        video, metadata = next(loaded_videos)
+                    videos.append(video)
+                    video_metadata.append(metadata)
 
                 # Currently all processors can accept nested list of batches, but not flat list of visuals
                 # So we'll make a batched list of images and let the processor handle it
-                if images:
-                    batch_images.append(images)
                 if videos:
                     batch_videos.append(videos)
                     batch_video_metadata.append(video_metadata)
@@ -14,6 +14,8 @@
 from __future__ import annotations
 
 import inspect
+import itertools
+import weakref
 from functools import lru_cache, wraps
 from typing import Callable, List, Optional, Set, Tuple, Union
 
@@ -21,6 +23,7 @@ import torch
 from packaging import version
 from safetensors.torch import storage_ptr, storage_size
 from torch import nn
+from torch.utils.checkpoint import checkpoint
 
 from .utils import is_torch_greater_or_equal, is_torch_xla_available, is_torchdynamo_compiling, logging
 
@@ -476,3 +479,179 @@ def distribute_module(
             raise ValueError(f"output_fn should take in 3 arguments, but got {num_args} arguments!")
 
     return module
+
+
+ACTIVATION_OFFLOADING_POLICIES = ("offload", "recompute", "keep")
+
+
+class _OffloadedTensor:
+    """
+    Handle to a saved tensor that has been copied to pinned CPU memory by [`ActivationOffloader`].
+    """
+
+    __slots__ = (
+        "cpu_tensor",
+        "device",
+        "generation",
+        "group",
+        "copy_event",
+        "prefetched",
+        "prefetch_event",
+        "__weakref__",
+    )
+
+    def __init__(self, cpu_tensor: torch.Tensor, device: torch.device, generation: int, group: int, copy_event):
+        self.cpu_tensor = cpu_tensor
+        self.device = device
+        self.generation = generation
+        self.group = group
+        self.copy_event = copy_event
+        self.prefetched = None
+        self.prefetch_event = None
+
+
+class ActivationOffloader:
+    """
+    Replacement for `torch.utils.checkpoint.checkpoint` as the `_gradient_checkpointing_func` of a model, which applies
+    a policy to each layer routed through it:
+
+    - `"offload"`: the tensors the layer saves for backward are copied asynchronously to pinned CPU memory during the
+      forward pass (with `torch.autograd.graph.saved_tensors_hooks`), and copied back during the backward pass. When
+      the backward pass reaches a layer, the activations of the previous offloaded layer are prefetched so the transfer
+      overlaps with computation.
+    - `"recompute"`: the layer is checkpointed, as with gradient checkpointing.
+    - `"keep"`: the layer is run as is, and its activations stay on the device.
+
+    Only tensors on CUDA devices and larger than `min_offload_size` bytes are offloaded. The parameters and buffers of
+    the layer, or views of them, are never offloaded.
+
+    Args:
+        policy (`str` or `List[str]`, *optional*, defaults to `"offload"`):
+            The policy of each layer, in the order the layers are run. A single policy applies to all layers, and the
+            last policy of a list applies to all the layers after the end of the list.
+        gradient_checkpointing_kwargs (`dict`, *optional*):
+            Additional keyword arguments passed along to the `torch.utils.checkpoint.checkpoint` function for the
+            layers using the `"recompute"` policy.
+        min_offload_size (`int`, *optional*, defaults to 1048576):
+            The minimum size, in bytes, of a saved tensor for it to be offloaded.
+    """
+
+    def __init__(
+        self,
+        policy: Union[str, List[str]] = "offload",
+        gradient_checkpointing_kwargs: Optional[dict] = None,
+        min_offload_size: int = 2**20,
+    ):
+        policies = [policy] if isinstance(policy, str) else list(policy)
+        if len(policies) == 0:
+            raise ValueError("`policy` should contain at least one activation offloading policy.")
+        for layer_policy in policies:
+            if layer_policy not in ACTIVATION_OFFLOADING_POLICIES:
+                raise ValueError(
+                    f"Unknown activation offloading policy {layer_policy}, should be one of "
+                    f"{', '.join(ACTIVATION_OFFLOADING_POLICIES)}."
+                )
+        if gradient_checkpointing_kwargs is None:
+            gradient_checkpointing_kwargs = {"use_reentrant": True}
+
+        self.policies = policies
+        self.gradient_checkpointing_kwargs = gradient_checkpointing_kwargs
+        self.min_offload_size = min_offload_size
+        self._layer_indices = {}
+        self._streams = {}
+        # Weak references to the handles of each offloaded layer of the last forward pass, used for prefetching
+        self._groups = []
+        self._generation = 0
+        self._weight_storages = set()
+
+    def layer_policy(self, layer_index: int) -> str:
+        """
+        Returns the policy of the layer at `layer_index`.
+        """
+        return self.policies[min(layer_index, len(self.policies) - 1)]
+
+    def __call__(self, function: Callable, *args, **kwargs):
+        # Layers pass their bound `__call__`, so the module identifies the layer across steps
+        layer = getattr(function, "__self__", function)
+        layer_index = self._layer_indices.setdefault(id(layer), len(self._layer_indices))
+        policy = self.layer_policy(layer_index)
+
+        if policy == "recompute":
+            return checkpoint(function, *args, **self.gradient_checkpointing_kwargs, **kwargs)
+        if policy == "keep" or not torch.is_grad_enabled():
+            return function(*args, **kwargs)
+
+        if len(self._groups) == 0 or layer_index <= self._groups[-1][0]:
+            # New forward pass
+            self._groups = []
+            self._generation += 1
+        self._groups.append((layer_index, []))
+        # Weights are saved for backward as views (e.g. `weight.t()`) rather than as parameters, so they are recognized
+        # by their storage
+        self._weight_storages = set()
+        if isinstance(layer, nn.Module):
+            for tensor in itertools.chain(layer.parameters(), layer.buffers()):
+                self._weight_storages.add(tensor.untyped_storage().data_ptr())
+        with torch.autograd.graph.saved_tensors_hooks(self._pack, self._unpack):
+            return function(*args, **kwargs)
+
+    def _get_stream(self, device: torch.device):
+        if device not in self._streams:
+            self._streams[device] = torch.cuda.Stream(device=device)
+        return self._streams[device]
+
+    def _pack(self, tensor: torch.Tensor):
+        if (
+            tensor.device.type != "cuda"
+            or tensor.numel() * tensor.element_size() < self.min_offload_size
+            or tensor.untyped_storage().data_ptr() in self._weight_storages
+        ):
+            return tensor
+
+        stream = self._get_stream(tensor.device)
+        stream.wait_stream(torch.cuda.current_stream(tensor.device))
+        with torch.cuda.stream(stream):
+            cpu_tensor = torch.empty_like(tensor, device="cpu", pin_memory=True)
+            cpu_tensor.copy_(tensor, non_blocking=True)
+            copy_event = torch.cuda.Event()
+            copy_event.record(stream)
+        # Keep the device memory from being reused before the copy is done
+        tensor.record_stream(stream)
+
+        group_index = len(self._groups) - 1
+        handle = _OffloadedTensor(cpu_tensor, tensor.device, self._generation, group_index, copy_event)
+        self._groups[group_index][1].append(weakref.ref(handle))
+        return handle
+
+    def _prefetch(self, handle: _OffloadedTensor):
+        if handle.prefetch_event is not None:
+            # Already prefetched, or prefetched and consumed
+            return
+        stream = self._get_stream(handle.device)
+        with torch.cuda.stream(stream):
+            stream.wait_event(handle.copy_event)
+            handle.prefetched = handle.cpu_tensor.to(handle.device, non_blocking=True)
+            handle.prefetch_event = torch.cuda.Event()
+            handle.prefetch_event.record(stream)
+
+    def _unpack(self, handle):
+        if not isinstance(handle, _OffloadedTensor):
+            return handle
+
+        # The backward pass runs the layers in reverse order: bring back the activations of the previous layer
+        if handle.generation == self._generation and handle.group > 0:
+            for previous_ref in self._groups[handle.group - 1][1]:
+                previous = previous_ref()
+                if previous is not None:
+                    self._prefetch(previous)
+
+        current_stream = torch.cuda.current_stream(handle.device)
+        if handle.prefetched is not None:
+            current_stream.wait_event(handle.prefetch_event)
+            tensor = handle.prefetched
+            tensor.record_stream(current_stream)
+            handle.prefetched = None
+        else:
+            current_stream.wait_event(handle.copy_event)
+            tensor = handle.cpu_tensor.to(handle.device, non_blocking=True)
+        return tensor
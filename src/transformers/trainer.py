@@ -56,7 +56,12 @@ from torch.utils.data import DataLoader, Dataset, IterableDataset, RandomSampler
 
 from . import __version__
 from .configuration_utils import PretrainedConfig
-from .data.data_collator import DataCollator, DataCollatorWithPadding, default_data_collator
+from .data.data_collator import (
+    DataCollator,
+    DataCollatorWithFlattening,
+    DataCollatorWithPadding,
+    default_data_collator,
+)
 from .debug_utils import DebugOption, DebugUnderflowOverflow
 from .feature_extraction_sequence_utils import SequenceFeatureExtractor
 from .feature_extraction_utils import FeatureExtractionMixin
@@ -88,13 +93,19 @@ from .trainer_callback import (
     TrainerState,
 )
 from .trainer_pt_utils import (
+    AsyncCheckpointWriter,
+    BatchPrefetcher,
+    DeltaCheckpointTracker,
     DistributedTensorGatherer,
     EvalLoopContainer,
     IterableDatasetShard,
     LabelSmoother,
     LayerWiseDummyOptimizer,
     LengthGroupedSampler,
+    MemmapEvalLoopContainer,
+    PackedDataset,
     SequentialDistributedSampler,
+    TokenBudgetBatchSampler,
     distributed_broadcast_scalars,
     distributed_concat,
     find_batch_size,
@@ -310,6 +321,7 @@ OPTIMIZER_NAME = "optimizer.pt"
 SCALER_NAME = "scaler.pt"
 OPTIMIZER_NAME_BIN = "optimizer.bin"
 SCHEDULER_NAME = "scheduler.pt"
+DELTA_CHECKPOINT_NAME = "delta_checkpoint.json"
 FSDP_MODEL_NAME = "pytorch_model_fsdp"
 
 
@@ -968,18 +980,22 @@ class Trainer:
         )
         return remove_columns_collator
 
-    def _get_train_sampler(self) -> Optional[torch.utils.data.Sampler]:
-        if self.train_dataset is None or not has_length(self.train_dataset):
+    def _get_train_sampler(self, train_dataset: Optional[Dataset] = None) -> Optional[torch.utils.data.Sampler]:
+        if train_dataset is None:
+            train_dataset = self.train_dataset
+        if train_dataset is None or not has_length(train_dataset):
             return None
 
         # Build the sampler.
         if self.args.group_by_length:
-            if is_datasets_available() and isinstance(self.train_dataset, datasets.Dataset):
+            if is_datasets_available() and isinstance(train_dataset, datasets.Dataset):
                 lengths = (
-                    self.train_dataset[self.args.length_column_name]
-                    if self.args.length_column_name in self.train_dataset.column_names
+                    train_dataset[self.args.length_column_name]
+                    if self.args.length_column_name in train_dataset.column_names
                     else None
                 )
+            elif isinstance(train_dataset, PackedDataset):
+                lengths = train_dataset.num_tokens
             else:
                 lengths = None
             model_input_name = (
@@ -987,13 +1003,55 @@ class Trainer:
             )
             return LengthGroupedSampler(
                 self.args.train_batch_size * self.args.gradient_accumulation_steps,
-                dataset=self.train_dataset,
+                dataset=train_dataset,
                 lengths=lengths,
                 model_input_name=model_input_name,
             )
 
         else:
-            return RandomSampler(self.train_dataset)
+            return RandomSampler(train_dataset)
+
+    def _get_packed_train_dataset(self, train_dataset: Dataset) -> PackedDataset:
+        """
+        Packs `train_dataset` into examples of at most `args.packing_max_tokens` tokens, using the precomputed lengths
+        of the `args.length_column_name` column of `self.train_dataset` if it has one.
+        """
+        if not has_length(train_dataset):
+            raise ValueError("`packing_max_tokens` is not supported for datasets that do not implement `__len__`.")
+        lengths = None
+        if (
+            is_datasets_available()
+            and isinstance(self.train_dataset, datasets.Dataset)
+            and self.args.length_column_name in self.train_dataset.column_names
+        ):
+            lengths = self.train_dataset[self.args.length_column_name]
+        return PackedDataset(train_dataset, self.args.packing_max_tokens, lengths=lengths)
+
+    def _get_train_batch_sampler(self, train_dataset: Dataset) -> TokenBudgetBatchSampler:
+        """
+        Returns the batch sampler building batches of at most `args.max_tokens_per_batch` padded tokens. The sampler
+        yields the batches of all processes, they are sharded by `accelerate`.
+        """
+        if isinstance(train_dataset, PackedDataset):
+            lengths = train_dataset.num_tokens
+        elif (
+            is_datasets_available()
+            and isinstance(self.train_dataset, datasets.Dataset)
+            and self.args.length_column_name in self.train_dataset.column_names
+        ):
+            lengths = self.train_dataset[self.args.length_column_name]
+        else:
+            lengths = None
+        model_input_name = self.processing_class.model_input_names[0] if self.processing_class is not None else None
+        return TokenBudgetBatchSampler(
+            self.args.max_tokens_per_batch,
+            dataset=train_dataset,
+            lengths=lengths,
+            model_input_name=model_input_name,
+            num_replicas=self.args.world_size,
+            seed=self.args.seed,
+            drop_last=self.args.dataloader_drop_last,
+        )
 
     def get_train_dataloader(self) -> DataLoader:
         """
@@ -1009,10 +1067,15 @@ class Trainer:
 
         train_dataset = self.train_dataset
         data_collator = self.data_collator
+        if self.args.packing_max_tokens is not None and not isinstance(data_collator, DataCollatorWithFlattening):
+            logger.info("Packing the training dataset, the data collator is replaced by `DataCollatorWithFlattening`.")
+            data_collator = DataCollatorWithFlattening()
         if is_datasets_available() and isinstance(train_dataset, datasets.Dataset):
             train_dataset = self._remove_unused_columns(train_dataset, description="training")
         else:
             data_collator = self._get_collator_with_removed_columns(data_collator, description="training")
+        if self.args.packing_max_tokens is not None:
+            train_dataset = self._get_packed_train_dataset(train_dataset)
 
         dataloader_params = {
             "batch_size": self._train_batch_size,
@@ -1023,11 +1086,27 @@ class Trainer:
         }
 
         if not isinstance(train_dataset, torch.utils.data.IterableDataset):
-            dataloader_params["sampler"] = self._get_train_sampler()
-            dataloader_params["drop_last"] = self.args.dataloader_drop_last
+            if self.args.max_tokens_per_batch is not None:
+                del dataloader_params["batch_size"]
+                dataloader_params["batch_sampler"] = self._get_train_batch_sampler(train_dataset)
+            else:
+                if isinstance(train_dataset, PackedDataset):
+                    dataloader_params["sampler"] = self._get_train_sampler(train_dataset)
+                else:
+                    dataloader_params["sampler"] = self._get_train_sampler()
+                dataloader_params["drop_last"] = self.args.dataloader_drop_last
             dataloader_params["worker_init_fn"] = seed_worker
             dataloader_params["prefetch_factor"] = self.args.dataloader_prefetch_factor
 
+        if "batch_sampler" in dataloader_params:
+            # Batches of varying sizes can only be sharded across processes without evening them out. The batch
+            # sampler already yields a round multiple of the number of processes batches.
+            even_batches = self.accelerator.even_batches
+            self.accelerator.even_batches = False
+            try:
+                return self.accelerator.prepare(DataLoader(train_dataset, **dataloader_params))
+            finally:
+                self.accelerator.even_batches = even_batches
         return self.accelerator.prepare(DataLoader(train_dataset, **dataloader_params))
 
     def _get_eval_sampler(self, eval_dataset: Dataset) -> Optional[torch.utils.data.Sampler]:
@@ -2217,6 +2296,7 @@ class Trainer:
             if resume_from_checkpoint is None:
                 raise ValueError(f"No valid checkpoint found in output directory ({args.output_dir})")
 
+        self._delta_checkpoint_tracker = None
         if resume_from_checkpoint is not None:
             if not is_sagemaker_mp_enabled() and not self.is_deepspeed_enabled and not self.is_fsdp_enabled:
                 self._load_from_checkpoint(resume_from_checkpoint)
@@ -2340,9 +2420,14 @@ class Trainer:
         # Compute absolute values for logging, eval, and save if given as ratio
         self.state.compute_steps(args, max_steps)
 
-        # Activate gradient checkpointing if needed
+        # Activate gradient checkpointing or activation offloading if needed
         if args.gradient_checkpointing:
             self.model.gradient_checkpointing_enable(gradient_checkpointing_kwargs=args.gradient_checkpointing_kwargs)
+        elif args.activation_offloading:
+            self.model.activation_offloading_enable(
+                policy=args.activation_offloading_policy,
+                gradient_checkpointing_kwargs=args.gradient_checkpointing_kwargs,
+            )
 
         model = self._wrap_model(self.model_wrapped)
 
@@ -2410,6 +2495,13 @@ class Trainer:
         # self.model_wrapped is DDP(Transformers Model), Deepspeed(Transformers Model),
         # FSDP(Transformers Model), Dynamo Optimized Module(Transformers Model) etc.
 
+        # The weights the model has now are the base of delta checkpoints, unless resumed from one
+        if self._save_delta_checkpoints and self._delta_checkpoint_tracker is None:
+            if _is_peft_model(self.model):
+                logger.info("`save_delta_checkpoints` has no effect on PEFT models, which only save their adapters.")
+            else:
+                self._delta_checkpoint_tracker = DeltaCheckpointTracker(self.model)
+
         # Train!
         logger.info("***** Running training *****")
         logger.info(f"  Num examples = {num_examples:,}")
@@ -2463,6 +2555,7 @@ class Trainer:
         # _total_loss_scalar is updated everytime .item() has to be called on tr_loss and stores the sum of all losses
         self._total_loss_scalar = 0.0
         self._globalstep_last_logged = self.state.global_step
+        self._num_input_tokens_not_gathered = 0
         model.zero_grad()
         grad_norm: Optional[float] = None
         self.control = self.callback_handler.on_train_begin(args, self.state, self.control)
@@ -2474,6 +2567,10 @@ class Trainer:
             epoch_dataloader = train_dataloader
             if hasattr(epoch_dataloader, "set_epoch"):
                 epoch_dataloader.set_epoch(epoch)
+            # `accelerate` does not pass the epoch to the batch samplers it shards
+            batch_sampler = getattr(getattr(epoch_dataloader, "batch_sampler", None), "batch_sampler", None)
+            if isinstance(batch_sampler, TokenBudgetBatchSampler):
+                batch_sampler.set_epoch(epoch)
 
             # Reset the past mems state at the beginning of each epoch if necessary.
             if args.past_index >= 0:
@@ -2499,6 +2596,13 @@ class Trainer:
 
             step = -1
             epoch_iterator = iter(epoch_dataloader)
+            if args.dataloader_prefetch_batches > 0 and not is_torch_xla_available():
+                epoch_iterator = BatchPrefetcher(
+                    epoch_iterator,
+                    num_prefetch=args.dataloader_prefetch_batches,
+                    device=args.device,
+                    dataloader=epoch_dataloader,
+                )
             # We chunkify the epoch iterator into gradient accumulation steps `n` batches
             remainder = num_examples % args.gradient_accumulation_steps
             if remainder == 0:
@@ -2525,6 +2629,9 @@ class Trainer:
                                 "not configured properly to know what item is the input. To fix this, add "
                                 "a `main_input_name` attribute to the model class you are using."
                             )
+                        elif args.sync_free_training:
+                            # Gathered at the next logging, evaluation or save
+                            self._num_input_tokens_not_gathered += inputs[main_input_name].numel()
                         else:
                             input_tokens = inputs[main_input_name].numel()
                             input_tokens = torch.tensor(input_tokens, device=self.args.device, dtype=torch.int64)
@@ -2559,10 +2666,20 @@ class Trainer:
                     )
                     with context():
                         tr_loss_step = self.training_step(model, inputs, num_items_in_batch)
+                    self.control = self.callback_handler.on_backward_end(args, self.state, self.control)
+
+                    if args.logging_nan_inf_filter and not is_torch_xla_available() and args.sync_free_training:
+                        # Same filtering as below, without reading the loss on the host
+                        tr_loss_step = torch.where(
+                            torch.isfinite(tr_loss_step),
+                            tr_loss_step,
+                            tr_loss / (1 + self.state.global_step - self._globalstep_last_logged),
+                        )
 
                     if (
                         args.logging_nan_inf_filter
                         and not is_torch_xla_available()
+                        and not args.sync_free_training
                         and (torch.isnan(tr_loss_step) or torch.isinf(tr_loss_step))
                     ):
                         # if loss is nan or inf simply add the average of previous logged losses
@@ -2602,7 +2719,7 @@ class Trainer:
                             ):
                                 grad_norm = model.get_global_grad_norm()
                                 # In some cases the grad norm may not return a float
-                                if hasattr(grad_norm, "item"):
+                                if hasattr(grad_norm, "item") and not args.sync_free_training:
                                     grad_norm = grad_norm.item()
                             else:
                                 grad_norm = _grad_norm
@@ -2640,6 +2757,8 @@ class Trainer:
                     if is_torch_xla_available():
                         xm.mark_step()
                     break
+            if isinstance(epoch_iterator, BatchPrefetcher):
+                epoch_iterator.close()
             if step < 0:
                 logger.warning(
                     "There seems not to be a single sample in your epoch_iterator, stopping training at step"
@@ -2667,7 +2786,11 @@ class Trainer:
             # Clean the state at the end of training
             delattr(self, "_past")
 
+        self._gather_num_input_tokens_seen()
+
         logger.info("\n\nTraining completed. Do not forget to share your model on huggingface.co/models =)\n\n")
+        # Make sure the last checkpoints are completely written
+        self._wait_for_async_checkpoint()
         if args.load_best_model_at_end and self.state.best_model_checkpoint is not None:
             # Wait for everyone to get here so we are sure the model has been saved by process 0.
             if is_torch_xla_available():
@@ -2811,7 +2934,9 @@ class Trainer:
                     "yield to errors or unwanted behaviors."
                 )
 
-        if os.path.isfile(weights_file) or os.path.isfile(safe_weights_file) or is_fsdp_ckpt:
+        if os.path.isfile(os.path.join(resume_from_checkpoint, DELTA_CHECKPOINT_NAME)):
+            self._load_delta_checkpoint(resume_from_checkpoint, model)
+        elif os.path.isfile(weights_file) or os.path.isfile(safe_weights_file) or is_fsdp_ckpt:
             weights_only_kwarg = {"weights_only": True}
             # If the model is on the GPU, it still works!
             if is_sagemaker_mp_enabled():
@@ -2899,7 +3024,11 @@ class Trainer:
         else:
             # We load the sharded checkpoint
             load_result = load_sharded_checkpoint(
-                model, resume_from_checkpoint, strict=is_sagemaker_mp_enabled(), prefer_safe=self.args.save_safetensors
+                model,
+                resume_from_checkpoint,
+                strict=is_sagemaker_mp_enabled(),
+                prefer_safe=self.args.save_safetensors,
+                max_workers=self.args.checkpoint_shard_workers,
             )
             if not is_sagemaker_mp_enabled():
                 self._issue_warnings_after_load(load_result)
@@ -2926,6 +3055,8 @@ class Trainer:
                 self.state.best_model_checkpoint,
                 **_get_fsdp_ckpt_kwargs(),
             )
+        elif os.path.isfile(os.path.join(self.state.best_model_checkpoint, DELTA_CHECKPOINT_NAME)):
+            self._load_delta_checkpoint(self.state.best_model_checkpoint, model)
         elif (
             os.path.exists(best_model_path)
             or os.path.exists(best_safe_model_path)
@@ -3025,7 +3156,10 @@ class Trainer:
             os.path.join(self.state.best_model_checkpoint, WEIGHTS_INDEX_NAME)
         ):
             load_result = load_sharded_checkpoint(
-                model, self.state.best_model_checkpoint, strict=is_sagemaker_mp_enabled()
+                model,
+                self.state.best_model_checkpoint,
+                strict=is_sagemaker_mp_enabled(),
+                max_workers=self.args.checkpoint_shard_workers,
             )
             if not is_sagemaker_mp_enabled():
                 self._issue_warnings_after_load(load_result)
@@ -3069,7 +3203,21 @@ class Trainer:
                 ) from exc
         return metrics
 
+    def _gather_num_input_tokens_seen(self):
+        """
+        Adds the input tokens counted without synchronization when `sync_free_training=True` to
+        `state.num_input_tokens_seen`. Needs to be called by all processes.
+        """
+        if not (self.args.sync_free_training and self.args.include_num_input_tokens_seen):
+            return
+        input_tokens = torch.tensor(self._num_input_tokens_not_gathered, device=self.args.device, dtype=torch.int64)
+        self.state.num_input_tokens_seen += self.accelerator.gather(input_tokens).sum().cpu().item()
+        self._num_input_tokens_not_gathered = 0
+
     def _maybe_log_save_evaluate(self, tr_loss, grad_norm, model, trial, epoch, ignore_keys_for_eval, start_time):
+        if self.control.should_log or self.control.should_evaluate or self.control.should_save:
+            self._gather_num_input_tokens_seen()
+
         if self.control.should_log and self.state.global_step > self._globalstep_last_logged:
             if is_torch_xla_available():
                 xm.mark_step()
@@ -3200,7 +3348,17 @@ class Trainer:
 
         run_dir = self._get_output_dir(trial=trial)
         output_dir = os.path.join(run_dir, checkpoint_folder)
-        self.save_model(output_dir, _internal_call=True)
+        if self._async_checkpoint_writer is not None:
+            self._save_checkpoint_async(run_dir, output_dir)
+            return
+
+        if self._delta_checkpoint_tracker is not None:
+            if self.args.should_save:
+                state_dict, manifest = self._get_delta_checkpoint()
+                self._save(output_dir, state_dict=state_dict)
+                self._save_delta_checkpoint_manifest(output_dir, manifest)
+        else:
+            self.save_model(output_dir, _internal_call=True)
 
         if not self.args.save_only_model:
             # Save optimizer and scheduler
@@ -3211,16 +3369,7 @@ class Trainer:
 
         # Save the Trainer state
         if self.args.should_save:
-            # Update `ExportableState` callbacks and `TrainerControl` state to where we are currently
-            for cb in [
-                cb for cb in self.callback_handler.callbacks + [self.control] if isinstance(cb, ExportableState)
-            ]:
-                cb_name = cb.__class__.__name__
-                cb_state = cb.state()
-                if isinstance(self.state.stateful_callbacks[cb_name], list):
-                    self.state.stateful_callbacks[cb_name].append(cb_state)
-                else:
-                    self.state.stateful_callbacks[cb_name] = cb_state
+            self._update_stateful_callbacks()
             self.state.save_to_json(os.path.join(output_dir, TRAINER_STATE_NAME))
 
         if self.args.push_to_hub:
@@ -3232,6 +3381,137 @@ class Trainer:
             # mtime is not reliable especially on some fuse fs in cloud environments.
             self._rotate_checkpoints(use_mtime=False, output_dir=run_dir)
 
+    def _update_stateful_callbacks(self):
+        # Update `ExportableState` callbacks and `TrainerControl` state to where we are currently
+        for cb in [cb for cb in self.callback_handler.callbacks + [self.control] if isinstance(cb, ExportableState)]:
+            cb_name = cb.__class__.__name__
+            cb_state = cb.state()
+            if isinstance(self.state.stateful_callbacks[cb_name], list):
+                self.state.stateful_callbacks[cb_name].append(cb_state)
+            else:
+                self.state.stateful_callbacks[cb_name] = cb_state
+
+    def _save_checkpoint_async(self, run_dir, output_dir):
+        """
+        Snapshots the model, optimizer, scheduler, scaler and Trainer states in CPU memory and writes them to
+        `output_dir` in a background thread. Files are written to a staging directory which is renamed to `output_dir`
+        once complete, and older checkpoints are rotated after that.
+        """
+        writer = self._async_checkpoint_writer
+        # Only one checkpoint is written at a time, this also allows to reuse the snapshot buffers.
+        writer.wait()
+
+        staging_dir = os.path.join(run_dir, f"tmp-{os.path.basename(output_dir)}")
+        if self.args.should_save and os.path.isdir(staging_dir):
+            # Left over by an interrupted save
+            shutil.rmtree(staging_dir)
+        self.accelerator.wait_for_everyone()
+        if not self.args.save_only_model:
+            # RNG states are tiny and saved synchronously, by every process
+            self._save_rng_state(staging_dir)
+        # Make sure every process wrote its RNG state before the staging directory can be renamed
+        self.accelerator.wait_for_everyone()
+        if not self.args.should_save:
+            return
+
+        self._update_stateful_callbacks()
+        delta_manifest = None
+        if self._delta_checkpoint_tracker is not None:
+            state_dict, delta_manifest = self._get_delta_checkpoint()
+        else:
+            state_dict = self.accelerator.unwrap_model(self.model).state_dict()
+        state_dict = writer.snapshot(state_dict, name="model")
+        optimizer_state_dict = scheduler_state_dict = scaler_state_dict = None
+        if not self.args.save_only_model:
+            optimizer_state_dict = writer.snapshot(self.optimizer.state_dict(), name="optimizer")
+            with warnings.catch_warnings(record=True) as caught_warnings:
+                scheduler_state_dict = copy.deepcopy(self.lr_scheduler.state_dict())
+            reissue_pt_warnings(caught_warnings)
+            scaler = getattr(self.accelerator, "scaler", None)
+            if scaler is not None:
+                scaler_state_dict = copy.deepcopy(scaler.state_dict())
+        state = copy.deepcopy(self.state)
+
+        def write_checkpoint():
+            self._save(staging_dir, state_dict=state_dict)
+            if delta_manifest is not None:
+                self._save_delta_checkpoint_manifest(staging_dir, delta_manifest)
+            if optimizer_state_dict is not None:
+                torch.save(optimizer_state_dict, os.path.join(staging_dir, OPTIMIZER_NAME))
+            if scheduler_state_dict is not None:
+                torch.save(scheduler_state_dict, os.path.join(staging_dir, SCHEDULER_NAME))
+            if scaler_state_dict is not None:
+                torch.save(scaler_state_dict, os.path.join(staging_dir, SCALER_NAME))
+            state.save_to_json(os.path.join(staging_dir, TRAINER_STATE_NAME))
+            writer.publish(staging_dir, output_dir)
+            # Solely rely on numerical checkpoint id for rotation, in-flight checkpoints are not visible until renamed.
+            self._rotate_checkpoints(use_mtime=False, output_dir=run_dir)
+
+        writer.submit(write_checkpoint)
+
+    def _get_delta_checkpoint(self):
+        """
+        Returns the state dict of the tensors of the model that differ from its base weights, and the manifest
+        describing the delta checkpoint storing them.
+        """
+        model = self.accelerator.unwrap_model(self.model)
+        changed_keys = self._delta_checkpoint_tracker.changed_keys(model)
+        state_dict = model.state_dict()
+        state_dict = {name: state_dict[name] for name in changed_keys}
+        manifest = self._delta_checkpoint_tracker.manifest(changed_keys)
+        manifest["base_model"] = getattr(getattr(model, "config", None), "_name_or_path", None)
+        return state_dict, manifest
+
+    @staticmethod
+    def _save_delta_checkpoint_manifest(output_dir, manifest):
+        with open(os.path.join(output_dir, DELTA_CHECKPOINT_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    def _load_delta_checkpoint(self, checkpoint, model):
+        """
+        Overlays the tensors stored in the delta checkpoint `checkpoint` on the weights of `model`, after making sure
+        the rest of them are the base weights the checkpoint was saved from.
+        """
+        with open(os.path.join(checkpoint, DELTA_CHECKPOINT_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if os.path.isfile(os.path.join(checkpoint, SAFE_WEIGHTS_INDEX_NAME)) or os.path.isfile(
+            os.path.join(checkpoint, WEIGHTS_INDEX_NAME)
+        ):
+            load_result = load_sharded_checkpoint(
+                model,
+                checkpoint,
+                strict=False,
+                prefer_safe=self.args.save_safetensors,
+                max_workers=self.args.checkpoint_shard_workers,
+            )
+        else:
+            safe_weights_file = os.path.join(checkpoint, SAFE_WEIGHTS_NAME)
+            if self.args.save_safetensors and os.path.isfile(safe_weights_file):
+                state_dict = safetensors.torch.load_file(safe_weights_file, device="cpu")
+            else:
+                state_dict = torch.load(os.path.join(checkpoint, WEIGHTS_NAME), map_location="cpu", weights_only=True)
+            load_result = model.load_state_dict(state_dict, False)
+            del state_dict
+
+        tracker = DeltaCheckpointTracker.from_manifest(model, manifest)
+        mismatched_keys = tracker.mismatched_keys(model)
+        if mismatched_keys:
+            raise ValueError(
+                f"{checkpoint} is a delta checkpoint of {manifest.get('base_model')} that only stores the weights "
+                f"which changed from it, but {len(mismatched_keys)} other weights of the model don't match the base "
+                f"ones (e.g. {mismatched_keys[0]}). Initialize the model with the base weights first."
+            )
+        # The weights missing from the checkpoint are the base weights of the model
+        load_result.missing_keys[:] = [key for key in load_result.missing_keys if key not in tracker.base_hashes]
+        self._issue_warnings_after_load(load_result)
+        if self._save_delta_checkpoints:
+            self._delta_checkpoint_tracker = tracker
+
+    def _wait_for_async_checkpoint(self):
+        if getattr(self, "_async_checkpoint_writer", None) is not None:
+            self._async_checkpoint_writer.wait()
+
     def _save_rng_state(self, output_dir):
         # Save RNG state in non-distributed training
         rng_states = {
@@ -3869,6 +4149,10 @@ class Trainer:
                 remove_dummy_checkpoint(self.args.should_save, output_dir, [WEIGHTS_NAME, SAFE_WEIGHTS_NAME])
                 self.model_wrapped.save_checkpoint(output_dir)
 
+        elif self.args.save_shards_on_each_process and self.args.world_size > 1:
+            self._save(output_dir, all_processes=True)
+            # Make sure the checkpoint is complete when this returns on any process
+            self.accelerator.wait_for_everyone()
         elif self.args.should_save:
             self._save(output_dir)
 
@@ -3948,12 +4232,24 @@ class Trainer:
         if self.processing_class is not None and self.args.should_save:
             self.processing_class.save_pretrained(output_dir)
 
-    def _save(self, output_dir: Optional[str] = None, state_dict=None):
-        # If we are executing this function, we are the process zero, so we don't check for that.
+    def _save(self, output_dir: Optional[str] = None, state_dict=None, all_processes: bool = False):
+        # If we are executing this function, we are the process zero, so we don't check for that. With
+        # `all_processes=True`, every process writes its share of the model shards and process zero the rest.
         output_dir = output_dir if output_dir is not None else self.args.output_dir
         os.makedirs(output_dir, exist_ok=True)
         logger.info(f"Saving model checkpoint to {output_dir}")
 
+        save_kwargs = {
+            "safe_serialization": self.args.save_safetensors,
+            "max_shard_workers": self.args.checkpoint_shard_workers,
+        }
+        if all_processes:
+            save_kwargs.update(
+                is_main_process=self.args.should_save,
+                process_index=self.args.process_index,
+                world_size=self.args.world_size,
+            )
+
         supported_classes = (PreTrainedModel,) if not is_peft_available() else (PreTrainedModel, PeftModel)
         # Save a trained model and configuration using `save_pretrained()`.
         # They can then be reloaded using `from_pretrained()`
@@ -3963,9 +4259,9 @@ class Trainer:
 
             if isinstance(self.accelerator.unwrap_model(self.model), supported_classes):
                 self.accelerator.unwrap_model(self.model).save_pretrained(
-                    output_dir, state_dict=state_dict, safe_serialization=self.args.save_safetensors
+                    output_dir, state_dict=state_dict, **save_kwargs
                 )
-            else:
+            elif self.args.should_save:
                 logger.info("Trainer.model is not a `PreTrainedModel`, only saving its state dict.")
                 if self.args.save_safetensors:
                     safetensors.torch.save_file(
@@ -3974,9 +4270,10 @@ class Trainer:
                 else:
                     torch.save(state_dict, os.path.join(output_dir, WEIGHTS_NAME))
         else:
-            self.model.save_pretrained(
-                output_dir, state_dict=state_dict, safe_serialization=self.args.save_safetensors
-            )
+            self.model.save_pretrained(output_dir, state_dict=state_dict, **save_kwargs)
+
+        if not self.args.should_save:
+            return
 
         if self.processing_class is not None:
             self.processing_class.save_pretrained(output_dir)
@@ -4287,10 +4584,22 @@ class Trainer:
             self._past = None
 
         # Initialize containers
-        all_losses = EvalLoopContainer(self.args.eval_do_concat_batches, padding_index=-100)
-        all_preds = EvalLoopContainer(self.args.eval_do_concat_batches, padding_index=-100)
-        all_labels = EvalLoopContainer(self.args.eval_do_concat_batches, padding_index=-100)
-        all_inputs = EvalLoopContainer(self.args.eval_do_concat_batches, padding_index=-100)
+        if args.eval_memmap_dir is not None:
+            storage_dir = os.path.join(args.eval_memmap_dir, metric_key_prefix)
+            if args.world_size > 1:
+                storage_dir = os.path.join(storage_dir, f"rank-{args.process_index}")
+            all_losses, all_preds, all_labels, all_inputs = (
+                MemmapEvalLoopContainer(storage_dir, name, args.eval_do_concat_batches, padding_index=-100)
+                for name in ("losses", "predictions", "label_ids", "inputs")
+            )
+            # Stream the gathered tensors to disk at every step unless asked otherwise
+            eval_accumulation_steps = args.eval_accumulation_steps or 1
+        else:
+            all_losses = EvalLoopContainer(self.args.eval_do_concat_batches, padding_index=-100)
+            all_preds = EvalLoopContainer(self.args.eval_do_concat_batches, padding_index=-100)
+            all_labels = EvalLoopContainer(self.args.eval_do_concat_batches, padding_index=-100)
+            all_inputs = EvalLoopContainer(self.args.eval_do_concat_batches, padding_index=-100)
+            eval_accumulation_steps = args.eval_accumulation_steps
 
         metrics = None
         eval_set_kwargs = {}
@@ -4359,7 +4668,7 @@ class Trainer:
                 torch.cuda.empty_cache()
 
             # Gather all tensors and put them back on the CPU if we have done enough accumulation steps.
-            elif args.eval_accumulation_steps is not None and (step + 1) % args.eval_accumulation_steps == 0:
+            elif eval_accumulation_steps is not None and (step + 1) % eval_accumulation_steps == 0:
                 all_losses.to_cpu_and_numpy()
                 all_preds.to_cpu_and_numpy()
                 all_labels.to_cpu_and_numpy()
@@ -5164,6 +5473,39 @@ class Trainer:
                 "`auto_find_batch_size` isn't supported yet with DeepSpeed Zero-3. Please consider using Zero-2, Zero-1, or FSDP"
             )
 
+        # `save_async` snapshots the plain state dicts of the model and optimizer
+        self._async_checkpoint_writer = None
+        if self.args.save_async:
+            if (
+                self.is_deepspeed_enabled
+                or self.is_fsdp_enabled
+                or is_torch_xla_available()
+                or is_sagemaker_mp_enabled()
+                or self.args.push_to_hub
+            ):
+                logger.warning(
+                    "`save_async` is not supported with DeepSpeed, FSDP, TPUs, SageMaker Model Parallel or "
+                    "`push_to_hub`, checkpoints will be saved synchronously."
+                )
+            else:
+                self._async_checkpoint_writer = AsyncCheckpointWriter()
+
+        # `save_delta_checkpoints` compares the plain state dict of the model to its base weights
+        self._save_delta_checkpoints = self.args.save_delta_checkpoints
+        self._delta_checkpoint_tracker = None
+        if self._save_delta_checkpoints and (
+            self.is_deepspeed_enabled
+            or self.is_fsdp_enabled
+            or is_torch_xla_available()
+            or is_sagemaker_mp_enabled()
+            or self.args.push_to_hub
+        ):
+            logger.warning(
+                "`save_delta_checkpoints` is not supported with DeepSpeed, FSDP, TPUs, SageMaker Model Parallel or "
+                "`push_to_hub`, full checkpoints will be saved."
+            )
+            self._save_delta_checkpoints = False
+
     def propagate_args_to_deepspeed(self, auto_find_batch_size=False):
         """
         Sets values in the deepspeed plugin based on the Trainer args
@@ -5210,9 +5552,10 @@ class Trainer:
                 pass
 
         if self.args.average_tokens_across_devices and num_items_in_batch is not None:
-            num_items_in_batch = self.accelerator.gather(num_items_in_batch).sum().item()
+            num_items_in_batch = self.accelerator.gather(num_items_in_batch).sum()
 
-        if torch.is_tensor(num_items_in_batch):
+        # With `sync_free_training`, the count is left on device and passed as a tensor to the loss
+        if torch.is_tensor(num_items_in_batch) and not self.args.sync_free_training:
             num_items_in_batch = num_items_in_batch.item()
 
         return batch_samples, num_items_in_batch
@@ -19,6 +19,8 @@ Callbacks to use with the Trainer class and customize the training loop.
 import dataclasses
 import json
 import math
+import os
+import time
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Union
 
@@ -27,7 +29,11 @@ from tqdm.auto import tqdm
 
 from .trainer_utils import HPSearchBackend, IntervalStrategy, SaveStrategy, has_length
 from .training_args import TrainingArguments
-from .utils import logging
+from .utils import is_torch_available, logging
+
+
+if is_torch_available():
+    import torch
 
 
 logger = logging.get_logger(__name__)
@@ -381,6 +387,13 @@ class TrainerCallback:
         """
         pass
 
+    def on_backward_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
+        """
+        Event called after the forward and backward passes on an input, before gradient clipping. If using gradient
+        accumulation, it is called once per substep.
+        """
+        pass
+
     def on_pre_optimizer_step(self, args: TrainingArguments, state: TrainerState, control: TrainerControl, **kwargs):
         """
         Event called before the optimizer step but after gradient clipping. Useful for monitoring gradients.
@@ -518,6 +531,9 @@ class CallbackHandler(TrainerCallback):
         control.should_save = False
         return self.call_event("on_step_begin", args, state, control)
 
+    def on_backward_end(self, args: TrainingArguments, state: TrainerState, control: TrainerControl):
+        return self.call_event("on_backward_end", args, state, control)
+
     def on_pre_optimizer_step(self, args: TrainingArguments, state: TrainerState, control: TrainerControl):
         return self.call_event("on_pre_optimizer_step", args, state, control)
 
@@ -780,3 +796,206 @@ class EarlyStoppingCallback(TrainerCallback, ExportableState):
                 "early_stopping_patience_counter": self.early_stopping_patience_counter,
             },
         }
+
+
+class StepProfilerCallback(TrainerCallback):
+    """
+    A [`TrainerCallback`] that records a per-step breakdown of the training time and writes it to a JSONL trace, to
+    find out whether a slow training is bound by the input pipeline or by the compute.
+
+    For each optimizer step, one line is written with the following times (in seconds):
+
+        - `data_time`: waiting for the inputs of the step, between the end of the previous step (and of its logging,
+          evaluation and saving) and the beginning of this one.
+        - `forward_time` and `backward_time`: the forward and backward passes, summed over the gradient accumulation
+          substeps.
+        - `grad_clip_time`: the gradient clipping (and unscaling of the gradients in mixed precision).
+        - `optimizer_time`: the optimizer step, learning rate scheduler step and zeroing of the gradients.
+        - `logging_time`: the logging, evaluation and saving done after the step, including the device synchronizations
+          they trigger.
+        - `step_time`: the sum of all the above.
+
+    along with the number of tokens of the step (`num_tokens`), `tokens_per_second` and, if `peak_flops` is set, the
+    model FLOPs utilization (`mfu`) estimated with [`~PreTrainedModel.floating_point_ops`]. Tokens and FLOPs are the
+    ones processed by the current process only. In distributed training, each process writes its own trace.
+
+    Args:
+        output_file (`str`, *optional*):
+            The JSONL file to write the trace to. Defaults to `step_profile.jsonl` in `args.output_dir`. In distributed
+            training, the rank of the process is added to the file name.
+        peak_flops (`float`, *optional*):
+            The peak number of floating-point operations per second of one device, used to compute the MFU.
+        synchronize (`bool`, *optional*, defaults to `True`):
+            Whether to synchronize the CUDA device before reading the clock at each boundary. Without it, the times are
+            the ones of the kernel launches, which can be misleading since CUDA is asynchronous, but the profiling does
+            not slow down training.
+        profiler_schedule (`Dict[str, int]`, *optional*):
+            If set, `torch.profiler` is run over the training with `torch.profiler.schedule(**profiler_schedule)` (for
+            instance `{"wait": 5, "warmup": 1, "active": 3}`), stepping at each optimizer step. The traces are written
+            in TensorBoard format to `profiler_dir`.
+        profiler_dir (`str`, *optional*):
+            Where to write the `torch.profiler` traces. Defaults to `profiler` in `args.output_dir`.
+    """
+
+    def __init__(
+        self,
+        output_file: Optional[str] = None,
+        peak_flops: Optional[float] = None,
+        synchronize: bool = True,
+        profiler_schedule: Optional[Dict[str, int]] = None,
+        profiler_dir: Optional[str] = None,
+    ):
+        self.output_file = output_file
+        self.peak_flops = peak_flops
+        self.synchronize = synchronize
+        self.profiler_schedule = profiler_schedule
+        self.profiler_dir = profiler_dir
+        self.totals = {}
+        self.num_steps = 0
+        self._file = None
+        self._profiler = None
+        self._hooks = []
+        self._record = None
+        self._pending_record = None
+        self._forward_start = self._phase_start = self._step_end = self._last_boundary = 0.0
+
+    def _now(self):
+        if self.synchronize and is_torch_available() and torch.cuda.is_available() and torch.cuda.is_initialized():
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _forward_pre_hook(self, module, args, kwargs):
+        if self._record is not None:
+            self._forward_start = self._now()
+
+    def _forward_hook(self, module, args, kwargs, output):
+        if self._record is None:
+            return
+        now = self._now()
+        self._record["forward_time"] += now - self._forward_start
+        self._phase_start = now
+
+        main_input_name = getattr(module, "main_input_name", "input_ids")
+        inputs = kwargs.get(main_input_name, args[0] if len(args) > 0 else None)
+        if isinstance(inputs, torch.Tensor):
+            self._record["num_tokens"] += inputs.numel()
+            if hasattr(module, "floating_point_ops"):
+                self._record["flos"] += module.floating_point_ops({main_input_name: inputs})
+
+    def _flush(self, record):
+        step_time = sum(v for k, v in record.items() if k.endswith("_time"))
+        record["step_time"] = step_time
+        record["tokens_per_second"] = record["num_tokens"] / step_time if step_time > 0 else None
+        if self.peak_flops is not None:
+            record["mfu"] = record["flos"] / step_time / self.peak_flops if step_time > 0 else None
+
+        for key in ("data_time", "forward_time", "backward_time", "grad_clip_time", "optimizer_time", "logging_time"):
+            self.totals[key] = self.totals.get(key, 0.0) + record[key]
+        self.num_steps += 1
+        if self._file is not None:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def _close_pending_record(self):
+        # The logging time of a step can only be known once everything done after it is over
+        if self._pending_record is not None:
+            self._pending_record["logging_time"] = self._last_boundary - self._step_end
+            self._flush(self._pending_record)
+            self._pending_record = None
+
+    def on_train_begin(self, args, state, control, model=None, **kwargs):
+        output_file = self.output_file or os.path.join(args.output_dir, "step_profile.jsonl")
+        if args.world_size > 1:
+            root, ext = os.path.splitext(output_file)
+            output_file = f"{root}-rank{args.process_index}{ext}"
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        self._file = open(output_file, "w", encoding="utf-8")
+
+        if model is not None:
+            self._hooks = [
+                model.register_forward_pre_hook(self._forward_pre_hook, with_kwargs=True),
+                model.register_forward_hook(self._forward_hook, with_kwargs=True),
+            ]
+        if self.profiler_schedule is not None:
+            profiler_dir = self.profiler_dir or os.path.join(args.output_dir, "profiler")
+            self._profiler = torch.profiler.profile(
+                schedule=torch.profiler.schedule(**self.profiler_schedule),
+                on_trace_ready=torch.profiler.tensorboard_trace_handler(profiler_dir),
+            )
+            self._profiler.start()
+
+        self.totals = {}
+        self.num_steps = 0
+        self._last_boundary = self._now()
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        now = self._now()
+        self._close_pending_record()
+        self._record = {
+            "step": state.global_step + 1,
+            "data_time": now - self._last_boundary,
+            "forward_time": 0.0,
+            "backward_time": 0.0,
+            "grad_clip_time": 0.0,
+            "optimizer_time": 0.0,
+            "num_tokens": 0,
+            "flos": 0.0,
+        }
+        self._phase_start = now
+
+    def on_backward_end(self, args, state, control, **kwargs):
+        if self._record is not None:
+            now = self._now()
+            self._record["backward_time"] += now - self._phase_start
+            self._phase_start = now
+
+    def on_pre_optimizer_step(self, args, state, control, **kwargs):
+        if self._record is not None:
+            now = self._now()
+            self._record["grad_clip_time"] += now - self._phase_start
+            self._phase_start = now
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if self._record is None:
+            return
+        now = self._now()
+        self._record["optimizer_time"] += now - self._phase_start
+        self._record["epoch"] = state.epoch
+        self._pending_record, self._record = self._record, None
+        self._step_end = self._last_boundary = now
+        if self._profiler is not None:
+            self._profiler.step()
+
+    def _mark_post_step_boundary(self):
+        if self._pending_record is not None:
+            self._last_boundary = self._now()
+
+    def on_log(self, args, state, control, **kwargs):
+        self._mark_post_step_boundary()
+
+    def on_save(self, args, state, control, **kwargs):
+        self._mark_post_step_boundary()
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        self._mark_post_step_boundary()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        self._mark_post_step_boundary()
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._mark_post_step_boundary()
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self._close_pending_record()
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        if self._profiler is not None:
+            self._profiler.stop()
+            self._profiler = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.num_steps > 0:
+            averages = ", ".join(f"{k}={v / self.num_steps:.4f}s" for k, v in self.totals.items())
+            logger.info(f"Average time per step over {self.num_steps} steps: {averages}")
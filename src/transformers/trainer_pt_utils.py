@@ -18,13 +18,17 @@ Torch utilities for the Trainer class.
 
 import copy
 import datetime
+import hashlib
 import io
 import json
 import math
 import os
+import shutil
 import sys
 import warnings
+from collections import deque
 from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from itertools import chain
@@ -139,6 +143,51 @@ def nested_concat(tensors, new_tensors, padding_index=-100):
         raise TypeError(f"Unsupported type for concatenation: got {type(tensors)}")
 
 
+def _pad_and_concatenate_all(tensors, padding_index=-100):
+    """Concatenates the list of `tensors` on first axis in one copy, applying padding on the second if necessary."""
+    tensors = [atleast_1d(t) for t in tensors]
+    first = tensors[0]
+    is_torch = isinstance(first, torch.Tensor)
+    if len(first.shape) == 1 or all(t.shape[1] == first.shape[1] for t in tensors):
+        return torch.cat(tensors, dim=0) if is_torch else np.concatenate(tensors, axis=0)
+
+    # Let's figure out the new shape
+    new_shape = (sum(t.shape[0] for t in tensors), max(t.shape[1] for t in tensors)) + first.shape[2:]
+
+    # Now let's fill the result tensor
+    result = (
+        first.new_full(new_shape, padding_index) if is_torch else np.full_like(first, padding_index, shape=new_shape)
+    )
+    offset = 0
+    for t in tensors:
+        result[offset : offset + t.shape[0], : t.shape[1]] = t
+        offset += t.shape[0]
+    return result
+
+
+def nested_concat_all(tensors_list, padding_index=-100):
+    """
+    Concat all the elements of `tensors_list` on the first dim and pad them on the second if needed, like successive
+    calls to [`nested_concat`] would, but copying each element only once. Works for a list of tensors, arrays or
+    nested list/tuples/dict of them with the same structure.
+    """
+    first = tensors_list[0]
+    if len(tensors_list) == 1:
+        return first
+    if isinstance(first, (list, tuple)):
+        return type(first)(
+            nested_concat_all([t[i] for t in tensors_list], padding_index=padding_index) for i in range(len(first))
+        )
+    elif isinstance(first, Mapping):
+        return type(first)(
+            {k: nested_concat_all([t[k] for t in tensors_list], padding_index=padding_index) for k in first}
+        )
+    elif isinstance(first, (torch.Tensor, np.ndarray)):
+        return _pad_and_concatenate_all(tensors_list, padding_index=padding_index)
+    else:
+        raise TypeError(f"Unsupported type for concatenation: got {type(first)}")
+
+
 def find_batch_size(tensors):
     """
     Find the first dimension of a tensor in a nested list/tuple/dict of tensors.
@@ -294,11 +343,14 @@ class EvalLoopContainer:
     """
     Container to store intermediate results of evaluation loop
 
+    The added objects are kept in a list of chunks, and when `do_nested_concat=True` they are only concatenated once,
+    in [`~EvalLoopContainer.get_arrays`], instead of re-concatenating all the stored tensors at each step.
+
     Args:
         do_nested_concat (`bool`, *optional*, defaults to `True`):
-            If set to `True`, each iteration will recursively concatenate a new object containing tensors to
-            the existing stored tensors, provided that the structure of the existing object and the new one
-            are identical. If set to `False`, all newly added tensors will be stored in a list.
+            If set to `True`, the stored objects will be recursively concatenated when calling `get_arrays`, provided
+            that the structure of the objects added is identical. If set to `False`, all newly added tensors will be
+            stored in a list.
         padding_index (`int`, *optional*, defaults to -100):
             Value used to pad tensors of different shapes when `do_nested_concat=True`.
     """
@@ -312,9 +364,7 @@ class EvalLoopContainer:
     def add(self, tensors) -> None:
         """Add tensors to the stored objects. If `do_nested_concat=True`, the tensors will be concatenated recursively."""
         if self.tensors is None:
-            self.tensors = tensors if self.do_nested_concat else [tensors]
-        elif self.do_nested_concat:
-            self.tensors = nested_concat(self.tensors, tensors, padding_index=self.padding_index)
+            self.tensors = [tensors]
         else:
             self.tensors.append(tensors)
 
@@ -325,11 +375,9 @@ class EvalLoopContainer:
         if self.tensors is None:
             return
 
-        new_arrays = nested_numpify(self.tensors)
+        new_arrays = [nested_numpify(tensors) for tensors in self.tensors]
         if self.arrays is None:
             self.arrays = new_arrays
-        elif self.do_nested_concat:
-            self.arrays = nested_concat(self.arrays, new_arrays, padding_index=self.padding_index)
         else:
             self.arrays.extend(new_arrays)
 
@@ -339,6 +387,125 @@ class EvalLoopContainer:
     def get_arrays(self):
         """Returns the numpified and moved to CPU stored objects."""
         self.to_cpu_and_numpy()
+        if self.arrays is None or not self.do_nested_concat:
+            return self.arrays
+        if len(self.arrays) > 1:
+            self.arrays = [nested_concat_all(self.arrays, padding_index=self.padding_index)]
+        return self.arrays[0]
+
+
+class MemmapEvalLoopContainer(EvalLoopContainer):
+    """
+    Container to store intermediate results of evaluation loop on disk instead of in host memory.
+
+    Each time the stored tensors are moved to CPU, they are written to `.npy` shards in `storage_dir`. When calling
+    `get_arrays`, the shards are (padded and) concatenated into a single `.npy` file per array, one chunk at a time, and
+    returned as copy-on-write `np.memmap`, so that only the parts that are read are actually loaded in memory.
+
+    Args:
+        storage_dir (`str` or `os.PathLike`):
+            The directory where the arrays are written. It is created if it does not exist.
+        name (`str`):
+            The prefix of the files written by this container, used to store several containers in the same directory.
+        do_nested_concat (`bool`, *optional*, defaults to `True`):
+            If set to `True`, the stored objects will be recursively concatenated when calling `get_arrays`. If set to
+            `False`, a list with one memory-mapped object per shard is returned.
+        padding_index (`int`, *optional*, defaults to -100):
+            Value used to pad arrays of different shapes when `do_nested_concat=True`.
+    """
+
+    def __init__(
+        self,
+        storage_dir: Union[str, os.PathLike],
+        name: str,
+        do_nested_concat: bool = True,
+        padding_index: int = -100,
+    ):
+        super().__init__(do_nested_concat=do_nested_concat, padding_index=padding_index)
+        self.storage_dir = storage_dir
+        self.name = name
+        self.shards = []
+        os.makedirs(storage_dir, exist_ok=True)
+
+    def _path(self, *suffixes) -> str:
+        return os.path.join(self.storage_dir, "-".join((self.name,) + tuple(str(s) for s in suffixes)) + ".npy")
+
+    def _save_shard(self, arrays, counter):
+        if isinstance(arrays, (list, tuple)):
+            return type(arrays)(self._save_shard(a, counter) for a in arrays)
+        if isinstance(arrays, Mapping):
+            return type(arrays)({k: self._save_shard(a, counter) for k, a in arrays.items()})
+        path = self._path("shard", len(self.shards), len(counter))
+        counter.append(path)
+        # Files are always written under a temporary name then renamed, so that arrays still mapped from a previous
+        # evaluation keep pointing to their (now unlinked) data instead of being truncated.
+        with open(f"{path}.tmp", "wb") as f:
+            np.save(f, atleast_1d(arrays))
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def to_cpu_and_numpy(self) -> None:
+        """Move tensors in stored objects to CPU and write them to disk."""
+        if self.tensors is None:
+            return
+
+        for tensors in self.tensors:
+            self.shards.append(self._save_shard(nested_numpify(tensors), []))
+
+        # reset device tensors after writing them
+        self.tensors = None
+
+    def _load(self, paths):
+        if isinstance(paths, (list, tuple)):
+            return type(paths)(self._load(p) for p in paths)
+        if isinstance(paths, Mapping):
+            return type(paths)({k: self._load(p) for k, p in paths.items()})
+        return np.load(paths, mmap_mode="c")
+
+    def _merge_shards(self, shards_list, counter):
+        first = shards_list[0]
+        if isinstance(first, (list, tuple)):
+            return type(first)(self._merge_shards([s[i] for s in shards_list], counter) for i in range(len(first)))
+        if isinstance(first, Mapping):
+            return type(first)({k: self._merge_shards([s[k] for s in shards_list], counter) for k in first})
+
+        path = self._path(len(counter))
+        counter.append(path)
+        shards = [np.load(p, mmap_mode="r") for p in shards_list]
+        first = shards[0]
+        new_shape = (sum(s.shape[0] for s in shards),) + first.shape[1:]
+        needs_padding = len(first.shape) > 1 and any(s.shape[1] != first.shape[1] for s in shards)
+        if needs_padding:
+            new_shape = new_shape[:1] + (max(s.shape[1] for s in shards),) + first.shape[2:]
+
+        result = np.lib.format.open_memmap(f"{path}.tmp", mode="w+", dtype=first.dtype, shape=new_shape)
+        if needs_padding:
+            result[:] = self.padding_index
+        offset = 0
+        for shard in shards:
+            if needs_padding:
+                result[offset : offset + shard.shape[0], : shard.shape[1]] = shard
+            else:
+                result[offset : offset + shard.shape[0]] = shard
+            offset += shard.shape[0]
+        result.flush()
+        del result, shards
+        os.replace(f"{path}.tmp", path)
+        for shard_path in shards_list:
+            if shard_path != path:
+                os.remove(shard_path)
+        return path
+
+    def get_arrays(self):
+        """Returns the stored objects as memory-mapped arrays."""
+        self.to_cpu_and_numpy()
+        if not self.shards:
+            return None
+        if not self.do_nested_concat:
+            return [self._load(shard) for shard in self.shards]
+        if len(self.shards) > 1 or self.arrays is None:
+            self.shards = [self._merge_shards(self.shards, [])]
+            self.arrays = self._load(self.shards[0])
         return self.arrays
 
 
@@ -536,6 +703,350 @@ class DistributedTensorGatherer:
         return nested_truncate(self._storage, self.num_samples)
 
 
+class AsyncCheckpointWriter:
+    """
+    Writes checkpoints in a background thread so that saving does not block the training loop.
+
+    The training state is first snapshotted with [`~AsyncCheckpointWriter.snapshot`]: tensors on a CUDA device are
+    copied into reused pinned CPU buffers with non-blocking copies (which the background thread waits for before
+    writing), while CPU tensors are cloned. Tensors sharing the same storage still share it in the snapshot, so tied
+    weights are detected on save.
+
+    At most one checkpoint is written at a time, and it is written in a staging directory that is renamed once all its
+    files are written, so that a checkpoint directory is either complete or absent.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint_writer")
+        self._future = None
+        self._pinned_buffers = {}
+        self._copy_event = None
+
+    @property
+    def is_saving(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def snapshot(self, tensors, name: str = ""):
+        """
+        Returns a copy of the nested list/tuple/dict of `tensors` in CPU memory. Must be called after `wait` returned,
+        since the pinned buffers of the previous snapshot are reused.
+        """
+        copies = {}
+        snapshot = self._snapshot(tensors, name, copies)
+        if any(tensor.is_cuda for tensor, _ in copies.values()):
+            self._copy_event = torch.cuda.Event()
+            self._copy_event.record()
+        return snapshot
+
+    def _snapshot(self, tensors, name, copies):
+        if isinstance(tensors, Mapping):
+            return type(tensors)({k: self._snapshot(t, f"{name}.{k}", copies) for k, t in tensors.items()})
+        elif isinstance(tensors, (list, tuple)):
+            return type(tensors)(self._snapshot(t, f"{name}.{i}", copies) for i, t in enumerate(tensors))
+        elif not isinstance(tensors, torch.Tensor):
+            return copy.deepcopy(tensors)
+
+        tensor = tensors.detach()
+        # Preserve the aliasing of tensors that are views of the same memory (e.g. tied weights)
+        key = (tensor.device, tensor.data_ptr(), tensor.shape, tensor.stride(), tensor.dtype)
+        if key in copies:
+            return copies[key][1]
+
+        if tensor.is_cuda:
+            buffer = self._pinned_buffers.get(name)
+            if buffer is None or buffer.shape != tensor.shape or buffer.dtype != tensor.dtype:
+                buffer = torch.empty(tensor.shape, dtype=tensor.dtype, device="cpu", pin_memory=True)
+                self._pinned_buffers[name] = buffer
+            buffer.copy_(tensor, non_blocking=True)
+        elif tensor.device.type == "cpu":
+            buffer = tensor.clone()
+        else:
+            buffer = tensor.to("cpu")
+        copies[key] = (tensor, buffer)
+        return buffer
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Runs `fn(*args, **kwargs)` in the background thread, once the copies of the last snapshot are done.
+        """
+        copy_event, self._copy_event = self._copy_event, None
+
+        def _write():
+            if copy_event is not None:
+                copy_event.synchronize()
+            return fn(*args, **kwargs)
+
+        self._future = self._executor.submit(_write)
+
+    def wait(self):
+        """
+        Blocks until the checkpoint being written, if any, is complete. Re-raises the exception it failed with.
+        """
+        future, self._future = self._future, None
+        if future is not None:
+            future.result()
+
+    @staticmethod
+    def publish(staging_dir: str, output_dir: str):
+        """
+        Atomically renames the complete `staging_dir` to `output_dir`, replacing it if it exists.
+        """
+        if os.path.isdir(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(staging_dir, output_dir)
+
+
+def tensor_content_hash(tensor: torch.Tensor) -> str:
+    """
+    Returns a hash of the dtype, shape and content of `tensor`.
+    """
+    tensor = tensor.detach()
+    hasher = hashlib.sha256(f"{tensor.dtype}-{tuple(tensor.shape)}".encode())
+    hasher.update(tensor.contiguous().cpu().reshape(-1).view(torch.uint8).numpy())
+    return hasher.hexdigest()
+
+
+class DeltaCheckpointTracker:
+    """
+    Keeps track of the tensors of the state dict of a model that differ from its base weights (the ones it had when the
+    tracker was created), so that checkpoints only need to store those.
+
+    Trainable parameters are always considered changed. The other tensors are hashed when the tracker is created, and
+    only hashed again if they have been modified in place since then (as told by their version counter), so frozen
+    weights are not copied back to the CPU at each checkpoint.
+
+    Args:
+        model (`nn.Module`):
+            The model to track.
+        base_hashes (`Dict[str, Optional[str]]`, *optional*):
+            The hashes of the base weights, `None` marking tensors known to differ from them, as stored in a delta
+            checkpoint manifest. Computed from the current weights of `model` if not provided.
+    """
+
+    def __init__(self, model: nn.Module, base_hashes: Optional[Dict[str, Optional[str]]] = None):
+        state_dict = model.state_dict()
+        if base_hashes is None:
+            trainable = self._trainable_names(model)
+            base_hashes = {
+                name: tensor_content_hash(tensor)
+                if isinstance(tensor, torch.Tensor) and name not in trainable
+                else None
+                for name, tensor in state_dict.items()
+            }
+        self.base_hashes = base_hashes
+        self._versions = {name: t._version for name, t in state_dict.items() if isinstance(t, torch.Tensor)}
+
+    @classmethod
+    def from_manifest(cls, model: nn.Module, manifest: Dict[str, Any]) -> "DeltaCheckpointTracker":
+        """
+        Creates a tracker for `model`, whose weights were restored from a delta checkpoint with this `manifest`, that
+        keeps tracking the changes from the same base weights.
+        """
+        base_hashes = dict(manifest["base_hashes"])
+        base_hashes.update(dict.fromkeys(manifest["delta_keys"]))
+        return cls(model, base_hashes=base_hashes)
+
+    @staticmethod
+    def _trainable_names(model: nn.Module):
+        return {name for name, param in model.named_parameters(remove_duplicate=False) if param.requires_grad}
+
+    def changed_keys(self, model: nn.Module) -> List[str]:
+        """
+        Returns the keys of the state dict of `model` whose tensors differ from the base weights.
+        """
+        trainable = self._trainable_names(model)
+        changed_keys = []
+        for name, tensor in model.state_dict().items():
+            base_hash = self.base_hashes.get(name)
+            if base_hash is not None and name not in trainable and isinstance(tensor, torch.Tensor):
+                if tensor._version == self._versions.get(name):
+                    continue
+                # Modified in place since it was last checked, compare its content to the base weights
+                self._versions[name] = tensor._version
+                if tensor_content_hash(tensor) == base_hash:
+                    continue
+                self.base_hashes[name] = None
+            changed_keys.append(name)
+        return changed_keys
+
+    def manifest(self, changed_keys: List[str]) -> Dict[str, Any]:
+        """
+        Returns the JSON-serializable description of a delta checkpoint storing the tensors of `changed_keys`.
+        """
+        changed_keys = set(changed_keys)
+        base_hashes = {name: h for name, h in self.base_hashes.items() if h is not None and name not in changed_keys}
+        return {"base_hashes": base_hashes, "delta_keys": sorted(changed_keys)}
+
+    def mismatched_keys(self, model: nn.Module) -> List[str]:
+        """
+        Returns the keys whose tensors should be the base weights but are missing from `model` or differ from them.
+        """
+        state_dict = model.state_dict()
+        return [
+            name
+            for name, base_hash in self.base_hashes.items()
+            if base_hash is not None and (name not in state_dict or tensor_content_hash(state_dict[name]) != base_hash)
+        ]
+
+
+class BatchPrefetcher:
+    """
+    Iterates over the batches of `iterator`, reading up to `num_prefetch` batches ahead of the one being used so that
+    their host-to-device copies are overlapped with the computation of the current step.
+
+    The batches are pulled from `iterator`, and thus collated, on the calling thread and in order, so that collators
+    drawing from the global random number generators (e.g. for masked language modeling) stay reproducible. On a CUDA
+    `device`, only the copies are done by a background thread, on a separate stream: CPU tensors of the batches are
+    pinned and copied to `device` with non-blocking copies (tensors already on the device are left as is), and the
+    current stream waits for the copies of a batch before it is returned. On other devices, nothing runs in the
+    background and the batches are returned as they are, only read ahead.
+
+    The prefetcher doesn't count the tokens of the batches: `Trainer.get_batch_samples` still computes
+    `num_items_in_batch` on the calling thread, from the batches it returns. On a CUDA `device`, these batches are
+    already on the device, so the count is computed there without waiting for it, unless it is read on the host.
+
+    If `dataloader` is an `accelerate` dataloader, reading ahead is hidden from it: its `end_of_dataloader` flag and
+    the state of stateful dataloaders are set back to the ones of each batch when it is returned, and the iteration
+    only ends once the last batch has been used. When the prefetcher copies the batches to a CUDA `device`, the
+    `device` of the dataloader is unset so that it doesn't copy them itself, and restored by
+    [`~BatchPrefetcher.close`].
+
+    Call [`~BatchPrefetcher.close`] once done with the prefetcher, to stop the background thread and restore the
+    dataloader.
+
+    Args:
+        iterator (`Iterator`):
+            The iterator to pull the batches from. It should not be used by anything else while prefetching.
+        num_prefetch (`int`, *optional*, defaults to 2):
+            The maximum number of batches read ahead of the one being used.
+        device (`torch.device`, *optional*):
+            The device to move the batches to.
+        dataloader (`torch.utils.data.DataLoader`, *optional*):
+            The dataloader `iterator` comes from, whose state is kept in sync with the batches being used.
+    """
+
+    def __init__(
+        self,
+        iterator: Iterator,
+        num_prefetch: int = 2,
+        device: Optional[torch.device] = None,
+        dataloader: Optional[Any] = None,
+    ):
+        self.iterator = iterator
+        self.num_prefetch = num_prefetch
+        self.device = torch.device(device) if device is not None else None
+        self.dataloader = dataloader
+        self._pending = deque()
+        self._exhausted = False
+        self._reached_last_batch = False
+        self._executor = None
+        self._dataloader_device = None
+        if self.device is not None and self.device.type == "cuda":
+            self._stream = torch.cuda.Stream(self.device)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch_prefetcher")
+            if getattr(dataloader, "device", None) is not None:
+                # The batches are copied to the device by the prefetcher, on a separate stream
+                self._dataloader_device = dataloader.device
+                dataloader.device = None
+
+    def _to_device(self, data):
+        if isinstance(data, Mapping):
+            return type(data)({k: self._to_device(v) for k, v in data.items()})
+        elif isinstance(data, (tuple, list)):
+            return type(data)(self._to_device(v) for v in data)
+        elif isinstance(data, torch.Tensor) and data.device.type == "cpu":
+            if not data.is_pinned():
+                data = data.pin_memory()
+            return data.to(self.device, non_blocking=True)
+        return data
+
+    def _copy_to_device(self, batch):
+        with torch.cuda.stream(self._stream):
+            batch = self._to_device(batch)
+            event = torch.cuda.Event()
+            event.record(self._stream)
+        return batch, event
+
+    def _record_stream(self, data, stream):
+        # The memory allocated on the prefetching stream must not be reused before the current stream is done with it
+        if isinstance(data, Mapping):
+            for v in data.values():
+                self._record_stream(v, stream)
+        elif isinstance(data, (tuple, list)):
+            for v in data:
+                self._record_stream(v, stream)
+        elif isinstance(data, torch.Tensor) and data.is_cuda:
+            data.record_stream(stream)
+
+    def _dataloader_state(self) -> Optional[Dict[str, Any]]:
+        if self.dataloader is None:
+            return None
+        state = {"end_of_dataloader": getattr(self.dataloader, "end_of_dataloader", False)}
+        if getattr(self.dataloader, "dl_state_dict", None) is not None:
+            state["dl_state_dict"] = copy.deepcopy(self.dataloader.dl_state_dict)
+        return state
+
+    def _pull(self) -> bool:
+        """Pulls the next batch from the iterator and starts copying it to the device, returns whether there was one."""
+        if self._exhausted:
+            return False
+        try:
+            batch = next(self.iterator)
+        except StopIteration:
+            self._exhausted = True
+            return False
+        except Exception as e:
+            # Raised when the batch is reached
+            self._exhausted = True
+            self._pending.append((e, None))
+            return False
+
+        state = self._dataloader_state()
+        # `accelerate` dataloaders know that a batch is the last one before it is returned
+        self._reached_last_batch = state is not None and state["end_of_dataloader"]
+        if self._executor is not None:
+            batch = self._executor.submit(self._copy_to_device, batch)
+        self._pending.append((batch, state))
+        return True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if len(self._pending) == 0 and not self._pull():
+            raise StopIteration
+        batch, state = self._pending.popleft()
+        if isinstance(batch, Exception):
+            raise batch
+
+        # Read the next batches while this one is used, but not past the last one so that the dataloader only ends
+        # its iteration once it is done
+        while len(self._pending) < self.num_prefetch and not self._reached_last_batch and self._pull():
+            pass
+
+        if self._executor is not None:
+            batch, event = batch.result()
+            stream = torch.cuda.current_stream(self.device)
+            stream.wait_event(event)
+            self._record_stream(batch, stream)
+        if state is not None:
+            for name, value in state.items():
+                setattr(self.dataloader, name, value)
+        return batch
+
+    def close(self):
+        """
+        Stops the background thread, drops the prefetched batches and restores the `device` of the dataloader.
+        """
+        self._exhausted = True
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._dataloader_device is not None:
+            self.dataloader.device = self._dataloader_device
+            self._dataloader_device = None
+
+
 @dataclass
 class LabelSmoother:
     """
@@ -660,6 +1171,48 @@ class LengthGroupedSampler(Sampler):
         return iter(indices)
 
 
+class LengthSortedSampler(Sampler):
+    r"""
+    Sampler that goes through the features of the dataset sorted by length (longest first by default), so that each batch
+    needs as little padding as possible. Meant for evaluation: the order is deterministic and `indices` can be used to
+    put the predictions back in the order of the dataset.
+    """
+
+    def __init__(
+        self,
+        dataset: Optional[Dataset] = None,
+        lengths: Optional[List[int]] = None,
+        model_input_name: Optional[str] = None,
+        descending: bool = True,
+    ):
+        if dataset is None and lengths is None:
+            raise ValueError("One of dataset and lengths must be provided.")
+
+        if lengths is None:
+            model_input_name = model_input_name if model_input_name is not None else "input_ids"
+            if (
+                not (isinstance(dataset[0], dict) or isinstance(dataset[0], BatchEncoding))
+                or model_input_name not in dataset[0]
+            ):
+                raise ValueError(
+                    "Can only automatically infer lengths for datasets whose items are dictionaries with an "
+                    f"'{model_input_name}' key."
+                )
+            lengths = [len(feature[model_input_name]) for feature in dataset]
+        elif isinstance(lengths, torch.Tensor):
+            lengths = lengths.tolist()
+
+        self.lengths = lengths
+        # `sorted` is stable, so features of the same length keep their relative order
+        self.indices = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=descending)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        return iter(self.indices)
+
+
 class DistributedLengthGroupedSampler(DistributedSampler):
     r"""
     Distributed Sampler that samples indices in a way that groups together features of the dataset of roughly the same
@@ -748,6 +1301,246 @@ class DistributedLengthGroupedSampler(DistributedSampler):
         return iter(indices)
 
 
+class TokenBudgetBatchSampler(Sampler):
+    r"""
+    Batch sampler yielding batches of dataset indices with a dynamic number of examples, so that each batch holds at
+    most `max_tokens` tokens once padded, i.e. `len(batch) * max(lengths[batch]) <= max_tokens`. Examples longer than
+    `max_tokens` are put in a batch of their own.
+
+    The batches are built once by sorting the examples by decreasing length and filling each batch greedily, which
+    minimizes padding and makes the number of batches fixed. Only the order of the batches is shuffled, based on the
+    seed and the epoch set with `set_epoch`.
+
+    In distributed training, the number of batches is made a round multiple of `num_replicas` (dropping or repeating
+    batches depending on `drop_last`). If `rank` is set, only the batches of that process are yielded, otherwise all
+    batches are yielded and are expected to be sharded round-robin (as done by `accelerate`).
+
+    Args:
+        max_tokens (`int`):
+            The maximum number of tokens in a padded batch.
+        dataset (`torch.utils.data.Dataset`, *optional*):
+            The dataset to compute the lengths from, if `lengths` is not provided.
+        lengths (`List[int]`, *optional*):
+            The precomputed lengths of the examples.
+        model_input_name (`str`, *optional*, defaults to `"input_ids"`):
+            The key to compute the lengths from in the items of the dataset.
+        num_replicas (`int`, *optional*, defaults to 1):
+            The number of processes taking part in the training.
+        rank (`int`, *optional*):
+            The rank of the current process, if this sampler should only yield its batches.
+        seed (`int`, *optional*, defaults to 0):
+            The random seed used to shuffle the batches.
+        drop_last (`bool`, *optional*, defaults to `False`):
+            Whether to drop the last batches if their number is not a round multiple of `num_replicas`, rather than
+            repeating the first ones.
+        max_batch_size (`int`, *optional*):
+            An upper bound on the number of examples in a batch.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        dataset: Optional[Dataset] = None,
+        lengths: Optional[List[int]] = None,
+        model_input_name: Optional[str] = None,
+        num_replicas: int = 1,
+        rank: Optional[int] = None,
+        seed: int = 0,
+        drop_last: bool = False,
+        max_batch_size: Optional[int] = None,
+    ):
+        if dataset is None and lengths is None:
+            raise ValueError("One of dataset and lengths must be provided.")
+        if max_tokens <= 0:
+            raise ValueError(f"`max_tokens` should be a positive integer, but got {max_tokens}.")
+
+        if lengths is None:
+            model_input_name = model_input_name if model_input_name is not None else "input_ids"
+            if (
+                not (isinstance(dataset[0], dict) or isinstance(dataset[0], BatchEncoding))
+                or model_input_name not in dataset[0]
+            ):
+                raise ValueError(
+                    "Can only automatically infer lengths for datasets whose items are dictionaries with an "
+                    f"'{model_input_name}' key."
+                )
+            lengths = [len(feature[model_input_name]) for feature in dataset]
+        elif isinstance(lengths, torch.Tensor):
+            lengths = lengths.tolist()
+
+        self.max_tokens = max_tokens
+        self.lengths = lengths
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.seed = seed
+        self.epoch = 0
+        self.drop_last = drop_last
+        # Batches have a varying number of examples
+        self.batch_size = None
+
+        self.batches = []
+        self.batch_num_tokens = []
+        batch, batch_max_length = [], 0
+        for index in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+            length = max(lengths[index], 1)
+            if len(batch) > 0 and (
+                (len(batch) + 1) * batch_max_length > max_tokens
+                or (max_batch_size is not None and len(batch) == max_batch_size)
+            ):
+                self.batches.append(batch)
+                self.batch_num_tokens.append(len(batch) * batch_max_length)
+                batch, batch_max_length = [], 0
+            batch.append(index)
+            batch_max_length = max(batch_max_length, length)
+        if len(batch) > 0:
+            self.batches.append(batch)
+            self.batch_num_tokens.append(len(batch) * batch_max_length)
+
+        num_too_long = sum(length > max_tokens for length in lengths)
+        if num_too_long > 0:
+            logger.warning(
+                f"{num_too_long} examples are longer than `max_tokens={max_tokens}`, they will be in a batch of their"
+                " own."
+            )
+
+        if self.drop_last:
+            self.total_size = len(self.batches) - len(self.batches) % self.num_replicas
+        else:
+            self.total_size = math.ceil(len(self.batches) / self.num_replicas) * self.num_replicas
+
+    def __len__(self):
+        return self.total_size if self.rank is None else self.total_size // self.num_replicas
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __iter__(self) -> Iterator[List[int]]:
+        # Deterministically shuffle based on epoch and seed
+        g = torch.Generator()
+        g.manual_seed(self.seed + self.epoch)
+        order = torch.randperm(len(self.batches), generator=g).tolist()
+        # Add extra batches to make it evenly divisible, or remove the tail
+        order = (order * math.ceil(self.total_size / max(len(order), 1)))[: self.total_size]
+        if self.rank is not None:
+            order = order[self.rank : self.total_size : self.num_replicas]
+        for i in order:
+            yield self.batches[i]
+
+
+def get_first_fit_decreasing_bins(lengths: List[int], max_tokens: int) -> List[List[int]]:
+    """
+    Packs items of the given `lengths` into bins holding at most `max_tokens` tokens with the first-fit-decreasing
+    algorithm: items are considered from longest to shortest and each one goes to the first bin it fits in. Items
+    longer than `max_tokens` are counted as `max_tokens` long.
+
+    The first bin with enough room is found in `O(log(n))` with a segment tree over the remaining capacity of the bins,
+    so packing is `O(n log(n))` overall.
+
+    Returns:
+        `List[List[int]]`: The indices of the items in each bin.
+    """
+    lengths = np.minimum(np.asarray(lengths, dtype=np.int64), max_tokens)
+    order = np.argsort(-lengths, kind="stable")
+    # There are at most as many bins as items, the leaves of the tree hold the remaining capacity of each bin.
+    size = 1
+    while size < len(lengths):
+        size *= 2
+    tree = [max_tokens] * (2 * size)
+
+    bins = []
+    for index, length in zip(order.tolist(), lengths[order].tolist()):
+        node = 1
+        while node < size:
+            node = 2 * node if tree[2 * node] >= length else 2 * node + 1
+        bin_index = node - size
+        if bin_index == len(bins):
+            bins.append([])
+        bins[bin_index].append(index)
+
+        tree[node] -= length
+        node //= 2
+        while node > 0:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+    return bins
+
+
+class PackedDataset(Dataset):
+    """
+    Dataset packing the examples of a tokenized dataset into examples of at most `max_tokens` tokens, using
+    [`get_first_fit_decreasing_bins`]. The packing is computed once, when the dataset is created.
+
+    Each packed example holds the concatenated `input_ids` and `labels` (defaulting to the `input_ids`) of the
+    examples in its bin, with the first label of each sequence replaced by `separator_id`, and `position_ids`
+    restarting at 0 for each sequence, so that the sequence boundaries can be recovered by
+    [`DataCollatorWithFlattening`] and padding-free attention. Examples longer than `max_tokens` are truncated.
+
+    Args:
+        dataset (`torch.utils.data.Dataset`):
+            The dataset to pack. Its items must be dictionaries with a `model_input_name` key.
+        max_tokens (`int`):
+            The maximum number of tokens of a packed example.
+        lengths (`List[int]`, *optional*):
+            The precomputed lengths of the examples. Computed from the dataset if not provided.
+        model_input_name (`str`, *optional*, defaults to `"input_ids"`):
+            The key of the token ids in the items of the dataset.
+        separator_id (`int`, *optional*, defaults to -100):
+            The label id used in place of the first label of each sequence.
+    """
+
+    def __init__(
+        self,
+        dataset: Dataset,
+        max_tokens: int,
+        lengths: Optional[List[int]] = None,
+        model_input_name: Optional[str] = None,
+        separator_id: int = -100,
+    ):
+        if max_tokens <= 0:
+            raise ValueError(f"`max_tokens` should be a positive integer, but got {max_tokens}.")
+        self.dataset = dataset
+        self.max_tokens = max_tokens
+        self.model_input_name = model_input_name if model_input_name is not None else "input_ids"
+        self.separator_id = separator_id
+
+        if lengths is None:
+            if (
+                not (isinstance(dataset[0], dict) or isinstance(dataset[0], BatchEncoding))
+                or self.model_input_name not in dataset[0]
+            ):
+                raise ValueError(
+                    "Can only automatically infer lengths for datasets whose items are dictionaries with an "
+                    f"'{self.model_input_name}' key."
+                )
+            lengths = [len(feature[self.model_input_name]) for feature in dataset]
+        elif isinstance(lengths, torch.Tensor):
+            lengths = lengths.tolist()
+
+        num_truncated = sum(length > max_tokens for length in lengths)
+        if num_truncated > 0:
+            logger.warning(
+                f"{num_truncated} examples are longer than `max_tokens={max_tokens}` and will be truncated when packed."
+            )
+        self.bins = get_first_fit_decreasing_bins(lengths, max_tokens)
+        self.num_tokens = [sum(min(lengths[i], max_tokens) for i in indices) for indices in self.bins]
+
+    def __len__(self):
+        return len(self.bins)
+
+    def __getitem__(self, i) -> Dict[str, List[int]]:
+        input_ids, labels, position_ids = [], [], []
+        for index in self.bins[i]:
+            feature = self.dataset[index]
+            sequence = list(feature[self.model_input_name])[: self.max_tokens]
+            if len(sequence) == 0:
+                continue
+            sequence_labels = list(feature["labels"])[: self.max_tokens] if "labels" in feature else sequence
+            input_ids += sequence
+            labels += [self.separator_id] + sequence_labels[1:]
+            position_ids += range(len(sequence))
+        return {self.model_input_name: input_ids, "labels": labels, "position_ids": position_ids}
+
+
 class ShardSampler(Sampler):
     """
     Sampler that shards batches between several processes. Dispatches indices batch by batch: on 2 processes with batch
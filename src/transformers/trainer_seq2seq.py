@@ -14,10 +14,12 @@
 
 import contextlib
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import torch
 from torch import nn
 from torch.distributed.fsdp import FullyShardedDataParallel
@@ -27,6 +29,8 @@ from .generation.configuration_utils import GenerationConfig
 from .integrations.deepspeed import is_deepspeed_zero3_enabled
 from .integrations.fsdp import is_fsdp_managed_module
 from .trainer import Trainer
+from .trainer_pt_utils import LengthSortedSampler, nested_numpify
+from .trainer_utils import EvalLoopOutput, EvalPrediction, has_length
 from .utils import is_datasets_available, logging
 from .utils.deprecation import deprecate_kwarg
 
@@ -35,7 +39,7 @@ if is_datasets_available():
     import datasets
 
 if TYPE_CHECKING:
-    from torch.utils.data import IterableDataset
+    from torch.utils.data import DataLoader, IterableDataset
 
     from .data.data_collator import DataCollator
     from .feature_extraction_utils import FeatureExtractionMixin
@@ -44,13 +48,63 @@ if TYPE_CHECKING:
     from .processing_utils import ProcessorMixin
     from .tokenization_utils_base import PreTrainedTokenizerBase
     from .trainer_callback import TrainerCallback
-    from .trainer_utils import EvalPrediction, PredictionOutput
+    from .trainer_utils import PredictionOutput
     from .training_args import TrainingArguments
 
 
 logger = logging.get_logger(__name__)
 
 
+class _BackgroundGenerationMetrics:
+    """
+    Wraps a batched `compute_metrics` function so that the generated tokens and labels of each evaluation step are
+    decoded and fed to it on a background thread, while the main thread moves on to the next batch. Batches are
+    processed one at a time in order, and the call with `compute_result=True` waits for all of them to be done.
+    """
+
+    def __init__(self, compute_metrics: Callable, tokenizer=None, pad_token_id: Optional[int] = None, max_pending=4):
+        self.compute_metrics = compute_metrics
+        self.tokenizer = tokenizer if hasattr(tokenizer, "batch_decode") else None
+        self.pad_token_id = pad_token_id
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generation-metrics")
+        self._pending = []
+
+    def __call__(self, eval_pred: EvalPrediction, compute_result: bool = False):
+        # Raise errors from the background thread as soon as possible, and don't let too many batches (still on
+        # device) pile up if decoding can't keep up with generation
+        while self._pending and (self._pending[0].done() or len(self._pending) >= self.max_pending):
+            self._pending.pop(0).result()
+        future = self._executor.submit(self._compute, eval_pred, compute_result)
+        if not compute_result:
+            self._pending.append(future)
+            return None
+        while self._pending:
+            self._pending.pop(0).result()
+        return future.result()
+
+    def _decode(self, token_ids):
+        token_ids = nested_numpify(token_ids)
+        if self.tokenizer is None or isinstance(token_ids, (list, tuple)):
+            return token_ids
+        if self.pad_token_id is not None:
+            token_ids = np.where(token_ids != -100, token_ids, self.pad_token_id)
+        return self.tokenizer.batch_decode(token_ids, skip_special_tokens=True)
+
+    def _compute(self, eval_pred: EvalPrediction, compute_result: bool):
+        eval_pred = EvalPrediction(
+            predictions=self._decode(eval_pred.predictions),
+            label_ids=self._decode(eval_pred.label_ids),
+            inputs=eval_pred.inputs,
+            losses=nested_numpify(eval_pred.losses) if eval_pred.losses is not None else None,
+        )
+        return self.compute_metrics(eval_pred, compute_result=compute_result)
+
+    def close(self):
+        self._pending = []
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
 class Seq2SeqTrainer(Trainer):
     @deprecate_kwarg("tokenizer", new_name="processing_class", version="5.0.0", raise_if_both_names=True)
     def __init__(
@@ -260,6 +314,103 @@ class Seq2SeqTrainer(Trainer):
 
         return super().predict(test_dataset, ignore_keys=ignore_keys, metric_key_prefix=metric_key_prefix)
 
+    def _get_eval_sampler(self, eval_dataset: Dataset) -> Optional[torch.utils.data.Sampler]:
+        if (
+            not self.args.predict_with_generate
+            or not self.args.generation_streaming_eval
+            or self.args.use_legacy_prediction_loop
+            or eval_dataset is None
+            or not has_length(eval_dataset)
+        ):
+            return super()._get_eval_sampler(eval_dataset)
+
+        if is_datasets_available() and isinstance(eval_dataset, datasets.Dataset):
+            lengths = (
+                eval_dataset[self.args.length_column_name]
+                if self.args.length_column_name in eval_dataset.column_names
+                else None
+            )
+        else:
+            lengths = None
+        model_input_name = self.processing_class.model_input_names[0] if self.processing_class is not None else None
+        return LengthSortedSampler(dataset=eval_dataset, lengths=lengths, model_input_name=model_input_name)
+
+    def evaluation_loop(
+        self,
+        dataloader: "DataLoader",
+        description: str,
+        prediction_loss_only: Optional[bool] = None,
+        ignore_keys: Optional[List[str]] = None,
+        metric_key_prefix: str = "eval",
+    ) -> EvalLoopOutput:
+        """
+        Prediction/evaluation loop, shared by `Seq2SeqTrainer.evaluate()` and `Seq2SeqTrainer.predict()`.
+
+        With `generation_streaming_eval=True`, the generated tokens are decoded and fed to `compute_metrics` on a
+        background thread, and the predictions are put back in the order of the dataset at the end.
+        """
+        compute_metrics = self.compute_metrics
+        streaming = (
+            self.args.predict_with_generate
+            and self.args.generation_streaming_eval
+            and self.args.batch_eval_metrics
+            and compute_metrics is not None
+        )
+        if streaming:
+            tokenizer = getattr(self.processing_class, "tokenizer", self.processing_class)
+            pad_token_id = getattr(tokenizer, "pad_token_id", None)
+            if pad_token_id is None:
+                pad_token_id = getattr(tokenizer, "eos_token_id", None)
+            if pad_token_id is None:
+                pad_token_id = self.model.config.pad_token_id
+            self.compute_metrics = _BackgroundGenerationMetrics(
+                compute_metrics, tokenizer=tokenizer, pad_token_id=pad_token_id
+            )
+        try:
+            output = super().evaluation_loop(
+                dataloader,
+                description,
+                prediction_loss_only=prediction_loss_only,
+                ignore_keys=ignore_keys,
+                metric_key_prefix=metric_key_prefix,
+            )
+        finally:
+            if streaming:
+                self.compute_metrics.close()
+                self.compute_metrics = compute_metrics
+
+        # Look for a length-sorted sampler through the (possibly sharded) batch sampler of the dataloader
+        sampler = getattr(dataloader, "batch_sampler", None)
+        while sampler is not None and not isinstance(sampler, LengthSortedSampler):
+            sampler = getattr(sampler, "sampler", getattr(sampler, "batch_sampler", None))
+        if sampler is None:
+            return output
+
+        reverse_indices = np.argsort(sampler.indices)
+        num_samples = len(reverse_indices)
+
+        def _restore_order(array):
+            if isinstance(array, tuple):
+                return tuple(_restore_order(a) for a in array)
+            if not isinstance(array, np.ndarray) or array.ndim == 0:
+                return array
+            if len(array) % num_samples != 0:
+                logger.warning(
+                    f"Got {len(array)} predictions for {num_samples} samples sorted by length, they are returned in "
+                    "the order they were generated in."
+                )
+                return array
+            # With `num_return_sequences > 1`, the sequences generated for a sample are consecutive
+            array = array.reshape(num_samples, -1, *array.shape[1:])[reverse_indices]
+            return array.reshape(-1, *array.shape[2:])
+
+        return EvalLoopOutput(
+            predictions=_restore_order(output.predictions),
+            label_ids=_restore_order(output.label_ids),
+            metrics=output.metrics,
+            num_samples=output.num_samples,
+        )
+
     def prediction_step(
         self,
         model: nn.Module,
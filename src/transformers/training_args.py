@@ -381,11 +381,33 @@ class TrainingArguments:
 
             This should not be activated when the different nodes use the same storage as the files will be saved with
             the same names for each node.
+        save_shards_on_each_process (`bool`, *optional*, defaults to `False`):
+            When doing distributed training where each process holds the full model (e.g. DDP), whether to split the
+            writing of the model checkpoint shards between all processes instead of having the main process write all
+            of them. All processes need to share the same storage. Ignored with DeepSpeed, FSDP, TPUs, SageMaker Model
+            Parallel and `save_async`, and can't be used with `save_on_each_node`.
+        checkpoint_shard_workers (`int`, *optional*, defaults to 1):
+            The number of threads used by each process to write the model checkpoint shards when saving, and to read
+            them when resuming from a sharded checkpoint or loading the best model. Each thread holds a shard in CPU
+            memory.
         save_only_model (`bool`, *optional*, defaults to `False`):
             When checkpointing, whether to only save the model, or also the optimizer, scheduler & rng state.
             Note that when this is true, you won't be able to resume training from checkpoint.
             This enables you to save storage by not storing the optimizer, scheduler & rng state.
             You can only load the model using `from_pretrained` with this option set to `True`.
+        save_async (`bool`, *optional*, defaults to `False`):
+            Whether to write checkpoints in a background thread. The model, optimizer, scheduler and Trainer states are
+            snapshotted in (pinned) CPU memory and training resumes right away, while the files are written to a
+            staging directory that is renamed to `checkpoint-xxx` once complete. At most one checkpoint is written at a
+            time. Not supported with DeepSpeed, FSDP, TPUs, SageMaker Model Parallel or `push_to_hub`, in which case
+            checkpoints are saved synchronously.
+        save_delta_checkpoints (`bool`, *optional*, defaults to `False`):
+            Whether checkpoints should only store the model tensors that differ from the weights the training started
+            from: trainable parameters and frozen tensors modified in place (detected by comparing content hashes).
+            Resuming from such a checkpoint (or loading it as the best model) overlays it on the current weights of the
+            model, which must be the same base weights, as verified with the hashes stored in the checkpoint. Models
+            saved with [`~Trainer.save_model`] are always complete. Not supported with DeepSpeed, FSDP, TPUs,
+            SageMaker Model Parallel or `push_to_hub`, and has no effect on PEFT models which only save their adapters.
         restore_callback_states_from_checkpoint (`bool`, *optional*, defaults to `False`):
             Whether to restore the callback states from the checkpoint. If `True`, will override
             callbacks passed to the `Trainer` if they exist in the checkpoint."
@@ -637,8 +659,18 @@ class TrainingArguments:
             padding applied and be more efficient). Only useful if applying dynamic padding.
         length_column_name (`str`, *optional*, defaults to `"length"`):
             Column name for precomputed lengths. If the column exists, grouping by length will use these values rather
-            than computing them on train startup. Ignored unless `group_by_length` is `True` and the dataset is an
-            instance of `Dataset`.
+            than computing them on train startup. Ignored unless `group_by_length` is `True`, or `packing_max_tokens` or
+            `max_tokens_per_batch` is set, and the dataset is an instance of `Dataset`.
+        packing_max_tokens (`int`, *optional*):
+            If set, the examples of the training dataset are packed offline into examples of at most this many tokens
+            with first-fit-decreasing bin packing (see [`~trainer_pt_utils.PackedDataset`]), and batched with
+            [`DataCollatorWithFlattening`]. The boundaries of the packed sequences are kept in the `position_ids`, so
+            this requires a model whose attention supports padding-free batches (e.g. with flash attention).
+        max_tokens_per_batch (`int`, *optional*):
+            If set, the training batches have a dynamic number of examples so that each padded batch holds at most this
+            many tokens (see [`~trainer_pt_utils.TokenBudgetBatchSampler`]), and `per_device_train_batch_size` is
+            ignored. Examples of similar lengths are batched together, and the loss is still normalized by the number
+            of label tokens of each optimization step (across processes too if `average_tokens_across_devices=True`).
         report_to (`str` or `List[str]`, *optional*, defaults to `"all"`):
             The list of integrations to report the results and logs to. Supported platforms are `"azure_ml"`,
             `"clearml"`, `"codecarbon"`, `"comet_ml"`, `"dagshub"`, `"dvclive"`, `"flyte"`, `"mlflow"`, `"neptune"`,
@@ -661,6 +693,13 @@ class TrainingArguments:
         dataloader_prefetch_factor (`int`, *optional*):
             Number of batches loaded in advance by each worker.
             2 means there will be a total of 2 * num_workers batches prefetched across all workers.
+        dataloader_prefetch_batches (`int`, *optional*, defaults to 0):
+            Number of training batches read ahead of the current step. On GPUs, they are copied to the device by a
+            background thread on a separate CUDA stream, so that the host-to-device copies are overlapped with the
+            computation of the current step. The batches are still loaded and collated by the main thread, in order,
+            and their `num_items_in_batch` is computed by [`Trainer.get_batch_samples`] once they are on the device.
+            On other devices, the batches are only read ahead, without any background work. Useful for small or fast
+            models whose steps are shorter than the copies of a batch. 0 disables it. Not supported on TPUs.
         skip_memory_metrics (`bool`, *optional*, defaults to `True`):
             Whether to skip adding of memory profiler reports to metrics. This is skipped by default because it slows
             down the training and evaluation speed.
@@ -715,6 +754,16 @@ class TrainingArguments:
             If True, use gradient checkpointing to save memory at the expense of slower backward pass.
         gradient_checkpointing_kwargs (`dict`, *optional*, defaults to `None`):
             Key word arguments to be passed to the `gradient_checkpointing_enable` method.
+        activation_offloading (`bool`, *optional*, defaults to `False`):
+            If True, offload the activations of the layers to pinned CPU memory during the forward pass and prefetch
+            them back during the backward pass, instead of recomputing them as with `gradient_checkpointing`. Works
+            for all models supporting gradient checkpointing. Can't be combined with `gradient_checkpointing`.
+        activation_offloading_policy (`str` or `List[str]`, *optional*, defaults to `"offload"`):
+            The policy of each layer when `activation_offloading` is enabled: `"offload"` its activations to the CPU,
+            `"recompute"` them as with gradient checkpointing (with `gradient_checkpointing_kwargs`) or `"keep"` them
+            on the device. A single policy applies to all layers. A (comma-separated) list gives the policy of each
+            layer in the order they are run, its last policy applying to the remaining layers, e.g.
+            `"keep,offload"` keeps the activations of the first layer and offloads all the others.
         include_inputs_for_metrics (`bool`, *optional*, defaults to `False`):
             This argument is deprecated. Use `include_for_metrics` instead, e.g, `include_for_metrics = ["inputs"]`.
         include_for_metrics (`List[str]`, *optional*, defaults to `[]`):
@@ -725,6 +774,13 @@ class TrainingArguments:
         eval_do_concat_batches (`bool`, *optional*, defaults to `True`):
             Whether to recursively concat inputs/losses/labels/predictions across batches. If `False`,
             will instead store them as lists, with each batch kept separate.
+        eval_memmap_dir (`str`, *optional*):
+            If set, the inputs/losses/labels/predictions gathered during evaluation and prediction are written to
+            `.npy` files in this directory as they are produced (every `eval_accumulation_steps` steps, or at every
+            step if it is not set) instead of being kept in host memory, and are returned as lazily-loaded `np.memmap`.
+            Use it when the predictions of the whole dataset do not fit in RAM. The files of one evaluation are stored
+            in a subfolder named after the metric key prefix and are overwritten by the next evaluation using the same
+            prefix.
         auto_find_batch_size (`bool`, *optional*, defaults to `False`)
             Whether to find a batch size that will fit into memory automatically through exponential decay, avoiding
             CUDA Out-of-Memory errors. Requires accelerate to be installed (`pip install accelerate`)
@@ -789,6 +845,15 @@ class TrainingArguments:
 
             May be slower in distributed training as gather operations must be called.
 
+        sync_free_training (`bool`, *optional*, defaults to `False`):
+            Whether to avoid the synchronizations between the host and the accelerator at each training step. The
+            statistics of each step (the filtering of `nan`/`inf` losses, the number of input tokens seen, the gradient
+            norm and the number of items in the batch passed to the loss) are then kept as device tensors and only read
+            on the host when logging, evaluating or saving, which lets the CPU queue the next steps while the
+            accelerator is still working. Note that `num_items_in_batch` is then passed to the loss function as a
+            tensor, and that `state.num_input_tokens_seen` is only updated at those boundaries. The loss scaler used for
+            `fp16` mixed precision still requires one synchronization per optimizer step.
+
         neftune_noise_alpha (`Optional[float]`):
             If not `None`, this will activate NEFTune noise embeddings. This can drastically improve model performance
             for instruction fine-tuning. Check out the [original paper](https://arxiv.org/abs/2310.05914) and the
@@ -1020,6 +1085,19 @@ class TrainingArguments:
             )
         },
     )
+    save_shards_on_each_process: bool = field(
+        default=False,
+        metadata={
+            "help": (
+                "When doing distributed training where each process holds the full model, whether to split the "
+                "writing of the model checkpoint shards between all processes instead of the main one only."
+            )
+        },
+    )
+    checkpoint_shard_workers: int = field(
+        default=1,
+        metadata={"help": "The number of threads used to write and read the model checkpoint shards."},
+    )
     save_only_model: bool = field(
         default=False,
         metadata={
@@ -1031,6 +1109,24 @@ class TrainingArguments:
             )
         },
     )
+    save_async: bool = field(
+        default=False,
+        metadata={
+            "help": (
+                "Whether to snapshot the training state in CPU memory and write checkpoints in a background thread, "
+                "without blocking training."
+            )
+        },
+    )
+    save_delta_checkpoints: bool = field(
+        default=False,
+        metadata={
+            "help": (
+                "Whether checkpoints should only store the model tensors that differ from the weights the training "
+                "started from."
+            )
+        },
+    )
     restore_callback_states_from_checkpoint: bool = field(
         default=False,
         metadata={
@@ -1180,6 +1276,12 @@ class TrainingArguments:
             )
         },
     )
+    dataloader_prefetch_batches: int = field(
+        default=0,
+        metadata={
+            "help": "Number of training batches read ahead of the current step and copied to the GPU on a background thread, overlapping the host-to-device copies with the computation. 0 disables it."
+        },
+    )
     past_index: int = field(
         default=-1,
         metadata={"help": "If >=0, uses the corresponding part of the output as the past state for next step."},
@@ -1316,6 +1418,24 @@ class TrainingArguments:
         default="length",
         metadata={"help": "Column name with precomputed lengths to use when grouping by length."},
     )
+    packing_max_tokens: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": (
+                "If set, pack the examples of the training dataset into examples of at most this many tokens with "
+                "first-fit-decreasing bin packing."
+            )
+        },
+    )
+    max_tokens_per_batch: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": (
+                "If set, build training batches with a dynamic number of examples holding at most this many tokens "
+                "once padded. Overrides `per_device_train_batch_size`."
+            )
+        },
+    )
     report_to: Union[None, str, List[str]] = field(
         default=None, metadata={"help": "The list of integrations to report the results and logs to."}
     )
@@ -1398,6 +1518,26 @@ class TrainingArguments:
             "help": "Gradient checkpointing key word arguments such as `use_reentrant`. Will be passed to `torch.utils.checkpoint.checkpoint` through `model.gradient_checkpointing_enable`."
         },
     )
+    activation_offloading: bool = field(
+        default=False,
+        metadata={
+            "help": (
+                "If True, offload the activations of the layers to pinned CPU memory during the forward pass and "
+                "prefetch them back during the backward pass, instead of recomputing them as with gradient "
+                "checkpointing."
+            )
+        },
+    )
+    activation_offloading_policy: Union[str, List[str]] = field(
+        default="offload",
+        metadata={
+            "help": (
+                "The activation offloading policy (`offload`, `recompute` or `keep`) of all layers, or a "
+                "comma-separated list of the policies of each layer in the order they are run, the last one applying "
+                "to the remaining layers."
+            )
+        },
+    )
     include_inputs_for_metrics: bool = field(
         default=False,
         metadata={
@@ -1417,6 +1557,12 @@ class TrainingArguments:
             "help": "Whether to recursively concat inputs/losses/labels/predictions across batches. If `False`, will instead store them as lists, with each batch kept separate."
         },
     )
+    eval_memmap_dir: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": "If set, the inputs/losses/labels/predictions gathered during evaluation are written to memory-mapped files in this directory instead of being kept in host memory."
+        },
+    )
     # Deprecated arguments
     fp16_backend: str = field(
         default="auto",
@@ -1524,6 +1670,12 @@ class TrainingArguments:
             "help": "If set to `True`, will track the number of input tokens seen throughout training. (May be slower in distributed training)"
         },
     )
+    sync_free_training: bool = field(
+        default=False,
+        metadata={
+            "help": "Whether to keep per-step statistics as device tensors and only read them on the host when logging, evaluating or saving, to avoid host-accelerator synchronizations at each training step."
+        },
+    )
 
     neftune_noise_alpha: Optional[float] = field(
         default=None,
@@ -1698,6 +1850,14 @@ class TrainingArguments:
                     f"steps, but found {self.save_steps}, which is not a round multiple of {self.eval_steps}."
                 )
 
+        if self.checkpoint_shard_workers < 1:
+            raise ValueError(f"--checkpoint_shard_workers must be at least 1, got {self.checkpoint_shard_workers}.")
+        if self.save_shards_on_each_process and self.save_on_each_node:
+            raise ValueError(
+                "--save_shards_on_each_process requires all processes to share the same storage and can't be used "
+                "with --save_on_each_node."
+            )
+
         safetensors_available = is_safetensors_available()
         if self.save_safetensors and not safetensors_available:
             raise ValueError(f"--save_safetensors={self.save_safetensors} requires safetensors to be installed!")
@@ -1920,6 +2080,23 @@ class TrainingArguments:
         elif FSDPOption.FULL_SHARD in self.fsdp and FSDPOption.SHARD_GRAD_OP in self.fsdp:
             raise ValueError("`--fsdp full_shard` is not compatible with `--fsdp shard_grad_op`.")
 
+        if isinstance(self.activation_offloading_policy, str):
+            self.activation_offloading_policy = [self.activation_offloading_policy]
+        self.activation_offloading_policy = [
+            policy.strip() for policies in self.activation_offloading_policy for policy in policies.split(",")
+        ]
+        if self.activation_offloading:
+            if self.gradient_checkpointing:
+                raise ValueError(
+                    "`activation_offloading` can't be combined with `gradient_checkpointing`, use the `recompute` "
+                    "policy in `activation_offloading_policy` to checkpoint some of the layers instead."
+                )
+            for policy in self.activation_offloading_policy:
+                if policy not in ("offload", "recompute", "keep"):
+                    raise ValueError(
+                        f"Unknown activation offloading policy {policy}, should be one of offload, recompute or keep."
+                    )
+
         if self.gradient_checkpointing and (
             FSDPOption.FULL_SHARD in self.fsdp or FSDPOption.HYBRID_SHARD in self.fsdp
         ):
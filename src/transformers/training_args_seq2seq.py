@@ -46,6 +46,17 @@ class Seq2SeqTrainingArguments(TrainingArguments):
             - a path to a *directory* containing a configuration file saved using the
               [`~GenerationConfig.save_pretrained`] method, e.g., `./my_model_directory/`.
             - a [`~generation.GenerationConfig`] object.
+        generation_batch_size (`int`, *optional*):
+            The batch size per device to use on each evaluation loop when `predict_with_generate=True`. Generation is
+            usually much more memory hungry than the forward pass, so this allows to decouple it from
+            `per_device_eval_batch_size`. Will default to `per_device_eval_batch_size`.
+        generation_streaming_eval (`bool`, *optional*, defaults to `False`):
+            Whether to stream the evaluation loop when `predict_with_generate=True`. The evaluation examples are
+            sorted by input length (longest first) to minimize padding, each batch of generated tokens is decoded with
+            the processing class on a background thread while the next batch is generated, and the decoded texts are
+            fed to `compute_metrics` batch by batch, as with `batch_eval_metrics` (which this option turns on).
+            `compute_metrics` thus receives lists of strings and has to accept the `compute_result` argument.
+            Predictions returned by `predict` are put back in the order of the dataset.
     """
 
     sortish_sampler: bool = field(default=False, metadata={"help": "Whether to use SortishSampler or not."})
@@ -76,6 +87,41 @@ class Seq2SeqTrainingArguments(TrainingArguments):
             "help": "Model id, file path or url pointing to a GenerationConfig json file, to use during prediction."
         },
     )
+    generation_batch_size: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": (
+                "The batch size per device to use on each evaluation loop when `predict_with_generate=True`. Will "
+                "default to `per_device_eval_batch_size`."
+            )
+        },
+    )
+    generation_streaming_eval: bool = field(
+        default=False,
+        metadata={
+            "help": (
+                "Whether to sort the evaluation examples by length, decode the generated tokens on a background "
+                "thread and feed them to `compute_metrics` batch by batch when `predict_with_generate=True`."
+            )
+        },
+    )
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.generation_batch_size is not None and self.generation_batch_size <= 0:
+            raise ValueError(f"`generation_batch_size` must be a positive integer, got {self.generation_batch_size}.")
+        if self.generation_streaming_eval and self.predict_with_generate and not self.batch_eval_metrics:
+            # Metrics are computed incrementally, as each batch gets decoded
+            self.batch_eval_metrics = True
+
+    @property
+    def eval_batch_size(self) -> int:
+        """
+        The actual batch size for evaluation, which is `generation_batch_size` when `predict_with_generate=True`.
+        """
+        if self.predict_with_generate and self.generation_batch_size is not None:
+            return self.generation_batch_size * max(1, self.n_gpu)
+        return super().eval_batch_size
 
     def to_dict(self):
         """
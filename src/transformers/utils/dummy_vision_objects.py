@@ -16,6 +16,13 @@ class BaseImageProcessor(metaclass=DummyObject):
         requires_backends(self, ["vision"])
 
 
+class PreprocessingCache(metaclass=DummyObject):
+    _backends = ["vision"]
+
+    def __init__(self, *args, **kwargs):
+        requires_backends(self, ["vision"])
+
+
 class ImageFeatureExtractionMixin(metaclass=DummyObject):
     _backends = ["vision"]
 
@@ -14,6 +14,7 @@
 # limitations under the License.
 """Testing suite for the PyTorch LLaMA model."""
 
+import tempfile
 import unittest
 
 from packaging import version
@@ -384,6 +385,55 @@ class LlamaModelTest(ModelTesterMixin, GenerationTesterMixin, PipelineTesterMixi
             (self.model_tester.batch_size, self.model_tester.seq_length, self.model_tester.num_labels),
         )
 
+    def test_llama_chunked_causal_lm_loss(self):
+        config, input_dict = self.model_tester.prepare_config_and_inputs_for_common()
+        input_ids = input_dict["input_ids"]
+        labels = input_ids.clone()
+        labels[0, :3] = -100
+        model = LlamaForCausalLM(config=config).to(torch_device)
+        config.loss_type = "ForCausalLMChunked"
+        chunked_model = LlamaForCausalLM(config=config).to(torch_device)
+        chunked_model.load_state_dict(model.state_dict())
+        self.assertEqual(chunked_model.loss_type, "ForCausalLMChunked")
+
+        for kwargs in [{}, {"num_items_in_batch": 11}]:
+            model.zero_grad()
+            chunked_model.zero_grad()
+            result = model(input_ids, labels=labels, **kwargs)
+            chunked_result = chunked_model(input_ids, labels=labels, **kwargs)
+            # The logits are never materialized
+            self.assertIsNone(chunked_result.logits)
+            torch.testing.assert_close(chunked_result.loss, result.loss)
+
+            result.loss.backward()
+            chunked_result.loss.backward()
+            for param, chunked_param in zip(model.parameters(), chunked_model.parameters()):
+                torch.testing.assert_close(chunked_param.grad, param.grad)
+
+        # Without labels, the logits are computed as usual
+        self.assertIsNotNone(chunked_model(input_ids).logits)
+
+        # In evaluation, the logits are computed to be used as predictions
+        with torch.no_grad():
+            chunked_result = chunked_model(input_ids, labels=labels)
+        self.assertIsNotNone(chunked_result.logits)
+        torch.testing.assert_close(chunked_result.loss, model(input_ids, labels=labels).loss)
+        chunked_model.eval()
+        self.assertIsNotNone(chunked_model(input_ids, labels=labels).logits)
+
+    def test_llama_chunked_loss_type_of_other_heads(self):
+        config, input_dict = self.model_tester.prepare_config_and_inputs_for_common()
+        config.loss_type = "ForCausalLMChunked"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            LlamaForCausalLM(config).save_pretrained(tmp_dir)
+            model = LlamaForSequenceClassification.from_pretrained(tmp_dir).to(torch_device)
+
+        # The chunked causal LM loss is only used by the causal LM head
+        self.assertEqual(model.loss_type, "ForSequenceClassification")
+        labels = ids_tensor([self.model_tester.batch_size], self.model_tester.type_sequence_label_size)
+        result = model(input_dict["input_ids"], attention_mask=input_dict["attention_mask"], labels=labels)
+        self.assertEqual(result.loss.shape, ())
+
     @unittest.skip(reason="Llama buffers include complex numbers, which breaks this test")
     def test_save_load_fast_init_from_base(self):
         pass
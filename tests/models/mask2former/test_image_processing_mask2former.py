@@ -32,7 +32,10 @@ if is_torch_available():
 
     if is_vision_available():
         from transformers import Mask2FormerImageProcessor
-        from transformers.models.mask2former.image_processing_mask2former import binary_mask_to_rle
+        from transformers.models.mask2former.image_processing_mask2former import (
+            binary_mask_to_rle,
+            convert_segmentation_to_rle,
+        )
         from transformers.models.mask2former.modeling_mask2former import Mask2FormerForUniversalSegmentationOutput
 
 if is_vision_available():
@@ -463,6 +466,17 @@ class Mask2FormerImageProcessingTest(ImageProcessingTestMixin, unittest.TestCase
         self.assertEqual(rle[0], 21)
         self.assertEqual(rle[1], 45)
 
+    def test_convert_segmentation_to_rle(self):
+        segmentation = torch.randint(-1, 4, (20, 50), dtype=torch.int32)
+        segmentation[3:8] = 2
+
+        rles = convert_segmentation_to_rle(segmentation)
+        segment_ids = torch.unique(segmentation)
+        self.assertEqual(len(rles), len(segment_ids))
+        for segment_id, rle in zip(segment_ids, rles):
+            expected_rle = binary_mask_to_rle(torch.where(segmentation == segment_id, 1, 0))
+            self.assertEqual(rle, expected_rle)
+
     def test_post_process_semantic_segmentation(self):
         fature_extractor = self.image_processing_class(num_labels=self.image_processor_tester.num_classes)
         outputs = self.image_processor_tester.get_fake_mask2former_outputs()
@@ -501,6 +515,27 @@ class Mask2FormerImageProcessingTest(ImageProcessingTestMixin, unittest.TestCase
             self.assertEqual(len(el["segmentation"].shape), 3)
             self.assertEqual(el["segmentation"].shape[1:], (384, 384))
 
+    def test_post_process_instance_segmentation_overlapping_instances(self):
+        image_processor = self.image_processing_class(num_labels=self.image_processor_tester.num_classes)
+        outputs = self.image_processor_tester.get_fake_mask2former_outputs()
+        target_sizes = [(50, 60)] * self.image_processor_tester.batch_size
+
+        segmentation = image_processor.post_process_instance_segmentation(
+            outputs, threshold=0, target_sizes=target_sizes
+        )
+        binary_maps = image_processor.post_process_instance_segmentation(
+            outputs, threshold=0, target_sizes=target_sizes, return_binary_maps=True
+        )
+
+        for el, el_binary_maps in zip(segmentation, binary_maps):
+            self.assertEqual(el["segments_info"], el_binary_maps["segments_info"])
+            self.assertEqual([segment["id"] for segment in el["segments_info"]], list(range(len(el["segments_info"]))))
+            # Where instances overlap, the pixel belongs to the last one
+            expected_segmentation = torch.zeros((50, 60)) - 1
+            for segment_id, instance_map in enumerate(el_binary_maps["segmentation"]):
+                expected_segmentation[instance_map == 1] = segment_id
+            torch.testing.assert_close(el["segmentation"], expected_segmentation)
+
     def test_post_process_panoptic_segmentation(self):
         image_processing = self.image_processing_class(num_labels=self.image_processor_tester.num_classes)
         outputs = self.image_processor_tester.get_fake_mask2former_outputs()
@@ -273,6 +273,21 @@ class Qwen2VLImageProcessingTest(ImageProcessingTestMixin, unittest.TestCase):
             self.assertTrue((encoded_images_nested == encoded_images).all())
             self.assertTrue((image_grid_thws_nested == expected_image_grid_thws).all())
 
+    def test_mixed_resolution_batch(self):
+        for image_processing_class in self.image_processor_list:
+            image_processing = image_processing_class(**self.image_processor_dict)
+            image_inputs = self.image_processor_tester.prepare_image_inputs(equal_resolution=False, torchify=True)
+
+            # The patches of images of different sizes are concatenated in order, without padding
+            process_out = image_processing(image_inputs, return_tensors="pt")
+            for image, image_grid_thw in zip(image_inputs, process_out.image_grid_thw):
+                expected = image_processing(image, return_tensors="pt")
+                self.assertTrue((image_grid_thw == expected.image_grid_thw[0]).all())
+            expected_pixel_values = torch.cat(
+                [image_processing(image, return_tensors="pt").pixel_values for image in image_inputs]
+            )
+            torch.testing.assert_close(process_out.pixel_values, expected_pixel_values, rtol=0, atol=0)
+
     def test_video_inputs(self):
         for image_processing_class in self.image_processor_list:
             image_processing = image_processing_class(**self.image_processor_dict)
@@ -204,6 +204,20 @@ class Wav2Vec2FeatureExtractionTest(SequenceFeatureExtractionTestMixin, unittest
         # make sure that if max_length > longest -> then pad to longest
         self.assertTrue(input_values.shape == (3, 1200))
 
+    def test_streaming(self):
+        feat_extract = self.feature_extraction_class(**self.feat_extract_tester.prepare_feat_extract_dict())
+        speech_input = np.asarray(floats_list((1, 1200))[0], dtype=np.float32)
+        chunks = np.array_split(speech_input, [1, 400, 900])
+
+        stream = feat_extract.create_stream()
+        input_values = [stream(chunk).input_values for chunk in chunks]
+        self.assertEqual([values.shape for values in input_values], [(1, len(chunk)) for chunk in chunks])
+
+        # The last chunk is normalized with the statistics of the whole audio
+        expected_values = feat_extract(speech_input, return_tensors="np").input_values
+        self.assertTrue(np.allclose(input_values[-1], expected_values[:, -len(chunks[-1]) :], atol=1e-4))
+        self.assertEqual(stream.flush().input_values.shape, (1, 0))
+
     @require_torch
     def test_double_precision_pad(self):
         import torch
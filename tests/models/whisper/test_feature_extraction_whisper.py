@@ -234,6 +234,32 @@ class WhisperFeatureExtractionTest(SequenceFeatureExtractionTestMixin, unittest.
         self.assertTrue(np.abs(diff).mean() <= 1e-4)
         self.assertTrue(np.abs(diff).max() <= 5e-3)
 
+    def test_streaming(self):
+        feature_extractor = self.feature_extraction_class(**self.feat_extract_tester.prepare_feat_extract_dict())
+        speech_input = np.asarray(floats_list((1, 4321))[0], dtype=np.float32)
+        # The log-mel values are clamped relatively to the running maximum: make it reached by the first frames
+        speech_input[:1600] *= 4.0
+        expected_features = feature_extractor(
+            speech_input, padding="longest", return_tensors="np", sampling_rate=feature_extractor.sampling_rate
+        ).input_features
+
+        stream = feature_extractor.create_stream()
+        features = []
+        for chunk in np.array_split(speech_input, [7, 2000, 2001, 3000]):
+            features.append(stream(chunk, sampling_rate=feature_extractor.sampling_rate).input_features)
+            # Only the frames fully covered by the audio received so far are returned
+            num_frames = sum(feature.shape[-1] for feature in features)
+            self.assertLessEqual(num_frames, stream.num_samples // feature_extractor.hop_length)
+        features.append(stream.flush().input_features)
+        features = np.concatenate(features, axis=-1)
+
+        self.assertEqual(features.shape, expected_features.shape)
+        self.assertTrue(np.allclose(features, expected_features, atol=1e-4))
+
+        # The stream can be reused after being flushed
+        self.assertEqual(stream.num_samples, 0)
+        self.assertEqual(stream(speech_input[:5]).input_features.shape, (1, feature_extractor.feature_size, 0))
+
     @require_torch
     def test_double_precision_pad(self):
         import torch
@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import os
+import tempfile
 import time
 import unittest
 
@@ -29,12 +32,27 @@ from transformers import (
     AutoProcessor,
     AutoTokenizer,
     Speech2TextForConditionalGeneration,
+    Wav2Vec2Config,
+    Wav2Vec2CTCTokenizer,
+    Wav2Vec2FeatureExtractor,
     Wav2Vec2ForCTC,
+    WhisperConfig,
+    WhisperFeatureExtractor,
     WhisperForConditionalGeneration,
+    WhisperTokenizer,
 )
+from transformers.audio_utils import voice_activity_segments
+from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
 from transformers.pipelines import AutomaticSpeechRecognitionPipeline, pipeline
 from transformers.pipelines.audio_utils import chunk_bytes_iter, ffmpeg_microphone_live
-from transformers.pipelines.automatic_speech_recognition import _find_timestamp_sequence, chunk_iter
+from transformers.pipelines.automatic_speech_recognition import (
+    _fast_find_longest_common_sequence,
+    _find_longest_common_sequence,
+    _find_timestamp_sequence,
+    _shift_timestamps,
+    chunk_batch_iter,
+    chunk_iter,
+)
 from transformers.testing_utils import (
     compare_pipeline_output_to_hub_spec,
     is_pipeline_test,
@@ -1883,6 +1901,211 @@ class AutomaticSpeechRecognitionPipelineTests(unittest.TestCase):
         # (85, 100)
         self.assertEqual(nested_simplify(input_values[:, 80:100]), nested_simplify(outs[4]["input_values"]))
 
+    @require_torch
+    def test_chunk_batch_iterator(self):
+        feature_extractor = Wav2Vec2FeatureExtractor()
+        inputs = np.random.default_rng(0).standard_normal(100).astype(np.float32)
+        expected = list(chunk_iter(inputs, feature_extractor, 30, 5, 5))
+
+        for batch_size, expected_num_chunks in [(1, [1, 1, 1, 1, 1]), (2, [2, 2, 1]), (5, [4, 1]), (10, [4, 1])]:
+            outs = list(chunk_batch_iter(inputs, feature_extractor, 30, 5, 5, batch_size))
+            # The last chunk is shorter than the others, it is never batched with them
+            self.assertEqual([o["num_chunks"] for o in outs], expected_num_chunks)
+            self.assertEqual([o["is_last"] for o in outs], [False] * (len(outs) - 1) + [True])
+            self.assertEqual(sum((o["stride"] for o in outs), []), [o["stride"] for o in expected])
+            input_values = torch.cat([o["input_values"][i : i + 1] for o in outs[:-1] for i in range(o["num_chunks"])])
+            expected_values = torch.cat([o["input_values"] for o in expected[:-1]])
+            torch.testing.assert_close(input_values, expected_values)
+            torch.testing.assert_close(outs[-1]["input_values"], expected[-1]["input_values"])
+
+    def test_find_longest_common_sequence_merge(self):
+        class DummyTokenizer:
+            all_special_ids = [0]
+
+        # The best overlap of the next sequence with the end of the merged sequence is skipped
+        sequences = [np.array([[0, 5, 6, 7, 8, 9, 0]]), np.array([[7, 8, 9, 10, 11]]), np.array([[11, 12, 0]])]
+        self.assertEqual(
+            _find_longest_common_sequence(sequences, DummyTokenizer()).tolist(), [5, 6, 7, 8, 9, 10, 11, 11, 12]
+        )
+
+        # Overlaps with a single matching token are ignored, as well as imperfect shorter overlaps
+        sequences = [np.array([[1, 2, 3, 4]]), np.array([[2, 9, 4, 5]])]
+        self.assertEqual(_find_longest_common_sequence(sequences, DummyTokenizer()).tolist(), [1, 2, 3, 4, 5])
+
+        self.assertEqual(_fast_find_longest_common_sequence([1, 2, 3, 4, 2, 3], [5, 2, 3, 4]), (1, 1, 3))
+        self.assertEqual(_fast_find_longest_common_sequence([1, 2], [3, 4]), (-1, -1, 0))
+        self.assertEqual(_fast_find_longest_common_sequence([], [3, 4]), (-1, -1, 0))
+
+    def get_tiny_ctc_pipeline(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vocab = ["<pad>", "<s>", "</s>", "<unk>", "|"] + list("ABCDEFGHIJKLMNOPQRSTUVWXYZ'")
+            vocab_file = os.path.join(tmp_dir, "vocab.json")
+            with open(vocab_file, "w") as f:
+                json.dump({token: idx for idx, token in enumerate(vocab)}, f)
+            tokenizer = Wav2Vec2CTCTokenizer(vocab_file)
+
+        torch.manual_seed(0)
+        config = Wav2Vec2Config(
+            vocab_size=len(vocab),
+            hidden_size=16,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            intermediate_size=20,
+            conv_dim=(16, 16, 16),
+            conv_stride=(4, 4, 4),
+            conv_kernel=(8, 8, 8),
+            num_conv_pos_embeddings=16,
+            num_conv_pos_embedding_groups=2,
+        )
+        return pipeline(
+            task="automatic-speech-recognition",
+            model=Wav2Vec2ForCTC(config).eval(),
+            tokenizer=tokenizer,
+            feature_extractor=Wav2Vec2FeatureExtractor(),
+        )
+
+    @require_torch
+    def test_chunking_batches_chunks_of_single_audio(self):
+        speech_recognizer = self.get_tiny_ctc_pipeline()
+        audio = np.random.default_rng(0).standard_normal(16_000 * 5).astype(np.float32)
+
+        expected = speech_recognizer(audio, chunk_length_s=1, stride_length_s=0.2, return_timestamps="char")
+        for kwargs in [{"chunk_batch_size": 3}, {"chunk_batch_size": 16}]:
+            output = speech_recognizer(
+                audio, chunk_length_s=1, stride_length_s=0.2, return_timestamps="char", **kwargs
+            )
+            self.assertEqual(output, expected)
+
+    @require_torch
+    def test_voice_activity_detection(self):
+        speech_recognizer = self.get_tiny_ctc_pipeline()
+        rng = np.random.default_rng(0)
+        audio = np.concatenate(
+            [
+                np.zeros(16_000),
+                rng.standard_normal(16_000),
+                np.zeros(32_000),
+                rng.standard_normal(8_000),
+                np.zeros(16_000),
+            ]
+        )
+        audio = (0.3 * audio).astype(np.float32)
+        segments = voice_activity_segments(audio, 16_000)
+        self.assertEqual(len(segments), 2)
+
+        output = speech_recognizer(audio, voice_activity_detection=True, return_timestamps="char")
+        segment_outputs = [speech_recognizer(audio[start:end]) for start, end in segments]
+        self.assertEqual(output["text"], " ".join(out["text"] for out in segment_outputs))
+        # The timestamps are relative to the original audio, and never fall in the dropped silence
+        for chunk in output["chunks"]:
+            start, end = chunk["timestamp"]
+            self.assertTrue(
+                any(seg_start <= start * 16_000 < end * 16_000 <= seg_end for seg_start, seg_end in segments)
+            )
+        self.assertGreaterEqual(output["chunks"][-1]["timestamp"][0] * 16_000, segments[1][0])
+
+        # The segments are cut to be at most `chunk_length_s` long
+        segments = voice_activity_segments(audio, 16_000, max_segment_length=8_000)
+        self.assertTrue(len(segments) > 2 and all(end - start <= 8_000 for start, end in segments))
+        output = speech_recognizer(audio, voice_activity_detection=True, chunk_length_s=0.5)
+        segment_outputs = [speech_recognizer(audio[start:end]) for start, end in segments]
+        self.assertEqual(output["text"], " ".join(out["text"] for out in segment_outputs))
+
+        # Without any speech, the whole audio is transcribed
+        silence = np.zeros(16_000, dtype=np.float32)
+        self.assertEqual(speech_recognizer(silence, voice_activity_detection=True), speech_recognizer(silence))
+
+        with self.assertRaises(ValueError):
+            speech_recognizer(audio, voice_activity_detection="yes")
+
+    def get_tiny_whisper_pipeline(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vocab = list(bytes_to_unicode().values()) + ["\u0120a", "\u0120b"]
+            vocab_file = os.path.join(tmp_dir, "vocab.json")
+            with open(vocab_file, "w") as f:
+                json.dump({token: idx for idx, token in enumerate(vocab)}, f)
+            merges_file = os.path.join(tmp_dir, "merges.txt")
+            with open(merges_file, "w") as f:
+                f.write("#version: 0.2\n\u0120 a\n\u0120 b\n")
+            tokenizer = WhisperTokenizer(vocab_file, merges_file)
+        tokenizer.add_special_tokens(
+            {"additional_special_tokens": ["<|startoftranscript|>", "<|en|>", "<|transcribe|>", "<|notimestamps|>"]}
+        )
+        tokenizer.add_tokens([f"<|{idx * 0.02:.2f}|>" for idx in range(1501)])
+
+        torch.manual_seed(0)
+        config = WhisperConfig(
+            vocab_size=len(tokenizer),
+            d_model=16,
+            encoder_layers=1,
+            decoder_layers=1,
+            encoder_attention_heads=2,
+            decoder_attention_heads=2,
+            encoder_ffn_dim=16,
+            decoder_ffn_dim=16,
+            max_target_positions=32,
+            decoder_start_token_id=tokenizer.convert_tokens_to_ids("<|startoftranscript|>"),
+            bos_token_id=tokenizer.eos_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.eos_token_id,
+        )
+        return pipeline(
+            task="automatic-speech-recognition",
+            model=WhisperForConditionalGeneration(config).eval(),
+            tokenizer=tokenizer,
+            feature_extractor=WhisperFeatureExtractor(),
+        )
+
+    @require_torch
+    def test_voice_activity_detection_whisper(self):
+        speech_recognizer = self.get_tiny_whisper_pipeline()
+        rng = np.random.default_rng(0)
+        audio = np.concatenate([np.zeros(16_000), rng.standard_normal(16_000), np.zeros(32_000)])
+        audio = (0.3 * np.concatenate([audio, rng.standard_normal(8_000), np.zeros(16_000)])).astype(np.float32)
+        segments = voice_activity_segments(audio, 16_000)
+        self.assertEqual(len(segments), 2)
+
+        output = speech_recognizer(audio, voice_activity_detection=True, generate_kwargs={"max_new_tokens": 5})
+        segment_outputs = [
+            speech_recognizer(audio[start:end], generate_kwargs={"max_new_tokens": 5}) for start, end in segments
+        ]
+        self.assertEqual(output["text"], "".join(out["text"] for out in segment_outputs))
+
+        def model_outputs(*tokens):
+            tokens = torch.tensor([speech_recognizer.tokenizer.convert_tokens_to_ids(list(tokens))])
+            return [
+                {
+                    "is_last": False,
+                    "tokens": tokens,
+                    "stride": (16_000, 0, 0),
+                    "segment_offset": torch.tensor([16_000]),
+                },
+                {"is_last": True, "tokens": tokens, "stride": (8_000, 0, 0), "segment_offset": torch.tensor([64_000])},
+            ]
+
+        # The segments are decoded separately, identical segments are not merged together
+        prefix = ["<|startoftranscript|>", "<|en|>", "<|transcribe|>"]
+        outputs = model_outputs(*prefix, "<|notimestamps|>", "\u0120a", "\u0120b", "<|endoftext|>")
+        self.assertEqual(speech_recognizer.postprocess(outputs), {"text": " a b a b"})
+
+        # The timestamps are relative to the original audio
+        outputs = model_outputs(*prefix, "<|0.00|>", "\u0120a", "\u0120b", "<|0.50|>", "<|endoftext|>")
+        self.assertEqual(
+            speech_recognizer.postprocess(outputs, return_timestamps=True),
+            {
+                "text": " a b a b",
+                "chunks": [{"text": " a b", "timestamp": (1.0, 1.5)}, {"text": " a b", "timestamp": (4.0, 4.5)}],
+            },
+        )
+
+    def test_shift_timestamps(self):
+        chunks = [
+            {"text": " a", "timestamp": (0.0, 0.5)},
+            {"text": " b", "timestamp": (0.5, None)},
+        ]
+        chunks = _shift_timestamps(chunks, 3.0)
+        self.assertEqual([chunk["timestamp"] for chunk in chunks], [(3.0, 3.5), (3.5, None)])
+
     @require_torch
     def test_stride(self):
         speech_recognizer = pipeline(
@@ -41,8 +41,10 @@ if is_vision_available():
         corners_to_center_format,
         flip_channel_order,
         get_resize_output_image_size,
+        group_images_by_shape,
         id_to_rgb,
         normalize,
+        pack_images,
         pad,
         resize,
         rgb_to_id,
@@ -662,3 +664,28 @@ class ImageTransformsTester(unittest.TestCase):
                 flip_channel_order(img_channels_first, input_data_format="channels_first"), flipped_img_channels_first
             )
         )
+
+    @require_torch
+    def test_pack_images(self):
+        images = [torch.rand(3, height, width) for height, width in [(4, 6), (2, 2), (4, 6), (6, 2), (2, 2)]]
+        grouped_images, grouped_images_index = group_images_by_shape(images)
+        # Split each image into patches of 2x2 pixels
+        patches_grouped = {
+            shape: stacked_images.unfold(2, 2, 2).unfold(3, 2, 2).permute(0, 2, 3, 1, 4, 5).flatten(1, 2).flatten(2)
+            for shape, stacked_images in grouped_images.items()
+        }
+        packed, offsets = pack_images(patches_grouped, grouped_images_index)
+
+        self.assertEqual(offsets.tolist(), [0, 6, 7, 13, 16, 17])
+        self.assertEqual(tuple(packed.shape), (17, 12))
+        for i, image in enumerate(images):
+            expected = image.unfold(1, 2, 2).unfold(2, 2, 2).permute(1, 2, 0, 3, 4).flatten(0, 1).flatten(1)
+            self.assertTrue(torch.equal(packed[offsets[i] : offsets[i + 1]], expected))
+
+        # Images of a single size
+        grouped_images, grouped_images_index = group_images_by_shape([images[0], images[2]])
+        packed, offsets = pack_images(
+            {shape: x.flatten(1) for shape, x in grouped_images.items()}, grouped_images_index
+        )
+        self.assertEqual(offsets.tolist(), [0, 72, 144])
+        self.assertTrue(torch.equal(packed, torch.cat([images[0].flatten(), images[2].flatten()])))
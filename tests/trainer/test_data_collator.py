@@ -365,6 +365,76 @@ class DataCollatorIntegrationTest(unittest.TestCase):
         self.assertEqual(batch["input_ids"].shape, torch.Size((2, 10)))
         self.assertEqual(batch["labels"].shape, torch.Size((2, 10)))
 
+    def test_data_collator_for_whole_word_mask_word_spans(self):
+        vocab_tokens = ["[UNK]", "[CLS]", "[SEP]", "[PAD]", "[MASK]", "a", "b", "c", "##x", "##y"]
+        vocab_file = os.path.join(self.tmpdirname, "wwm_vocab.txt")
+        with open(vocab_file, "w", encoding="utf-8") as vocab_writer:
+            vocab_writer.write("".join([x + "\n" for x in vocab_tokens]))
+        tokenizer = BertTokenizer(vocab_file)
+        data_collator = DataCollatorForWholeWordMask(tokenizer, mlm_probability=0.5, return_tensors="pt")
+
+        # [CLS] a ##x ##y b c ##x [SEP] / [CLS] c ##y a [SEP] [PAD] [PAD] [PAD]
+        input_ids = torch.tensor([[1, 5, 8, 9, 6, 7, 8, 2], [1, 7, 9, 5, 2, 3, 3, 3]])
+        chinese_refs = [None, [3]]
+        for _ in range(20):
+            mask = data_collator._torch_whole_word_mask(input_ids, [8, 5], chinese_refs)
+            # Sub-words are always masked together with the word they belong to
+            self.assertTrue(torch.all(mask[0, 1:4] == mask[0, 1]))
+            self.assertTrue(torch.all(mask[0, 5:7] == mask[0, 5]))
+            self.assertTrue(torch.all(mask[1, 1:4] == mask[1, 1]))
+            # Special tokens and padding are never masked
+            self.assertEqual(mask[:, 0].sum().item(), 0)
+            self.assertEqual(mask[0, 7].item(), 0)
+            self.assertEqual(mask[1, 4:].sum().item(), 0)
+            # The budget is round(len * mlm_probability) tokens: 4 and 2 here, and a fitting word is never left out
+            self.assertEqual(mask[0].sum().item(), 4 if mask[0, 1] else 3)
+            self.assertEqual(mask[1].sum().item(), 0)
+
+        # With left padding, the words of the shorter example are at the end of the sequence
+        tokenizer.padding_side = "left"
+        input_ids = torch.tensor([[1, 5, 8, 9, 6, 7, 8, 2], [3, 3, 3, 1, 7, 9, 5, 2]])
+        for _ in range(20):
+            mask = data_collator._torch_whole_word_mask(input_ids, [8, 5], [None, [3]])
+            self.assertTrue(torch.all(mask[0, 1:4] == mask[0, 1]))
+            self.assertEqual(mask[1].sum().item(), 0)
+            mask = data_collator._torch_whole_word_mask(input_ids, [8, 5])
+            self.assertEqual(mask[1, :4].sum().item(), 0)
+            self.assertEqual(mask[1, 7].item(), 0)
+            self.assertTrue(torch.all(mask[1, 4:6] == mask[1, 4]))
+            self.assertEqual(mask[1].sum().item(), 2 if mask[1, 4] else 1)
+
+        # The real tokens of the shorter example are masked when collating a left-padded batch
+        batch = data_collator([{"input_ids": [1, 5, 8, 9, 6, 7, 8, 2]}, {"input_ids": [1, 7, 9, 5, 2]}])
+        self.assertEqual(batch["input_ids"][1, :3].tolist(), [3, 3, 3])
+        self.assertTrue(torch.all(batch["labels"][1, :4] == -100))
+        self.assertIn((batch["labels"][1] != -100).sum().item(), (1, 2))
+
+    def test_data_collator_with_flattening(self):
+        features = [
+            {"input_ids": [10, 11, 12], "labels": [0, 1, 2]},
+            {"input_ids": torch.tensor([20, 21, 22, 23, 24, 25]), "labels": torch.tensor([3, 4, 5, 6, 7, 8])},
+            {"input_ids": np.arange(30, 37), "labels": np.arange(9, 16)},
+        ]
+
+        data_collator = DataCollatorWithFlattening(return_tensors="pt")
+        batch = data_collator(features)
+        self.assertEqual(batch["input_ids"].shape, torch.Size([1, 16]))
+        self.assertEqual(batch["input_ids"].dtype, torch.long)
+        self.assertEqual(
+            batch["input_ids"][0].tolist(), [10, 11, 12, 20, 21, 22, 23, 24, 25, 30, 31, 32, 33, 34, 35, 36]
+        )
+        self.assertEqual(batch["labels"][0].tolist(), [-100, 1, 2, -100, 4, 5, 6, 7, 8, -100, 10, 11, 12, 13, 14, 15])
+        self.assertEqual(batch["position_ids"][0].tolist(), [0, 1, 2, 0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5, 6])
+        self.assertNotIn("cu_seq_lens_q", batch)
+
+        data_collator = DataCollatorWithFlattening(return_tensors="pt", return_flash_attn_kwargs=True)
+        batch = data_collator(features)
+        self.assertEqual(batch["cu_seq_lens_q"].tolist(), [0, 3, 9, 16])
+        self.assertEqual(batch["cu_seq_lens_q"].dtype, torch.int32)
+        self.assertTrue(torch.equal(batch["cu_seq_lens_q"], batch["cu_seq_lens_k"]))
+        self.assertEqual(batch["max_length_q"], 7)
+        self.assertEqual(batch["max_length_k"], 7)
+
     def test_plm(self):
         tokenizer = BertTokenizer(self.vocab_file)
         no_pad_features = [{"input_ids": list(range(10))}, {"input_ids": list(range(10))}]
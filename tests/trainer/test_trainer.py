@@ -46,6 +46,7 @@ from transformers import (
     PretrainedConfig,
     TrainerCallback,
     TrainingArguments,
+    default_data_collator,
     enable_full_determinism,
     get_polynomial_decay_schedule_with_warmup,
     is_torch_available,
@@ -186,6 +187,47 @@ class MockCudaOOMCallback(TrainerCallback):
             raise RuntimeError("CUDA out of memory.")
 
 
+class HostSyncCounterCallback(TrainerCallback):
+    """
+    Callback counting, for each training step, the calls made from `trainer.py` that read the value of a tensor on the
+    host (and would synchronize with the accelerator), by patching the corresponding `torch.Tensor` methods. The count
+    of a step goes from the end of the previous step to the end of this one, so it includes fetching the batches and
+    the logging done after the previous step.
+    """
+
+    methods = ("item", "tolist", "cpu", "numpy", "__bool__", "__float__", "__int__")
+
+    def __init__(self):
+        self.num_syncs = 0
+        self.syncs_per_step = []
+        self.patchers = []
+
+    def counting(self, method):
+        trainer_file = sys.modules[Trainer.__module__].__file__
+
+        def wrapper(tensor, *args, **kwargs):
+            if sys._getframe(1).f_code.co_filename == trainer_file:
+                self.num_syncs += 1
+            return method(tensor, *args, **kwargs)
+
+        return wrapper
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.patchers = [
+            patch.object(torch.Tensor, name, self.counting(getattr(torch.Tensor, name))) for name in self.methods
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        self.syncs_per_step.append(self.num_syncs)
+        self.num_syncs = 0
+
+    def on_train_end(self, args, state, control, **kwargs):
+        for patcher in self.patchers:
+            patcher.stop()
+
+
 def ForCausalLMLoss(logits, labels, vocab_size, num_items_in_batch, disable_num_items_in_batch=False):
     # Upcast to float if we need to compute the loss to avoid potential precision issues
     logits = logits.float()
@@ -1048,6 +1090,71 @@ class TrainerIntegrationPrerunTest(TestCasePlus, TrainerIntegrationCommon):
             new_train_loss = log_history[-1]["train_loss"]
             self.assertAlmostEqual(train_loss, new_train_loss, places=4)
 
+    def test_sync_free_training(self):
+        results = {}
+        for sync_free_training in [False, True]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                counter = HostSyncCounterCallback()
+                trainer = get_regression_trainer(
+                    learning_rate=0.1,
+                    logging_steps=5,
+                    include_num_input_tokens_seen=True,
+                    sync_free_training=sync_free_training,
+                    output_dir=tmp_dir,
+                )
+                trainer.model.main_input_name = "input_x"
+                trainer.add_callback(counter)
+                trainer.train()
+
+            losses = [log["loss"] for log in trainer.state.log_history if "loss" in log]
+            results[sync_free_training] = (losses, trainer.state.num_input_tokens_seen, trainer.model.a.item())
+            logging_steps = [step for step in range(1, trainer.state.global_step) if step % 5 == 0]
+            for step, num_syncs in enumerate(counter.syncs_per_step[1:], start=1):
+                if sync_free_training and step not in logging_steps:
+                    self.assertEqual(num_syncs, 0)
+                else:
+                    self.assertGreater(num_syncs, 0)
+
+        self.assertEqual(results[True][0], results[False][0])
+        self.assertEqual(results[True][1], results[False][1])
+        self.assertAlmostEqual(results[True][2], results[False][2])
+
+    def test_dataloader_prefetch_batches(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trainer = get_regression_trainer(learning_rate=0.1, gradient_accumulation_steps=3, output_dir=tmp_dir)
+            trainer.train()
+            expected_steps = trainer.state.global_step
+            expected = trainer.state.log_history[-1]["train_loss"], trainer.model.a.item(), trainer.model.b.item()
+
+            trainer = get_regression_trainer(
+                learning_rate=0.1, gradient_accumulation_steps=3, dataloader_prefetch_batches=2, output_dir=tmp_dir
+            )
+            trainer.train()
+            result = trainer.state.log_history[-1]["train_loss"], trainer.model.a.item(), trainer.model.b.item()
+            self.assertEqual(trainer.state.global_step, expected_steps)
+            for value, expected_value in zip(result, expected):
+                self.assertAlmostEqual(value, expected_value, places=5)
+
+    def test_dataloader_prefetch_batches_with_random_collator(self):
+        # The batches are collated on the main thread, so collators using the global RNG stay reproducible
+        def noisy_collator(features):
+            batch = default_data_collator(features)
+            batch["labels"] = batch["labels"] + torch.randn_like(batch["labels"])
+            return batch
+
+        results = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for _ in range(2):
+                trainer = get_regression_trainer(
+                    learning_rate=0.1,
+                    dataloader_prefetch_batches=3,
+                    data_collator=noisy_collator,
+                    output_dir=tmp_dir,
+                )
+                trainer.train()
+                results.append((trainer.model.a.item(), trainer.model.b.item()))
+        self.assertEqual(results[0], results[1])
+
     def test_custom_optimizer(self):
         train_dataset = RegressionDataset()
         with tempfile.TemporaryDirectory() as tmp_dir:
@@ -1676,6 +1783,60 @@ class TrainerIntegrationTest(TestCasePlus, TrainerIntegrationCommon):
         new_eval_dataset = RegressionDataset(length=128)
         self.assertEqual(len(trainer.get_eval_dataloader(new_eval_dataset)), 128 // (32 * n_gpu))
 
+    def test_train_dataloader_with_packing(self):
+        config = LlamaConfig(vocab_size=100, hidden_size=32, num_hidden_layers=2, num_attention_heads=4)
+        tiny_llama = LlamaForCausalLM(config)
+        lengths = [5, 12, 3, 9, 16, 7, 2, 11, 4, 8]
+        train_dataset = [{"input_ids": torch.randint(0, 100, (length,)).tolist()} for length in lengths]
+
+        args = TrainingArguments(
+            self.get_auto_remove_tmp_dir(),
+            per_device_train_batch_size=2,
+            packing_max_tokens=16,
+            max_steps=2,
+            report_to="none",
+        )
+        trainer = Trainer(model=tiny_llama, args=args, train_dataset=train_dataset)
+        train_dataloader = trainer.get_train_dataloader()
+        # 77 tokens packed in 16-token bins
+        self.assertEqual(len(train_dataloader), 3)
+        num_tokens = 0
+        for batch in train_dataloader:
+            self.assertEqual(batch["input_ids"].shape[0], 1)
+            self.assertLessEqual(batch["input_ids"].shape[1], 2 * 16)
+            self.assertEqual(batch["position_ids"].shape, batch["input_ids"].shape)
+            num_tokens += batch["input_ids"].shape[1]
+        self.assertEqual(num_tokens, sum(lengths))
+        trainer.train()
+
+    def test_train_dataloader_with_max_tokens_per_batch(self):
+        config = LlamaConfig(vocab_size=100, hidden_size=32, num_hidden_layers=2, num_attention_heads=4)
+        tiny_llama = LlamaForCausalLM(config)
+        lengths = [5, 12, 3, 9, 16, 7, 2, 11, 4, 8]
+        train_dataset = [{"input_ids": torch.randint(0, 100, (length,)).tolist()} for length in lengths]
+
+        def pad_collate(features):
+            input_ids = [torch.tensor(feature["input_ids"]) for feature in features]
+            return {
+                "input_ids": nn.utils.rnn.pad_sequence(input_ids, batch_first=True),
+                "labels": nn.utils.rnn.pad_sequence(input_ids, batch_first=True, padding_value=-100),
+            }
+
+        args = TrainingArguments(
+            self.get_auto_remove_tmp_dir(),
+            max_tokens_per_batch=24,
+            max_steps=2,
+            report_to="none",
+        )
+        trainer = Trainer(model=tiny_llama, args=args, train_dataset=train_dataset, data_collator=pad_collate)
+        train_dataloader = trainer.get_train_dataloader()
+        num_examples = 0
+        for batch in train_dataloader:
+            self.assertLessEqual(batch["input_ids"].numel(), 24)
+            num_examples += batch["input_ids"].shape[0]
+        self.assertEqual(num_examples, len(lengths))
+        trainer.train()
+
     # tests that we do not require dataloader to have a .dataset attribute
     def test_dataloader_without_dataset(self):
         train_dataset = RegressionDataset(length=128)
@@ -2672,6 +2833,39 @@ class TrainerIntegrationTest(TestCasePlus, TrainerIntegrationCommon):
                 expected_acc = AlmostAccuracy()((pred + 1, y))["accuracy"]
                 self.assertAlmostEqual(results["eval_accuracy"], expected_acc)
 
+    def test_predict_with_eval_memmap_dir(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            memmap_dir = os.path.join(tmp_dir, "memmap")
+            trainer = get_regression_trainer(
+                a=1.5,
+                b=2.5,
+                eval_len=66,
+                double_output=True,
+                label_names=["labels", "labels_2"],
+                eval_memmap_dir=memmap_dir,
+                output_dir=tmp_dir,
+            )
+            outputs = trainer.predict(trainer.eval_dataset)
+            preds = outputs.predictions
+            labels = outputs.label_ids
+            x = trainer.eval_dataset.x
+            self.assertIsInstance(preds[0], np.memmap)
+            self.assertTrue(np.allclose(preds[0], 1.5 * x + 2.5))
+            self.assertTrue(np.allclose(preds[1], 1.5 * x + 2.5))
+            self.assertTrue(np.array_equal(labels[0], trainer.eval_dataset.ys[0]))
+            self.assertTrue(np.array_equal(labels[1], trainer.eval_dataset.ys[1]))
+            self.assertTrue(os.path.isdir(os.path.join(memmap_dir, "test")))
+
+            # Metrics are computed from the memory-mapped arrays
+            trainer = get_regression_trainer(
+                a=1.5, b=2.5, compute_metrics=AlmostAccuracy(), eval_memmap_dir=memmap_dir, output_dir=tmp_dir
+            )
+            results = trainer.evaluate()
+            x, y = trainer.eval_dataset.x, trainer.eval_dataset.ys[0]
+            pred = 1.5 * x + 2.5
+            self.assertAlmostEqual(results["eval_loss"], ((pred - y) ** 2).mean())
+            self.assertAlmostEqual(results["eval_accuracy"], AlmostAccuracy()((pred, y))["accuracy"])
+
     def test_predict(self):
         with tempfile.TemporaryDirectory() as tmp_dir:
             trainer = get_regression_trainer(a=1.5, b=2.5, output_dir=tmp_dir)
@@ -2943,6 +3137,35 @@ class TrainerIntegrationTest(TestCasePlus, TrainerIntegrationCommon):
         trainer.train()
         self.check_saved_checkpoints(tmp_dir, 5, int(self.n_epochs * 64 / self.batch_size), False)
 
+    def test_save_checkpoints_async(self):
+        tmp_dir = self.get_auto_remove_tmp_dir()
+        kwargs = {"output_dir": tmp_dir, "train_len": 128, "save_steps": 5, "learning_rate": 0.1, "logging_steps": 5}
+        trainer = get_regression_trainer(save_async=True, **kwargs)
+        trainer.train()
+        total = int(self.n_epochs * 128 / self.batch_size)
+        self.check_saved_checkpoints(tmp_dir, 5, total)
+        # No staging directory is left behind
+        self.assertFalse(any(name.startswith("tmp-") for name in os.listdir(tmp_dir)))
+        (a, b) = trainer.model.a.item(), trainer.model.b.item()
+        state = dataclasses.asdict(trainer.state)
+
+        # The checkpoint holds the state at the step it was taken and can be resumed from
+        checkpoint = os.path.join(tmp_dir, "checkpoint-5")
+        trainer = get_regression_trainer(save_async=True, **kwargs)
+        trainer.train(resume_from_checkpoint=checkpoint)
+        (a1, b1) = trainer.model.a.item(), trainer.model.b.item()
+        state1 = dataclasses.asdict(trainer.state)
+        self.assertEqual(a, a1)
+        self.assertEqual(b, b1)
+        self.check_trainer_state_are_the_same(state, state1)
+
+        # Older checkpoints are rotated once the new ones are complete
+        tmp_dir = self.get_auto_remove_tmp_dir()
+        trainer = get_regression_trainer(output_dir=tmp_dir, save_steps=5, save_total_limit=2, save_async=True)
+        trainer.train()
+        self.assertEqual(len(os.listdir(tmp_dir)), 2)
+        self.assertTrue(all(name.startswith("checkpoint-") for name in os.listdir(tmp_dir)))
+
     @require_safetensors
     def test_safe_checkpoints(self):
         for save_safetensors in [True, False]:
@@ -3372,6 +3595,63 @@ class TrainerIntegrationTest(TestCasePlus, TrainerIntegrationCommon):
             self.assertEqual(b, b1)
             self.check_trainer_state_are_the_same(state, state1)
 
+    def test_resume_training_with_parallel_shard_loading(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            kwargs = {"output_dir": tmpdir, "train_len": 128, "save_steps": 5, "learning_rate": 0.1}
+            trainer = get_regression_trainer(checkpoint_shard_workers=2, **kwargs)
+            trainer.train()
+            (a, b) = trainer.model.a.item(), trainer.model.b.item()
+            state = dataclasses.asdict(trainer.state)
+
+            checkpoint = os.path.join(tmpdir, "checkpoint-5")
+            self.convert_to_sharded_checkpoint(checkpoint)
+
+            # Reinitialize trainer
+            trainer = get_regression_trainer(checkpoint_shard_workers=2, **kwargs)
+            trainer.train(resume_from_checkpoint=checkpoint)
+            (a1, b1) = trainer.model.a.item(), trainer.model.b.item()
+            state1 = dataclasses.asdict(trainer.state)
+            self.assertEqual(a, a1)
+            self.assertEqual(b, b1)
+            self.check_trainer_state_are_the_same(state, state1)
+
+    @require_safetensors
+    @require_torch_up_to_2_accelerators
+    def test_resume_training_with_delta_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            kwargs = {"output_dir": tmpdir, "train_len": 128, "save_steps": 5, "learning_rate": 0.1}
+            trainer = get_regression_trainer(a=1.0, b=2.0, save_delta_checkpoints=True, **kwargs)
+            trainer.model.b.requires_grad_(False)
+            trainer.train()
+            (a, b) = trainer.model.a.item(), trainer.model.b.item()
+            state = dataclasses.asdict(trainer.state)
+            self.assertEqual(b, 2.0)
+
+            # Only the trainable parameter is saved, the frozen one is identified by its hash
+            checkpoint = os.path.join(tmpdir, "checkpoint-5")
+            with open(os.path.join(checkpoint, "delta_checkpoint.json")) as f:
+                manifest = json.load(f)
+            self.assertEqual(manifest["delta_keys"], ["a"])
+            self.assertEqual(list(manifest["base_hashes"]), ["b"])
+            state_dict = safetensors.torch.load_file(os.path.join(checkpoint, SAFE_WEIGHTS_NAME))
+            self.assertEqual(list(state_dict), ["a"])
+
+            # Resuming overlays the delta on the base weights of the model
+            trainer = get_regression_trainer(a=1.0, b=2.0, save_delta_checkpoints=True, **kwargs)
+            trainer.model.b.requires_grad_(False)
+            trainer.train(resume_from_checkpoint=checkpoint)
+            (a1, b1) = trainer.model.a.item(), trainer.model.b.item()
+            state1 = dataclasses.asdict(trainer.state)
+            self.assertEqual(a, a1)
+            self.assertEqual(b, b1)
+            self.check_trainer_state_are_the_same(state, state1)
+
+            # The base weights of the model have to match the ones the checkpoint was saved from
+            trainer = get_regression_trainer(a=1.0, b=3.0, save_delta_checkpoints=True, **kwargs)
+            trainer.model.b.requires_grad_(False)
+            with self.assertRaisesRegex(ValueError, "delta checkpoint"):
+                trainer.train(resume_from_checkpoint=checkpoint)
+
     @require_safetensors
     @require_torch_up_to_2_accelerators
     def test_resume_training_with_safe_checkpoint(self):
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 
+import json
 import os
 import shutil
 import tempfile
@@ -25,6 +26,7 @@ from transformers import (
     IntervalStrategy,
     PrinterCallback,
     ProgressCallback,
+    StepProfilerCallback,
     Trainer,
     TrainerCallback,
     TrainerState,
@@ -269,6 +271,32 @@ class TrainerCallbackTest(unittest.TestCase):
                 )
                 assert str(MyTestTrainerCallback) in warn_mock.call_args[0][0]
 
+    def test_step_profiler_callback(self):
+        profiler = StepProfilerCallback(peak_flops=1e12)
+        trainer = self.get_trainer(callbacks=[profiler], gradient_accumulation_steps=2, logging_steps=3, eval_steps=5)
+        trainer.model.main_input_name = "input_x"
+        trainer.train()
+
+        with open(os.path.join(self.output_dir, "step_profile.jsonl")) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record["step"] for record in records], list(range(1, trainer.state.global_step + 1)))
+        self.assertEqual(profiler.num_steps, trainer.state.global_step)
+        for record in records:
+            times = [
+                record[key]
+                for key in ("data_time", "forward_time", "backward_time", "grad_clip_time", "optimizer_time")
+            ]
+            self.assertTrue(all(t >= 0 for t in times + [record["logging_time"]]))
+            self.assertAlmostEqual(record["step_time"], sum(times) + record["logging_time"])
+            self.assertGreater(record["forward_time"], 0)
+            # 2 accumulated batches of 8 samples, the main input of the regression model being one value per sample
+            self.assertEqual(record["num_tokens"], 16)
+            self.assertGreater(record["mfu"], 0)
+
+        # The model hooks are removed at the end of training
+        self.assertEqual(len(trainer.model._forward_hooks), 0)
+        self.assertEqual(len(trainer.model._forward_pre_hooks), 0)
+
     def test_stateful_callbacks(self):
         # Use something with non-defaults
         cb = EarlyStoppingCallback(early_stopping_patience=5, early_stopping_threshold=0.2)
@@ -20,15 +20,23 @@ from transformers import (
     GenerationConfig,
     Seq2SeqTrainer,
     Seq2SeqTrainingArguments,
+    T5Config,
+    T5ForConditionalGeneration,
     T5Tokenizer,
 )
-from transformers.testing_utils import TestCasePlus, require_sentencepiece, require_torch, slow
-from transformers.utils import is_datasets_available
+from transformers.testing_utils import TestCasePlus, get_tests_dir, require_sentencepiece, require_torch, slow
+from transformers.utils import is_datasets_available, is_torch_available
 
 
 if is_datasets_available():
     import datasets
 
+if is_torch_available():
+    import torch
+
+
+SAMPLE_VOCAB = get_tests_dir("fixtures/test_sentencepiece.model")
+
 
 @require_sentencepiece
 class Seq2seqTrainerTester(TestCasePlus):
@@ -204,3 +212,89 @@ class Seq2seqTrainerTester(TestCasePlus):
                 compute_metrics=lambda x: {"samples": x[0].shape[0]},
             )
         self.assertIn("The loaded generation config instance is invalid", str(exc.exception))
+
+    @require_torch
+    def test_generation_streaming_eval(self):
+        tokenizer = T5Tokenizer(SAMPLE_VOCAB)
+        torch.manual_seed(0)
+        config = T5Config(
+            vocab_size=len(tokenizer),
+            d_model=16,
+            d_kv=8,
+            d_ff=32,
+            num_layers=2,
+            num_heads=2,
+            pad_token_id=tokenizer.pad_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+            decoder_start_token_id=tokenizer.pad_token_id,
+        )
+        model = T5ForConditionalGeneration(config)
+        data_collator = DataCollatorForSeq2Seq(tokenizer, model=model, return_tensors="pt", padding="longest")
+
+        generator = torch.Generator().manual_seed(42)
+        dataset = []
+        for _ in range(10):
+            input_length, label_length = torch.randint(2, 12, (2,), generator=generator).tolist()
+            dataset.append(
+                {
+                    "input_ids": torch.randint(5, 100, (input_length,), generator=generator).tolist(),
+                    "labels": torch.randint(5, 100, (label_length,), generator=generator).tolist(),
+                }
+            )
+
+        batches = []
+
+        def compute_metrics(eval_pred, compute_result):
+            batches.append(eval_pred)
+            if compute_result:
+                return {"num_predictions": sum(len(batch.predictions) for batch in batches)}
+
+        tmp_dir = self.get_auto_remove_tmp_dir()
+        common_kwargs = {
+            "predict_with_generate": True,
+            "generation_max_length": 8,
+            "per_device_eval_batch_size": 2,
+            "report_to": "none",
+            "use_cpu": True,
+        }
+        args = Seq2SeqTrainingArguments(
+            tmp_dir, generation_streaming_eval=True, generation_batch_size=4, **common_kwargs
+        )
+        self.assertTrue(args.batch_eval_metrics)
+        self.assertEqual(args.eval_batch_size, 4)
+        trainer = Seq2SeqTrainer(
+            model=model,
+            args=args,
+            processing_class=tokenizer,
+            data_collator=data_collator,
+            eval_dataset=dataset,
+            compute_metrics=compute_metrics,
+        )
+
+        metrics = trainer.evaluate()
+        self.assertEqual(metrics["eval_num_predictions"], 10)
+        # Batches are generated at `generation_batch_size` and decoded before reaching `compute_metrics`
+        self.assertEqual([len(batch.predictions) for batch in batches], [4, 4, 2])
+        self.assertIsInstance(batches[0].predictions[0], str)
+        self.assertIsInstance(batches[0].label_ids[0], str)
+
+        # Examples are generated from the longest to the shortest
+        sampler = trainer._get_eval_sampler(dataset)
+        input_lengths = [len(dataset[i]["input_ids"]) for i in sampler]
+        self.assertEqual(input_lengths, sorted(input_lengths, reverse=True))
+
+        # Predictions are put back in the order of the dataset
+        batches.clear()
+        output = trainer.predict(dataset)
+        self.assertEqual(output.metrics["test_num_predictions"], 10)
+        for feature, label_ids in zip(dataset, output.label_ids):
+            self.assertListEqual(label_ids[: len(feature["labels"])].tolist(), feature["labels"])
+
+        reference_trainer = Seq2SeqTrainer(
+            model=model,
+            args=Seq2SeqTrainingArguments(tmp_dir, **common_kwargs),
+            processing_class=tokenizer,
+            data_collator=data_collator,
+        )
+        reference_output = reference_trainer.predict(dataset)
+        self.assertTrue((output.predictions == reference_output.predictions).all())
@@ -14,12 +14,16 @@
 # limitations under the License.
 
 import copy
+import math
+import os
+import tempfile
+import threading
 import unittest
 
 import numpy as np
 
 from transformers.data.data_collator import default_data_collator
-from transformers.testing_utils import require_accelerate, require_torch
+from transformers.testing_utils import require_accelerate, require_torch, require_torch_gpu
 from transformers.trainer_utils import RemoveColumnsCollator, find_executable_batch_size
 from transformers.utils import is_torch_available
 
@@ -32,6 +36,8 @@ if is_torch_available():
     from transformers.modeling_outputs import SequenceClassifierOutput
     from transformers.tokenization_utils_base import BatchEncoding
     from transformers.trainer_pt_utils import (
+        BatchPrefetcher,
+        DeltaCheckpointTracker,
         DistributedLengthGroupedSampler,
         DistributedSamplerWithLoop,
         DistributedTensorGatherer,
@@ -39,9 +45,16 @@ if is_torch_available():
         IterableDatasetShard,
         LabelSmoother,
         LengthGroupedSampler,
+        MemmapEvalLoopContainer,
+        PackedDataset,
         SequentialDistributedSampler,
         ShardSampler,
+        TokenBudgetBatchSampler,
+        get_first_fit_decreasing_bins,
         get_parameter_names,
+        nested_concat,
+        nested_concat_all,
+        nested_numpify,
         numpy_pad_and_concatenate,
         torch_pad_and_concatenate,
     )
@@ -235,6 +248,179 @@ class TrainerUtilsTest(unittest.TestCase):
         # The indices should be a permutation of range(100)
         self.assertEqual(sorted(indices_process_0 + indices_process_1), list(range(100)))
 
+    def test_delta_checkpoint_tracker(self):
+        model = TstLayer(4)
+        model.register_buffer("running_mean", torch.zeros(4))
+        for module in (model.linear2, model.ln1, model.ln2):
+            module.requires_grad_(False)
+        tracker = DeltaCheckpointTracker(model)
+
+        trainable_keys = ["linear1.weight", "linear1.bias", "bias"]
+        self.assertEqual(sorted(tracker.changed_keys(model)), sorted(trainable_keys))
+
+        # Frozen tensors are only reported once their content changes
+        with torch.no_grad():
+            model.linear2.weight.mul_(1.0)
+            model.running_mean.add_(1.0)
+        self.assertEqual(sorted(tracker.changed_keys(model)), sorted(trainable_keys + ["running_mean"]))
+
+        manifest = tracker.manifest(tracker.changed_keys(model))
+        self.assertEqual(manifest["delta_keys"], sorted(trainable_keys + ["running_mean"]))
+        self.assertEqual(
+            sorted(manifest["base_hashes"]),
+            ["linear2.bias", "linear2.weight", "ln1.bias", "ln1.weight", "ln2.bias", "ln2.weight"],
+        )
+
+        # A tracker restored from the manifest keeps the same base weights
+        tracker = DeltaCheckpointTracker.from_manifest(model, manifest)
+        self.assertEqual(tracker.mismatched_keys(model), [])
+        self.assertEqual(sorted(tracker.changed_keys(model)), sorted(trainable_keys + ["running_mean"]))
+        with torch.no_grad():
+            model.ln1.weight.add_(1.0)
+        self.assertEqual(tracker.mismatched_keys(model), ["ln1.weight"])
+
+    def test_batch_prefetcher(self):
+        batches = [{"input_ids": torch.arange(6).view(2, 3) + i} for i in range(5)]
+
+        # The batches are pulled on the calling thread, at most `num_prefetch` ahead of the one being used
+        pulled = []
+
+        def iterator():
+            for i, batch in enumerate(batches):
+                pulled.append((i, threading.current_thread() is threading.main_thread()))
+                yield batch
+
+        prefetcher = BatchPrefetcher(iterator(), num_prefetch=2)
+        batch = next(prefetcher)
+        self.assertTrue(torch.equal(batch["input_ids"], batches[0]["input_ids"]))
+        self.assertEqual(pulled, [(0, True), (1, True), (2, True)])
+        results = [batch] + list(prefetcher)
+        self.assertEqual(len(results), 5)
+        for batch, expected in zip(results, batches):
+            self.assertTrue(torch.equal(batch["input_ids"], expected["input_ids"]))
+        # Exhausted prefetchers keep raising StopIteration
+        self.assertIsNone(next(prefetcher, None))
+
+        # Errors of the iterator are raised when their batch is reached
+        def failing_iterator():
+            yield batches[0]
+            raise ValueError("Corrupted batch")
+
+        prefetcher = BatchPrefetcher(failing_iterator())
+        next(prefetcher)
+        with self.assertRaisesRegex(ValueError, "Corrupted batch"):
+            next(prefetcher)
+
+        prefetcher = BatchPrefetcher(iter(range(100)), num_prefetch=1)
+        next(prefetcher)
+        prefetcher.close()
+        self.assertIsNone(next(prefetcher, None))
+
+    @require_accelerate
+    def test_batch_prefetcher_hides_reading_ahead_from_accelerate(self):
+        from accelerate.data_loader import DataLoaderShard
+        from accelerate.state import GradientState
+
+        dataloader = DataLoaderShard(list(range(10)), batch_size=2)
+        gradient_state = GradientState()
+        prefetcher = BatchPrefetcher(iter(dataloader), num_prefetch=3, dataloader=dataloader)
+        for i, batch in enumerate(prefetcher):
+            self.assertEqual(batch.tolist(), [2 * i, 2 * i + 1])
+            # The dataloader only reports its end with the last batch, and ends its iteration after it
+            self.assertEqual(gradient_state.end_of_dataloader, i == 4)
+            self.assertTrue(gradient_state.in_dataloader)
+        self.assertFalse(gradient_state.in_dataloader)
+
+    @require_torch_gpu
+    def test_batch_prefetcher_copies_to_device(self):
+        batches = [{"input_ids": torch.arange(6).view(2, 3) + i, "mask": torch.ones(2, 3).cuda()} for i in range(4)]
+        prefetcher = BatchPrefetcher(iter(batches), num_prefetch=2, device=torch.device("cuda"))
+        for batch, expected in zip(prefetcher, batches):
+            self.assertEqual(batch["input_ids"].device.type, "cuda")
+            self.assertTrue(torch.equal(batch["input_ids"].cpu(), expected["input_ids"]))
+            # Tensors already on the device are left as is
+            self.assertIs(batch["mask"], expected["mask"])
+        prefetcher.close()
+
+    @require_accelerate
+    @require_torch_gpu
+    def test_batch_prefetcher_restores_dataloader_device(self):
+        from accelerate.data_loader import DataLoaderShard
+
+        # The dataloader doesn't copy the batches itself while the prefetcher does
+        dataloader = DataLoaderShard(list(range(10)), batch_size=2, device=torch.device("cuda"))
+        prefetcher = BatchPrefetcher(iter(dataloader), device=torch.device("cuda"), dataloader=dataloader)
+        self.assertIsNone(dataloader.device)
+        self.assertTrue(all(batch.device.type == "cuda" for batch in prefetcher))
+        prefetcher.close()
+        self.assertEqual(dataloader.device, torch.device("cuda"))
+
+    def test_token_budget_batch_sampler(self):
+        lengths = torch.randint(1, 64, (200,)).tolist()
+        lengths[17] = 100
+        sampler = TokenBudgetBatchSampler(128, lengths=lengths)
+
+        batches = list(sampler)
+        self.assertEqual(len(batches), len(sampler))
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(200)))
+        self.assertIn([17], batches)
+        for batch in batches:
+            self.assertLessEqual(len(batch) * max(lengths[i] for i in batch), 128)
+        # The order only depends on the epoch, so that it is reproduced when resuming
+        self.assertEqual(list(sampler), batches)
+        # The batches are fixed, only their order changes between epochs
+        sampler.set_epoch(1)
+        self.assertNotEqual(list(sampler), batches)
+        self.assertEqual(sorted(sampler), sorted(batches))
+        sampler.set_epoch(0)
+        self.assertEqual(list(sampler), batches)
+
+        # Distributed: every process gets the same number of batches
+        num_batches = len(sampler.batches)
+        for drop_last in [False, True]:
+            batches_per_process = []
+            for rank in range(3):
+                sampler = TokenBudgetBatchSampler(128, lengths=lengths, num_replicas=3, rank=rank, drop_last=drop_last)
+                batches_per_process.append(list(sampler))
+                self.assertEqual(len(batches_per_process[-1]), len(sampler))
+            expected = num_batches // 3 if drop_last else math.ceil(num_batches / 3)
+            self.assertTrue(all(len(batches) == expected for batches in batches_per_process))
+
+    def test_first_fit_decreasing_bins(self):
+        lengths = [2, 7, 5, 4, 3, 9, 1, 6]
+        bins = get_first_fit_decreasing_bins(lengths, 10)
+        # 9+1, 7+3, 6+4, 5+2: the optimal packing of these lengths
+        self.assertEqual(bins, [[5, 6], [1, 4], [7, 3], [2, 0]])
+
+        lengths = torch.randint(1, 50, (200,)).tolist()
+        bins = get_first_fit_decreasing_bins(lengths, 64)
+        self.assertEqual(sorted(i for indices in bins for i in indices), list(range(200)))
+        self.assertTrue(all(sum(lengths[i] for i in indices) <= 64 for indices in bins))
+        # First fit decreasing never leaves two bins that could be merged
+        totals = sorted(sum(lengths[i] for i in indices) for indices in bins)
+        self.assertGreater(totals[0] + totals[1], 64)
+
+    def test_packed_dataset(self):
+        data = [{"input_ids": list(range(length))} for length in [3, 6, 2, 5]]
+        data[1]["labels"] = [10 + i for i in range(6)]
+        dataset = PackedDataset(data, max_tokens=8)
+
+        self.assertEqual(len(dataset), 2)
+        self.assertEqual(dataset.bins, [[1, 2], [3, 0]])
+        self.assertEqual(dataset.num_tokens, [8, 8])
+        self.assertEqual(
+            dataset[0],
+            {
+                "input_ids": [0, 1, 2, 3, 4, 5, 0, 1],
+                "labels": [-100, 11, 12, 13, 14, 15, -100, 1],
+                "position_ids": [0, 1, 2, 3, 4, 5, 0, 1],
+            },
+        )
+
+        # Examples longer than the budget are truncated
+        dataset = PackedDataset([{"input_ids": list(range(12))}], max_tokens=8)
+        self.assertEqual(dataset[0]["input_ids"], list(range(8)))
+
     def test_get_parameter_names(self):
         model = nn.Sequential(TstLayer(128), nn.ModuleList([TstLayer(128), TstLayer(128)]))
         # fmt: off
@@ -501,6 +687,49 @@ class TrainerUtilsTest(unittest.TestCase):
         result = torch_pad_and_concatenate(tensor1, tensor2)
         self.assertTrue(torch.equal(result, torch.Tensor([1.0, 2.0])))
 
+    def test_nested_concat_all(self):
+        batches = [
+            (torch.randn(4, 3), {"logits": torch.randn(4, length, 5)}, torch.tensor(float(i)))
+            for i, length in enumerate([7, 2, 9, 7])
+        ]
+        expected = batches[0]
+        for batch in batches[1:]:
+            expected = nested_concat(expected, batch, padding_index=-100)
+        for tensors in [batches, [nested_numpify(batch) for batch in batches]]:
+            result = nested_concat_all(tensors, padding_index=-100)
+            self.assertIsInstance(result, tuple)
+            self.assertIsInstance(result[1], dict)
+            self.assertTrue(np.array_equal(np.asarray(result[0]), expected[0].numpy()))
+            self.assertTrue(np.array_equal(np.asarray(result[1]["logits"]), expected[1]["logits"].numpy()))
+            self.assertTrue(np.array_equal(np.asarray(result[2]), expected[2].numpy()))
+
+    def test_memmap_eval_loop_container(self):
+        batches = [
+            (torch.randn(4, 3), {"logits": torch.randn(4, length, 5)}, torch.tensor(float(i)))
+            for i, length in enumerate([7, 2, 9, 7])
+        ]
+        expected = nested_concat_all(batches, padding_index=-100)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            container = MemmapEvalLoopContainer(tmp_dir, "preds", padding_index=-100)
+            for i, batch in enumerate(batches):
+                container.add(batch)
+                if i % 2 == 1:
+                    container.to_cpu_and_numpy()
+            result = container.get_arrays()
+            self.assertIsInstance(result[1]["logits"], np.memmap)
+            self.assertTrue(np.array_equal(result[0], expected[0].numpy()))
+            self.assertTrue(np.array_equal(result[1]["logits"], expected[1]["logits"].numpy()))
+            self.assertTrue(np.array_equal(result[2], expected[2].numpy()))
+            # Only the concatenated arrays are left on disk
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["preds-0.npy", "preds-1.npy", "preds-2.npy"])
+
+            container = MemmapEvalLoopContainer(tmp_dir, "batches", do_nested_concat=False)
+            for batch in batches:
+                container.add(batch)
+            result = container.get_arrays()
+            self.assertEqual(len(result), len(batches))
+            self.assertTrue(np.array_equal(result[1][1]["logits"], batches[1][1]["logits"].numpy()))
+
     def test_remove_columns_collator(self):
         class MockLogger:
             def __init__(self) -> None:
@@ -19,6 +19,7 @@ import numpy as np
 import pytest
 
 from transformers.audio_utils import (
+    StreamingSpectrogram,
     amplitude_to_db,
     amplitude_to_db_batch,
     chroma_filter_bank,
@@ -29,6 +30,7 @@ from transformers.audio_utils import (
     power_to_db_batch,
     spectrogram,
     spectrogram_batch,
+    voice_activity_segments,
     window_function,
 )
 from transformers.testing_utils import is_librosa_available, require_librosa
@@ -1453,6 +1455,59 @@ class AudioUtilsFunctionTester(unittest.TestCase):
         self.assertTrue(np.allclose(spec_list[1][64:128, 321], expected2))
         self.assertTrue(np.allclose(spec_list[2][64:128, 321], expected3))
 
+    def test_spectrogram_compute_dtype_and_batch_consistency(self):
+        rng = np.random.default_rng(0)
+        waveform_list = [rng.standard_normal(length).astype(np.float32) for length in (3000, 4321, 1000)]
+        window = window_function(400, "hann", frame_length=512)
+        kwargs = {"frame_length": 512, "hop_length": 160, "preemphasis": 0.97, "remove_dc_offset": True}
+
+        # Reference DFT of a single frame, computed directly from the definition of the spectrogram
+        frame = waveform_list[0][:512].astype(np.float64)
+        frame = frame - frame.mean()
+        frame = np.concatenate([frame[:1] * (1 - 0.97), frame[1:] - 0.97 * frame[:-1]]) * window
+        expected = np.abs(np.fft.rfft(frame))
+
+        spec = spectrogram(waveform_list[0], window, center=False, **kwargs)
+        self.assertEqual(spec.shape, (257, 16))
+        self.assertTrue(np.allclose(spec[:, 0], expected, atol=1e-5))
+
+        spec_float32 = spectrogram(waveform_list[0], window, center=False, compute_dtype=np.float32, **kwargs)
+        self.assertTrue(np.allclose(spec_float32, spec, rtol=1e-3, atol=1e-3))
+
+        # Dithering draws the same noise as long as the seed is the same
+        np.random.seed(0)
+        spec_list = spectrogram_batch(waveform_list, window, dither=1.0, **kwargs)
+        np.random.seed(0)
+        expected_list = spectrogram_batch(waveform_list, window, dither=1.0, **kwargs)
+        for spec, expected in zip(spec_list, expected_list):
+            self.assertTrue(np.array_equal(spec, expected))
+
+        spec_list = spectrogram_batch(waveform_list, window, **kwargs)
+        for waveform, spec in zip(waveform_list, spec_list):
+            self.assertTrue(np.allclose(spec, spectrogram(waveform, window, **kwargs), atol=1e-5))
+
+    def test_streaming_spectrogram(self):
+        waveform = np.random.default_rng(0).standard_normal(4321)
+        window = window_function(400, "hann")
+        mel_filters = mel_filter_bank(201, 40, 0, 8000, 16000, norm="slaney", mel_scale="slaney")
+        kwargs = {"frame_length": 400, "hop_length": 160, "power": 2.0, "mel_filters": mel_filters, "log_mel": "log10"}
+        expected = spectrogram(waveform, window, **kwargs)
+
+        streamer = StreamingSpectrogram(window, **kwargs)
+        for split in ([], [1, 100, 201, 202, 3000], list(range(0, 4321, 160))):
+            frames = [streamer(chunk) for chunk in np.split(waveform, split)]
+            # Frames are returned as soon as they are complete
+            if split:
+                self.assertEqual(sum(frame.shape[1] for frame in frames), (4321 - 200) // 160 + 1)
+            frames.append(streamer.flush())
+            spec = np.concatenate(frames, axis=1)
+            self.assertEqual(spec.shape, expected.shape)
+            self.assertTrue(np.allclose(spec, expected))
+
+        # Waveforms shorter than the padding are only handled once flushed
+        self.assertEqual(streamer(waveform[:100]).shape, (40, 0))
+        self.assertTrue(np.allclose(streamer.flush(), spectrogram(waveform[:100], window, **kwargs)))
+
     def test_power_to_db(self):
         spectrogram = np.zeros((2, 3))
         spectrogram[0, 0] = 2.0
@@ -1738,3 +1793,50 @@ class AudioUtilsFunctionTester(unittest.TestCase):
         )
 
         self.assertTrue(np.allclose(original_chroma, utils_chroma))
+
+    def test_voice_activity_segments(self):
+        sampling_rate = 16000
+        rng = np.random.default_rng(0)
+
+        def tone(duration):
+            time = np.arange(int(duration * sampling_rate)) / sampling_rate
+            return 0.3 * np.sin(2 * np.pi * 220 * time) * (1 + 0.5 * np.sin(2 * np.pi * 3 * time))
+
+        def silence(duration):
+            return np.zeros(int(duration * sampling_rate))
+
+        # The short pause is kept, the 50ms blip is dropped
+        waveform = np.concatenate([silence(1), tone(2), silence(0.5), tone(1.5), silence(0.2), tone(1), silence(2)])
+        waveform = np.concatenate([waveform, tone(0.05), silence(1)])
+        waveform += 1e-4 * rng.standard_normal(waveform.shape[0])
+        segments = voice_activity_segments(waveform, sampling_rate)
+        self.assertEqual(segments.shape, (2, 2))
+        self.assertTrue(np.allclose(segments / sampling_rate, [[1.0, 3.0], [3.5, 6.2]], atol=0.15))
+
+        segments = voice_activity_segments(waveform, sampling_rate, speech_pad_duration=0.0, min_silence_duration=0.1)
+        self.assertEqual(segments.shape, (3, 2))
+
+        # Long segments are cut in several parts, at the quietest frames
+        segments = voice_activity_segments(waveform, sampling_rate, max_segment_length=sampling_rate)
+        self.assertTrue(np.all(segments[:, 1] - segments[:, 0] <= sampling_rate))
+        self.assertTrue(np.all(segments[1:, 0] >= segments[:-1, 1]))
+        self.assertTrue(
+            np.allclose([segments[0, 0], segments[-1, 1]], [sampling_rate, 6.2 * sampling_rate], atol=2400)
+        )
+
+        # The silences are dropped above a realistic noise floor
+        waveform = np.concatenate([silence(1), tone(2), silence(1), tone(1.5), silence(1)])
+        speech_power = np.mean(tone(2) ** 2)
+        for snr_db in [20, 30]:
+            noise = np.sqrt(speech_power / 10 ** (snr_db / 10)) * rng.standard_normal(waveform.shape[0])
+            segments = voice_activity_segments(waveform + noise, sampling_rate)
+            self.assertTrue(np.allclose(segments / sampling_rate, [[1.0, 3.0], [4.0, 5.5]], atol=0.15))
+
+        # Continuous speech is kept entirely, noise isn't speech when bounding the spectral flatness
+        self.assertEqual(voice_activity_segments(tone(3), sampling_rate).tolist(), [[0, 3 * sampling_rate]])
+        noise = 0.1 * rng.standard_normal(2 * sampling_rate)
+        self.assertEqual(voice_activity_segments(noise, sampling_rate).tolist(), [[0, 2 * sampling_rate]])
+        self.assertEqual(voice_activity_segments(noise, sampling_rate, max_spectral_flatness=0.3).shape, (0, 2))
+
+        self.assertEqual(voice_activity_segments(silence(1), sampling_rate).shape, (0, 2))
+        self.assertEqual(voice_activity_segments(silence(0), sampling_rate).shape, (0, 2))
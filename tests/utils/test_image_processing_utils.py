@@ -13,18 +13,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import sys
 import tempfile
 import unittest
 import unittest.mock as mock
 from pathlib import Path
 
+import numpy as np
 from huggingface_hub import HfFolder
 from requests.exceptions import HTTPError
 
-from transformers import AutoImageProcessor, ViTImageProcessor
+from transformers import AutoImageProcessor, PreprocessingCache, ViTImageProcessor
 from transformers.image_processing_utils import get_size_dict
-from transformers.testing_utils import TOKEN, TemporaryHubRepo, get_tests_dir, is_staging_test
+from transformers.testing_utils import (
+    TOKEN,
+    TemporaryHubRepo,
+    get_tests_dir,
+    is_staging_test,
+    require_torch,
+    require_vision,
+)
+from transformers.utils import is_torch_available
+
+
+if is_torch_available():
+    import torch
 
 
 sys.path.append(str(Path(__file__).parent.parent.parent / "utils"))
@@ -64,6 +78,108 @@ class ImageProcessorUtilTester(unittest.TestCase):
         self.assertIsNotNone(config)
 
 
+@require_vision
+class PreprocessingCacheTester(unittest.TestCase):
+    def setUp(self):
+        self.images = [np.random.RandomState(i).randint(0, 256, (3, 40, 30), dtype=np.uint8) for i in range(2)]
+
+    def test_cache_hit(self):
+        image_processor = ViTImageProcessor(size={"height": 16, "width": 16})
+        expected = image_processor(self.images, return_tensors="np")
+
+        cache = PreprocessingCache()
+        image_processor.set_preprocessing_cache(cache)
+        outputs = image_processor(self.images, return_tensors="np")
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        np.testing.assert_array_equal(outputs["pixel_values"], expected["pixel_values"])
+
+        # Modifying the outputs does not modify the cache
+        outputs["pixel_values"][:] = 0
+        outputs = image_processor([image.copy() for image in self.images], return_tensors="np")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        np.testing.assert_array_equal(outputs["pixel_values"], expected["pixel_values"])
+
+    def test_cache_miss(self):
+        image_processor = ViTImageProcessor(size={"height": 16, "width": 16})
+        cache = PreprocessingCache()
+        image_processor.set_preprocessing_cache(cache)
+        image_processor(self.images, return_tensors="np")
+
+        # Different images, preprocessing arguments or configuration
+        images = [image.copy() for image in self.images]
+        images[0][0, 0, 0] += 1
+        image_processor(images, return_tensors="np")
+        image_processor(self.images, return_tensors="np", do_normalize=False)
+        image_processor.image_mean = [0.0, 0.0, 0.0]
+        outputs = image_processor(self.images, return_tensors="np")
+        self.assertEqual((cache.hits, cache.misses), (0, 4))
+        self.assertEqual(len(cache), 4)
+
+        image_processor.set_preprocessing_cache(None)
+        expected = image_processor(self.images, return_tensors="np")
+        np.testing.assert_array_equal(outputs["pixel_values"], expected["pixel_values"])
+
+    @require_torch
+    def test_cache_on_disk(self):
+        image_processor = ViTImageProcessor(size={"height": 16, "width": 16})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image_processor.set_preprocessing_cache(PreprocessingCache(cache_dir=tmp_dir))
+            expected = image_processor(self.images, return_tensors="pt")
+
+            # A new cache reads the outputs stored by the first one
+            cache = PreprocessingCache(cache_dir=tmp_dir)
+            image_processor.set_preprocessing_cache(cache)
+            outputs = image_processor(self.images, return_tensors="pt")
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+            self.assertIsInstance(outputs["pixel_values"], torch.Tensor)
+            torch.testing.assert_close(outputs["pixel_values"], expected["pixel_values"], rtol=0, atol=0)
+
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+    def test_cache_eviction(self):
+        image_processor = ViTImageProcessor(size={"height": 16, "width": 16})
+        output_size = 16 * 16 * 3 * 4
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Room for one output in memory and two on disk
+            cache = PreprocessingCache(
+                cache_dir=tmp_dir, max_memory_size=output_size + 1024, max_disk_size=2 * output_size + 1024
+            )
+            image_processor.set_preprocessing_cache(cache)
+            images = self.images + [self.images[0] + 1]
+            # The cache directory is only scanned when the cache is created
+            with mock.patch("os.listdir", side_effect=AssertionError("os.listdir should not be called")):
+                for image in images:
+                    image_processor(image, return_tensors="np")
+            self.assertEqual(len(cache._entries), 1)
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(len(os.listdir(tmp_dir)), 2)
+
+            # A new cache picks up the stored outputs, and evicts the least recently used one first
+            key_1, key_2 = cache._disk_entries
+            os.utime(os.path.join(tmp_dir, key_1), (2, 2))
+            os.utime(os.path.join(tmp_dir, key_2), (1, 1))
+            cache = PreprocessingCache(cache_dir=tmp_dir, max_disk_size=2 * output_size + 1024)
+            self.assertEqual(list(cache._disk_entries), [key_2, key_1])
+            image_processor.set_preprocessing_cache(cache)
+            image_processor(images[0], return_tensors="np")
+            self.assertEqual(len(cache), 2)
+            self.assertNotIn(key_2, os.listdir(tmp_dir))
+
+    def test_cache_is_not_saved(self):
+        image_processor = ViTImageProcessor(size={"height": 16, "width": 16})
+        expected = image_processor.to_dict()
+        image_processor.set_preprocessing_cache(PreprocessingCache())
+        self.assertEqual(image_processor.to_dict(), expected)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image_processor.save_pretrained(tmp_dir)
+            new_image_processor = ViTImageProcessor.from_pretrained(tmp_dir)
+        self.assertEqual(new_image_processor.to_dict(), expected)
+        self.assertIsNone(new_image_processor._preprocessing_cache)
+
+
 @is_staging_test
 class ImageProcessorPushToHubTester(unittest.TestCase):
     @classmethod
@@ -15,10 +15,12 @@
 
 import codecs
 import os
+import shutil
 import tempfile
 import unittest
 from io import BytesIO
 from typing import Optional
+from unittest.mock import patch
 
 import numpy as np
 import pytest
@@ -35,18 +37,30 @@ from transformers.image_utils import (
     make_flat_list_of_images,
     make_list_of_images,
     make_nested_list_of_images,
+    read_video_opencv,
+    read_video_pyav,
 )
-from transformers.testing_utils import is_flaky, require_torch, require_vision
+from transformers.testing_utils import is_flaky, require_av, require_cv2, require_torch, require_vision
+from transformers.utils import is_av_available
 
 
 if is_torch_available():
     import torch
 
+if is_av_available():
+    import av
+
 if is_vision_available():
     import PIL.Image
 
     from transformers import ImageFeatureExtractionMixin
-    from transformers.image_utils import get_image_size, infer_channel_dimension_format, load_image
+    from transformers.image_utils import (
+        ImageCache,
+        get_image_size,
+        infer_channel_dimension_format,
+        load_image,
+        load_images,
+    )
 
 
 def get_image_from_hub_dataset(dataset_id: str, filename: str, revision: Optional[str] = None) -> "PIL.Image.Image":
@@ -986,6 +1000,132 @@ class LoadImageTester(unittest.TestCase):
             (500, 333, 3),
         )
 
+    def test_load_images_concurrently(self):
+        local_file = "./tests/fixtures/tests_samples/COCO/000000039769.png"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            image_files = []
+            for i in range(4):
+                image_files.append(os.path.join(tmpdir, f"image_{i}.png"))
+                get_random_image(16 + i, 32).save(image_files[-1])
+            image_groups = [image_files[:1], image_files[1:], [local_file]]
+
+            expected = [[np.array(load_image(image)) for image in group] for group in image_groups]
+            for max_workers in [1, 3]:
+                images = load_images(image_groups, max_workers=max_workers)
+                self.assertEqual([len(group) for group in images], [1, 3, 1])
+                for group, expected_group in zip(images, expected):
+                    for image, expected_image in zip(group, expected_group):
+                        np.testing.assert_array_equal(np.array(image), expected_image)
+
+                images = load_images(image_files, max_workers=max_workers)
+                self.assertEqual([np.array(image).shape[0] for image in images], [16, 17, 18, 19])
+
+    def test_load_images_with_cache(self):
+        cache = ImageCache(max_size=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            image_files = []
+            for i in range(3):
+                image_files.append(os.path.join(tmpdir, f"image_{i}.png"))
+                get_random_image(16, 16).save(image_files[-1])
+            # Same content under another path is a cache hit
+            with open(image_files[0], "rb") as src, open(os.path.join(tmpdir, "copy.png"), "wb") as dst:
+                dst.write(src.read())
+
+            image = load_image(image_files[0], cache=cache)
+            self.assertEqual(len(cache), 1)
+            cached_image = load_image(os.path.join(tmpdir, "copy.png"), cache=cache)
+            self.assertEqual(len(cache), 1)
+            np.testing.assert_array_equal(np.array(image), np.array(cached_image))
+
+            # Returned images are copies, modifying them does not modify the cache
+            cached_image.paste((0, 0, 0), (0, 0, 16, 16))
+            np.testing.assert_array_equal(np.array(load_image(image_files[0], cache=cache)), np.array(image))
+
+            # The least recently used image is evicted first
+            images = load_images(image_files[1:], max_workers=2, cache=cache)
+            self.assertEqual(len(cache), 2)
+            with open(image_files[0], "rb") as f:
+                self.assertNotIn(ImageCache.hash_content(f.read()), cache)
+            for image_file, image in zip(image_files[1:], images):
+                np.testing.assert_array_equal(np.array(load_image(image_file)), np.array(image))
+
+            # PIL images are not cached
+            load_image(image, cache=cache)
+            self.assertEqual(len(cache), 2)
+
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+
+
+@require_av
+class LoadVideoTester(unittest.TestCase):
+    num_frames = 90
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.video_path = os.path.join(cls.tmpdir, "video.mp4")
+        container = av.open(cls.video_path, "w")
+        stream = container.add_stream("mpeg4", rate=30)
+        stream.width, stream.height, stream.pix_fmt = 64, 48, "yuv420p"
+        stream.codec_context.gop_size = 10
+        for i in range(cls.num_frames):
+            frame = np.full((48, 64, 3), (i * 5) % 256, dtype=np.uint8)
+            frame[:, : i % 64] = 255
+            for packet in stream.encode(av.VideoFrame.from_ndarray(frame, format="rgb24")):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+        container.close()
+
+        # Reference: every frame decoded in order
+        container = av.open(cls.video_path)
+        cls.all_frames = np.stack([frame.to_ndarray(format="rgb24") for frame in container.decode(video=0)])
+        container.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_read_video_pyav_seeks_to_sampled_frames(self):
+        for indices in [[0, 1, 2, 3], [5, 33, 34, 61, 88], [12, 12, 45], [50, 200]]:
+            for num_decode_workers in [1, 2]:
+                video, metadata = read_video_pyav(
+                    self.video_path,
+                    lambda metadata, **kwargs: np.array(indices),
+                    num_decode_workers=num_decode_workers,
+                )
+                expected_indices = sorted({i for i in indices if i < self.num_frames})
+                self.assertEqual(metadata.total_num_frames, self.num_frames)
+                self.assertEqual(video.dtype, np.uint8)
+                np.testing.assert_array_equal(video, self.all_frames[expected_indices])
+
+        # Sampling from a file object falls back to sequential decoding
+        with open(self.video_path, "rb") as f:
+            video, _ = read_video_pyav(BytesIO(f.read()), lambda metadata, **kwargs: np.array([5, 33, 61]))
+        np.testing.assert_array_equal(video, self.all_frames[[5, 33, 61]])
+
+    def test_read_video_pyav_without_segments(self):
+        # When the frame indices can't be recovered from the timestamps, the video is decoded sequentially
+        with patch("transformers.image_utils._plan_pyav_segments", return_value=None):
+            video, metadata = read_video_pyav(self.video_path, lambda metadata, **kwargs: np.array([5, 33, 61]))
+        self.assertEqual(metadata.total_num_frames, self.num_frames)
+        np.testing.assert_array_equal(video, self.all_frames[[5, 33, 61]])
+
+    @require_cv2
+    def test_read_video_opencv_seeks_to_sampled_frames(self):
+        indices = np.linspace(0, self.num_frames - 1, 8, dtype=int)
+        for seek_gap in [None, 3]:
+            video, metadata = read_video_opencv(self.video_path, lambda metadata, **kwargs: indices, seek_gap=seek_gap)
+            self.assertEqual(metadata.total_num_frames, self.num_frames)
+            # OpenCV and PyAV use different color conversions
+            self.assertEqual(video.shape, self.all_frames[indices].shape)
+            self.assertLess(np.abs(video.astype(int) - self.all_frames[indices]).mean(), 3)
+            if seek_gap is None:
+                expected_video = video
+            else:
+                np.testing.assert_array_equal(video, expected_video)
+
 
 class UtilFunctionTester(unittest.TestCase):
     def test_get_image_size(self):
@@ -59,12 +59,14 @@ from transformers.testing_utils import (
     require_tf,
     require_torch,
     require_torch_accelerator,
+    require_torch_gpu,
     require_torch_multi_accelerator,
     require_usr_bin_time,
     slow,
     torch_device,
 )
 from transformers.utils import (
+    CONFIG_NAME,
     SAFE_WEIGHTS_INDEX_NAME,
     SAFE_WEIGHTS_NAME,
     WEIGHTS_INDEX_NAME,
@@ -96,6 +98,8 @@ if is_torch_available():
         BertModel,
         CLIPTextModel,
         GenerationMixin,
+        LlamaConfig,
+        LlamaForCausalLM,
         PreTrainedModel,
         T5Config,
         T5ForConditionalGeneration,
@@ -110,8 +114,9 @@ if is_torch_available():
         _find_disjoint,
         _find_identical,
         dtype_byte_size,
+        load_sharded_checkpoint,
     )
-    from transformers.pytorch_utils import isin_mps_friendly
+    from transformers.pytorch_utils import ActivationOffloader, isin_mps_friendly
 
     # Fake pretrained models for tests
     class BaseModel(PreTrainedModel):
@@ -1332,6 +1337,48 @@ class ModelUtilsTest(TestCasePlus):
             for p1, p2 in zip(model.parameters(), new_model.parameters()):
                 torch.testing.assert_close(p1, p2)
 
+    @require_safetensors
+    def test_save_and_load_sharded_in_parallel(self):
+        config = BertConfig(
+            vocab_size=99, hidden_size=32, num_hidden_layers=5, num_attention_heads=4, intermediate_size=37
+        )
+        model = BertModel(config)
+        for safe_serialization in [True, False]:
+            index_name = SAFE_WEIGHTS_INDEX_NAME if safe_serialization else WEIGHTS_INDEX_NAME
+            with self.subTest(safe_serialization=safe_serialization), tempfile.TemporaryDirectory() as tmp_dir:
+                model.save_pretrained(
+                    tmp_dir, safe_serialization=safe_serialization, max_shard_size="20kB", max_shard_workers=3
+                )
+                with open(os.path.join(tmp_dir, index_name)) as f:
+                    shard_files = set(json.load(f)["weight_map"].values())
+                self.assertGreater(len(shard_files), 3)
+                self.assertTrue(all(os.path.isfile(os.path.join(tmp_dir, f)) for f in shard_files))
+
+                new_model = BertModel(config)
+                load_result = load_sharded_checkpoint(
+                    new_model, tmp_dir, prefer_safe=safe_serialization, max_workers=3
+                )
+                self.assertEqual(load_result.missing_keys, [])
+                for p1, p2 in zip(model.parameters(), new_model.parameters()):
+                    torch.testing.assert_close(p1, p2)
+
+        # Each process writes its share of the shards, only the main process writes the config and the index
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model.save_pretrained(tmp_dir, is_main_process=False, max_shard_size="20kB", process_index=1, world_size=2)
+            self.assertFalse(os.path.isfile(os.path.join(tmp_dir, SAFE_WEIGHTS_INDEX_NAME)))
+            self.assertFalse(os.path.isfile(os.path.join(tmp_dir, CONFIG_NAME)))
+            num_shards_process_1 = len(os.listdir(tmp_dir))
+
+            model.save_pretrained(tmp_dir, max_shard_size="20kB", process_index=0, world_size=2)
+            with open(os.path.join(tmp_dir, SAFE_WEIGHTS_INDEX_NAME)) as f:
+                shard_files = set(json.load(f)["weight_map"].values())
+            self.assertEqual(num_shards_process_1, len(shard_files) // 2)
+            self.assertTrue(all(os.path.isfile(os.path.join(tmp_dir, f)) for f in shard_files))
+
+            new_model = BertModel.from_pretrained(tmp_dir)
+            for p1, p2 in zip(model.parameters(), new_model.parameters()):
+                torch.testing.assert_close(p1, p2)
+
     @require_safetensors
     def test_safetensors_load_from_hub_sharded(self):
         safetensors_model = BertModel.from_pretrained("hf-internal-testing/tiny-random-bert-sharded-safetensors")
@@ -1706,6 +1753,97 @@ class ModelUtilsTest(TestCasePlus):
             torch.equal(torch.isin(random_ids, random_test_tensor), isin_mps_friendly(random_ids, random_test_tensor))
         )
 
+    def test_activation_offloading(self):
+        config = LlamaConfig(
+            vocab_size=99,
+            hidden_size=32,
+            intermediate_size=37,
+            num_hidden_layers=3,
+            num_attention_heads=4,
+            num_key_value_heads=2,
+        )
+        torch.manual_seed(0)
+        model = LlamaForCausalLM(config).to(torch_device)
+        model.train()
+        input_ids = torch.randint(0, config.vocab_size, (2, 8), device=torch_device)
+
+        def loss_and_grads():
+            model.zero_grad()
+            loss = model(input_ids, labels=input_ids).loss
+            loss.backward()
+            return loss.detach(), {name: param.grad.clone() for name, param in model.named_parameters()}
+
+        expected_loss, expected_grads = loss_and_grads()
+
+        layer_calls = [0] * config.num_hidden_layers
+        for idx, layer in enumerate(model.model.layers):
+            layer.register_forward_hook(lambda *args, idx=idx: layer_calls.__setitem__(idx, layer_calls[idx] + 1))
+
+        model.activation_offloading_enable(policy=["keep", "recompute", "offload"], min_offload_size=0)
+        self.assertTrue(model.is_gradient_checkpointing)
+        self.assertIsInstance(model.model._gradient_checkpointing_func, ActivationOffloader)
+
+        # Run twice to check the layers keep their policies across steps
+        for _ in range(2):
+            loss, grads = loss_and_grads()
+            torch.testing.assert_close(loss, expected_loss)
+            for name, grad in grads.items():
+                torch.testing.assert_close(grad, expected_grads[name], msg=name)
+        # Only the layer with the "recompute" policy is run again in the backward pass
+        self.assertEqual(layer_calls, [2, 4, 2])
+
+        model.gradient_checkpointing_disable()
+        self.assertFalse(model.is_gradient_checkpointing)
+
+        with self.assertRaises(ValueError):
+            model.activation_offloading_enable(policy="swap")
+
+    @require_torch_gpu
+    def test_activation_offloading_on_gpu(self):
+        config = LlamaConfig(
+            vocab_size=99,
+            hidden_size=64,
+            intermediate_size=128,
+            num_hidden_layers=3,
+            num_attention_heads=4,
+            num_key_value_heads=2,
+        )
+        torch.manual_seed(0)
+        model = LlamaForCausalLM(config).to("cuda")
+        model.train()
+        input_ids = torch.randint(0, config.vocab_size, (2, 32), device="cuda")
+
+        def loss_and_grads():
+            model.zero_grad()
+            loss = model(input_ids, labels=input_ids).loss
+            loss.backward()
+            return loss.detach(), {name: param.grad.clone() for name, param in model.named_parameters()}
+
+        expected_loss, expected_grads = loss_and_grads()
+
+        model.activation_offloading_enable(policy="offload", min_offload_size=0)
+        offloader = model.model._gradient_checkpointing_func
+        offloaded_storages = []
+        pack = offloader._pack
+
+        def recording_pack(tensor):
+            handle = pack(tensor)
+            if handle is not tensor:
+                offloaded_storages.append(tensor.untyped_storage().data_ptr())
+            return handle
+
+        offloader._pack = recording_pack
+        for _ in range(2):
+            loss, grads = loss_and_grads()
+            torch.testing.assert_close(loss, expected_loss)
+            for name, grad in grads.items():
+                torch.testing.assert_close(grad, expected_grads[name], msg=name)
+
+        # The activations are offloaded, but not the weights saved for backward as views
+        self.assertGreater(len(offloaded_storages), 0)
+        parameter_storages = {param.untyped_storage().data_ptr() for param in model.parameters()}
+        self.assertTrue(parameter_storages.isdisjoint(offloaded_storages))
+
     def test_can_generate(self):
         """Tests the behavior of `PreTrainedModel.can_generate` method."""
         logger = logging.get_logger("transformers.modeling_utils")